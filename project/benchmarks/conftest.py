@@ -0,0 +1,87 @@
+from pathlib import Path
+import os
+import sys
+
+import pytest
+
+# Local import paths for project/src and the synthetic generator
+BENCH_DIR = Path(__file__).resolve().parent
+SRC = BENCH_DIR.parent / 'src'
+for path in (SRC, BENCH_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+import utils
+from module_build import build_panel
+from module_index import compute_index, compute_subindices
+from synthetic import country_aliases, scale_shape, synthetic_sources
+
+DEFAULT_SCALES = '10,100'
+# Saved runs live next to the suite; comparisons fail beyond this regression by default
+BASELINE_DIR = BENCH_DIR / 'baselines'
+DEFAULT_THRESHOLD = 'mean:25%'
+# Timed rounds per benchmark: fewer at large scales
+ROUNDS = {10: 5, 100: 3}
+
+
+def pytest_addoption(parser):
+    parser.addoption('--bench-scales', default=os.getenv('IECGGS_BENCH_SCALES', DEFAULT_SCALES),
+                     help='Comma-separated synthetic data scales (multiples of the real inputs), e.g. 10,100,1000')
+    parser.addoption('--bench-threshold', default=os.getenv('IECGGS_BENCH_THRESHOLD', DEFAULT_THRESHOLD),
+                     help='Regression threshold used with --benchmark-compare when --benchmark-compare-fail is not given')
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Runs before pytest-benchmark reads its options
+    if not hasattr(config.option, 'benchmark_storage'):
+        return
+    if config.option.benchmark_storage == 'file://./.benchmarks':
+        config.option.benchmark_storage = f'file://{BASELINE_DIR}'
+    if config.option.benchmark_compare and not config.option.benchmark_compare_fail:
+        from pytest_benchmark.utils import parse_compare_fail
+
+        config.option.benchmark_compare_fail = [parse_compare_fail(config.getoption('bench_threshold'))]
+
+
+def pytest_generate_tests(metafunc):
+    if 'scale' in metafunc.fixturenames:
+        scales = [int(s) for s in metafunc.config.getoption('bench_scales').split(',') if s.strip()]
+        metafunc.parametrize('scale', scales, ids=[f'{s}x' for s in scales], scope='session')
+
+
+@pytest.fixture(scope='session')
+def sources(scale):
+    # Synthetic country names resolve through COUNTRY_ALIASES, so country_converter is
+    # never called and the on-disk ISO3 cache is left untouched
+    with pytest.MonkeyPatch.context() as mp:
+        for name, code in country_aliases(scale_shape(scale)[0]).items():
+            mp.setitem(utils.COUNTRY_ALIASES, name, code)
+        yield synthetic_sources(scale)
+
+
+@pytest.fixture(scope='session')
+def panel(sources):
+    return build_panel(sources)
+
+
+@pytest.fixture(scope='session')
+def subindices(panel):
+    return compute_subindices(panel)
+
+
+@pytest.fixture(scope='session')
+def index(panel, subindices):
+    return compute_index(panel, subindices)
+
+
+@pytest.fixture
+def bench(benchmark, scale):
+    # benchmark.pedantic with scale-dependent rounds; `setup` returns fresh (args, kwargs)
+    def run(func, *args, setup=None, **kwargs):
+        benchmark.extra_info['scale'] = scale
+        benchmark.extra_info['countries'], benchmark.extra_info['years'] = scale_shape(scale)
+        if setup is None:
+            setup = lambda: (args, kwargs)
+        return benchmark.pedantic(func, setup=setup, rounds=ROUNDS.get(scale, 1), iterations=1)
+    return run
@@ -0,0 +1,177 @@
+"""Synthetic source frames in the shapes returned by module_ingest.load_all().
+
+Scale 1 is roughly the size of the real inputs (about 200 countries over 25 years). Larger
+scales grow both the number of countries and the number of years, so row counts, key
+cardinality and duplicate keys all grow the way they would with more sources or history.
+"""
+from __future__ import annotations
+
+import itertools
+import math
+
+import numpy as np
+import pandas as pd
+
+from utils import KEY_GRID_ATTR
+
+BASE_COUNTRIES = 200
+BASE_YEARS = 25
+FIRST_YEAR = 2000
+# Share of (country, year) cells present in each source, close to the real files
+DENSITY = {
+    'spar': 0.43,
+    'che_gdp': 1.0,
+    'uhc': 0.19,
+    'policy': 0.69,
+    'plan': 0.99,
+    'strategy': 0.78,
+    'exclusions': 0.014,
+    'participation': 0.14,
+}
+# Share of missing values inside the GHO-style sources
+MISSING = {'che_gdp': 0.2, 'uhc': 0.0, 'policy': 0.9, 'plan': 0.8, 'strategy': 0.8}
+# Extra name spellings (trailing space) and unresolvable aggregate rows, as in the GHO exports
+VARIANT_SHARE = 0.05
+AGGREGATE_SHARE = 0.2
+ACTIVITIES = [
+    'Constitución de la Mesa de la Asamblea',
+    'Elección de Miembros con derecho a designar a una persona apra que forme parte del Consejo Ejecutivo',
+    'Composición de la Comisión de Candidaturas',
+    'Vicepresidencia',
+    'Comisión B - Vicepresidente',
+    'Comisión A - Relator',
+    'Comisión A - President',
+    'Presidencia',
+    'Nombramiento de representantes en el Comité de la Caja de Pensiones\ndel Personal de la OMS',
+    'Caja Común de Pensiones del Personal de las Naciones Unidas:\nnombramiento de representantes',
+    'Otra actividad',
+]
+
+
+def scale_shape(scale: float) -> tuple[int, int]:
+    # (countries, years): countries grow with sqrt(scale), years absorb the rest
+    country_factor = max(1, math.ceil(math.sqrt(scale)))
+    n_countries = BASE_COUNTRIES * country_factor
+    n_years = max(1, round(BASE_YEARS * scale / country_factor))
+    return n_countries, n_years
+
+
+def country_table(n_countries: int) -> pd.DataFrame:
+    codes = [''.join(c) for c in itertools.islice(itertools.product('ABCDEFGHIJKLMNOPQRSTUVWXYZ', repeat=3), n_countries)]
+    if len(codes) < n_countries:
+        raise ValueError(f'At most {26 ** 3} synthetic countries are supported')
+    return pd.DataFrame({'iso3': codes, 'country': [f'Synthetic Country {c}' for c in codes]})
+
+
+def country_aliases(n_countries: int) -> dict:
+    # Name -> ISO3 entries that make synthetic names resolvable without country_converter
+    # (aggregate rows map to None, as unresolved regions do)
+    countries = country_table(n_countries)
+    aliases = dict(zip(countries['country'], countries['iso3']))
+    aliases.update({f'Synthetic Region {i}': None for i in range(_n_aggregates(n_countries))})
+    return aliases
+
+
+def _n_aggregates(n_countries: int) -> int:
+    return max(1, int(n_countries * AGGREGATE_SHARE))
+
+
+def _sample_cells(rng, countries: pd.DataFrame, years: np.ndarray, density: float) -> pd.DataFrame:
+    n = len(countries) * len(years)
+    cells = np.flatnonzero(rng.random(n) < density)
+    ci, yi = np.divmod(cells, len(years))
+    return pd.DataFrame({
+        'country': countries['country'].to_numpy()[ci],
+        'iso3': countries['iso3'].to_numpy()[ci],
+        'year': years[yi].astype('int64'),
+    })
+
+
+def _gho_frame(rng, countries, years, name: str, varname: str, values, key_grid: bool = True) -> pd.DataFrame:
+    # country/year/value rows plus name variants (duplicate keys) and aggregate regions; wide
+    # exports carry their key grid, the tidy UHC export does not
+    df = _sample_cells(rng, countries, years, DENSITY[name])
+    df[varname] = values(len(df))
+    if MISSING.get(name):
+        df.loc[rng.random(len(df)) < MISSING[name], varname] = np.nan
+    variants = df.sample(frac=VARIANT_SHARE, random_state=int(rng.integers(2 ** 31)))
+    variants = variants.assign(country=variants['country'] + ' ')
+    n_agg = _n_aggregates(len(countries))
+    regions = pd.DataFrame({
+        'country': [f'Synthetic Region {i}' for i in rng.integers(0, n_agg, int(len(df) * AGGREGATE_SHARE / 4))],
+    })
+    regions['year'] = rng.choice(years, len(regions)).astype('int64')
+    regions[varname] = values(len(regions))
+    out = pd.concat([df.drop(columns='iso3'), variants.drop(columns='iso3'), regions], ignore_index=True)
+    out['country'] = out['country'].astype('str')
+    out = out[['country', 'year', varname]]
+    return _with_key_grid(out, countries, years) if key_grid else out
+
+
+def _with_key_grid(df: pd.DataFrame, countries: pd.DataFrame, years) -> pd.DataFrame:
+    # The attrs long_from_wide_indicator leaves on a wide export: every row name of the table
+    # (countries, name variants, regions; empty rows included) and its year columns
+    df.attrs[KEY_GRID_ATTR] = {
+        'country': list(dict.fromkeys(countries['country'].tolist() + df['country'].tolist())),
+        'year': [int(y) for y in years],
+    }
+    return df
+
+
+def _discrete(rng, fractional: bool = False):
+    def values(n):
+        v = rng.integers(0, 3, n).astype(float)
+        if fractional:
+            # plan/right-to-health exports carry averaged sub-national values
+            frac = rng.random(n) < 0.1
+            v[frac] = np.round(rng.uniform(0, 2, frac.sum()), 8)
+        return v
+    return values
+
+
+def synthetic_sources(scale: float = 1, seed: int = 0) -> dict:
+    # Same keys, column names, dtypes and key-grid attrs as module_ingest.load_all()
+    rng = np.random.default_rng(seed)
+    n_countries, n_years = scale_shape(scale)
+    countries = country_table(n_countries)
+    years = FIRST_YEAR + np.arange(n_years)
+
+    spar = _sample_cells(rng, countries, years, DENSITY['spar'])
+    spar['SPAR_total'] = np.round(rng.uniform(10, 100, len(spar)))
+    spar = spar.astype({'country': 'str', 'iso3': 'str'})[['country', 'iso3', 'year', 'SPAR_total']]
+
+    che = _gho_frame(rng, countries, years, 'che_gdp', 'CHE_GDP', lambda n: rng.uniform(0.01, 0.2, n))
+    uhc = _gho_frame(rng, countries, years, 'uhc', 'UHC_index', lambda n: rng.integers(20, 95, n), key_grid=False)
+    policy = _gho_frame(rng, countries, years, 'policy', 'Policy_UHC', _discrete(rng))
+    plan = _gho_frame(rng, countries, years, 'plan', 'Plan_UHC', _discrete(rng, fractional=True))
+    strategy = _gho_frame(rng, countries, years, 'strategy', 'Strategy_UHC', _discrete(rng))
+
+    # Recognition of the right to health: one year only, like the 2024 export
+    # on the source's 0-5 level scale, mostly 0 with regional averages in between
+    rth = pd.DataFrame({'country': countries['country'].astype('str'), 'year': np.int64(years[-1])})
+    rth['Right_to_health'] = np.where(rng.random(len(rth)) < 0.6, 0.0, rng.integers(1, 6, len(rth)).astype(float))
+    rth = _with_key_grid(rth, countries, years[-1:])
+
+    exclusions = _sample_cells(rng, countries, years, DENSITY['exclusions']).drop(columns='iso3')
+    exclusions['country'] = exclusions['country'].astype('str')
+    exclusions['art7_excluded'] = np.int64(1)
+
+    # WHA participation log: several activities per country-year, year only through the WHA code
+    # (read_participation_raw keeps only the WHA, Actividad and country columns)
+    part = _sample_cells(rng, countries, years, DENSITY['participation'])
+    part = part.loc[part.index.repeat(rng.integers(1, 3, len(part)))].reset_index(drop=True)
+    participation = pd.DataFrame({
+        'WHA': ('WHA' + (part['year'] - 1947).astype(str)).astype('str'),
+        'Actividad': pd.Series(np.asarray(ACTIVITIES, dtype=object)[rng.integers(0, len(ACTIVITIES), len(part))], dtype='str'),
+        'country': part['country'].astype('str'),
+    })
+
+    return {
+        'spar': spar,
+        'che_gdp': che,
+        'uhc': uhc,
+        'policy_plan_strategy': (policy, plan, strategy),
+        'right_to_health': rth,
+        'exclusions': exclusions,
+        'participation_raw': participation,
+    }
@@ -0,0 +1,59 @@
+import tracemalloc
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from module_build import build_panel
+from module_coverage import build_coverage_reports
+from module_index import apply_penalty, compute_index, compute_subindices, sensitivity_table
+from module_participation import clean_participation
+
+
+def test_build_panel(bench, sources):
+    panel = bench(build_panel, sources)
+    assert panel[['iso3', 'year']].duplicated().sum() == 0
+
+
+def test_clean_participation(bench, sources):
+    out = bench(clean_participation, sources['participation_raw'])
+    assert out['participation_event'].sum() == len(sources['participation_raw'])
+
+
+def test_compute_subindices(bench, panel):
+    sub = bench(compute_subindices, panel)
+    assert len(sub) == len(panel)
+
+
+def test_compute_index(bench, panel, subindices):
+    idx = bench(compute_index, panel, subindices)
+    assert len(idx) == len(panel)
+
+
+def test_sensitivity_table(bench, index):
+    table = bench(sensitivity_table, index)
+    assert len(table)
+
+
+def test_build_coverage_reports(bench, panel, tmp_path):
+    reports = bench(build_coverage_reports, panel, tmp_path)
+    assert reports['by_variable']['n_rows'].iloc[0] == len(panel)
+
+
+def _panel_to_penalty(sources):
+    panel = build_panel(sources)
+    sub = compute_subindices(panel)
+    return apply_penalty(compute_index(panel, sub))
+
+
+def test_panel_to_penalty_peak_memory(bench, benchmark, sources):
+    # Timed like the others; the traced allocation peak of one untimed run is recorded in
+    # extra_info (py_peak_mb) so saved runs can be compared for memory too
+    tracemalloc.start()
+    try:
+        _panel_to_penalty(sources)
+        benchmark.extra_info['py_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+    finally:
+        tracemalloc.stop()
+    pen = bench(_panel_to_penalty, sources)
+    assert pen['art7_excluded'].notna().all()
@@ -52,12 +52,13 @@ if ! check_deps >/tmp/iecg_deps_check.log 2>&1; then
   fi
 fi
 
-# Run pipeline
-"$PYTHON_BIN" "$PROJECT_DIR/src/main.py"
-
-echo "Outputs written to $OUTDIR:"
-ls -l "$OUTDIR"
+# Recompute outputs in the background: the app starts right away, serves the last published
+# snapshot meanwhile and switches to the new one when the run finishes (IECGGS_RUN_ON_START=0 skips it)
+if [ "${IECGGS_RUN_ON_START:-1}" = "1" ]; then
+  echo "Starting background pipeline run (log: $OUTDIR/worker.log)"
+  IECGGS_OUTPUTS_DIR="$OUTDIR" "$PYTHON_BIN" "$PROJECT_DIR/src/main.py" --snapshot >>"$OUTDIR/worker.log" 2>&1 </dev/null &
+fi
 
 # Run Streamlit
 echo "Starting Streamlit app..."
-"$PYTHON_BIN" -m streamlit run "$PROJECT_DIR/src/app.py" --server.port="${PORT:-8501}" --server.address=0.0.0.0
+exec "$PYTHON_BIN" -m streamlit run "$PROJECT_DIR/src/app.py" --server.port="${PORT:-8501}" --server.address=0.0.0.0
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Benchmark the working tree against a reference: a git revision measured now, or the saved baseline."""
+from pathlib import Path
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = Path(__file__).resolve().parents[1]
+REPO = ROOT.parent
+BASELINE_DIR = ROOT / 'benchmarks' / 'baselines'
+BASELINE_NAME = 'baseline'
+
+
+def pytest_benchmarks(checkout: Path, *args) -> int:
+    # Runs the suite of `checkout` with its results stored in this checkout's baselines/. The
+    # rootdir is pinned so both checkouts name benchmarks alike (project/benchmarks/...::test).
+    cmd = [sys.executable, '-m', 'pytest', 'project/benchmarks', '-q', f'--rootdir={checkout}',
+           f'--benchmark-storage=file://{BASELINE_DIR}', *args]
+    print('+', ' '.join(cmd), flush=True)
+    return subprocess.call(cmd, cwd=checkout)
+
+
+def has_baseline() -> bool:
+    return any(BASELINE_DIR.glob(f'*/*_{BASELINE_NAME}.json'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ref', help='Git revision to measure first on this machine (e.g. origin/main); '
+                                      'default: compare against the saved baseline, saving one if there is none')
+    parser.add_argument('--save', action='store_true', help='Only save the working tree as the new baseline')
+    parser.add_argument('--scales', default=None, help='Forwarded as --bench-scales')
+    parser.add_argument('--threshold', default=None, help='Forwarded as --bench-threshold (e.g. mean:10%%)')
+    args = parser.parse_args()
+
+    extra = []
+    if args.scales:
+        extra.append(f'--bench-scales={args.scales}')
+    if args.threshold:
+        extra.append(f'--bench-threshold={args.threshold}')
+    save = [f'--benchmark-save={BASELINE_NAME}', *extra]
+
+    if args.save or (args.ref is None and not has_baseline()):
+        if not args.save:
+            print(f'No saved baseline in {BASELINE_DIR}: saving this run; later runs compare against it')
+        sys.exit(pytest_benchmarks(REPO, *save))
+
+    if args.ref is not None:
+        # Timings only compare on one machine, so the reference is measured here, now
+        worktree = Path(tempfile.mkdtemp(prefix='iecggs-bench-'))
+        try:
+            subprocess.check_call(['git', 'worktree', 'add', '--detach', str(worktree), args.ref], cwd=REPO)
+            scales = [a for a in extra if a.startswith('--bench-scales')]
+            code = pytest_benchmarks(worktree, f'--benchmark-save={BASELINE_NAME}', *scales)
+        finally:
+            subprocess.call(['git', 'worktree', 'remove', '--force', str(worktree)], cwd=REPO)
+            shutil.rmtree(worktree, ignore_errors=True)
+        if code:
+            sys.exit(f'Reference run at {args.ref} failed (exit {code})')
+
+    # --benchmark-compare without a value compares against the latest saved run
+    sys.exit(pytest_benchmarks(REPO, '--benchmark-compare', *extra))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Benchmark the participation aggregation stage against the previous groupby.apply version."""
+from pathlib import Path
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Local import path for project/src
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / 'src'
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from module_participation import EVENT_COLUMNS, aggregate_events
+
+# Roughly the shape of C_Particip.xlsx: ~1,000 rows over ~190 countries and WHA1..WHA77
+BASE_ROWS = 1043
+ACTIVITY_TYPES = ['leadership', 'decision_body', 'institutional_participation', 'administrative_body', 'other', 'unknown']
+
+
+def synthetic_classified(scale: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n = BASE_ROWS * scale
+    countries = np.array([f'Country {i:03d}' for i in range(190)])
+    return pd.DataFrame({
+        'country': countries[rng.integers(0, len(countries), n)],
+        'year': rng.integers(1948, 2025, n).astype(float),
+        'activity_type': np.array(ACTIVITY_TYPES, dtype=object)[rng.integers(0, len(ACTIVITY_TYPES), n)],
+    })
+
+
+def legacy_aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    grp = df.groupby(['country', 'year'], dropna=False)
+    participation_event = grp.size().rename('participation_event')
+    leadership_event = grp.apply(lambda g: (g['activity_type'] == 'leadership').sum()).rename('leadership_event')
+    decision_event = grp.apply(lambda g: (g['activity_type'] == 'decision_body').sum()).rename('decision_event')
+    out = pd.concat([participation_event, leadership_event, decision_event], axis=1).reset_index()
+    out = out[pd.notna(out['year'])]
+    out['year'] = out['year'].astype(int)
+    return out[['country', 'year', 'participation_event', 'leadership_event', 'decision_event']]
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scales', default='1,10,100', help='Comma-separated multiples of the WHA log size')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    for scale in [int(s) for s in args.scales.split(',')]:
+        df = synthetic_classified(scale)
+        legacy = legacy_aggregate(df)
+        current = aggregate_events(df)
+        pd.testing.assert_frame_equal(
+            legacy.reset_index(drop=True), current[legacy.columns].reset_index(drop=True), check_dtype=False
+        )
+        t_legacy = _best_of(lambda: legacy_aggregate(df), args.repeat)
+        t_current = _best_of(lambda: aggregate_events(df), args.repeat)
+        rows.append({
+            'scale': f'{scale}x',
+            'rows': len(df),
+            'country_years': len(current),
+            'legacy_s': round(t_legacy, 4),
+            'single_pass_s': round(t_current, 4),
+            'speedup': round(t_legacy / t_current, 1),
+            'count_columns': 1 + len(EVENT_COLUMNS),
+        })
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
+"""Coverage audit of the cleaned panel, streamed from the served outputs in row chunks (embedded store first)."""
 from pathlib import Path
+import argparse
 import sys
-import pandas as pd
 
 # Local import path for project/src
 ROOT = Path(__file__).resolve().parents[1]
@@ -10,16 +11,25 @@ if str(SRC) not in sys.path:
     sys.path.insert(0, str(SRC))
 
 from module_coverage import build_coverage_reports
+from module_output import iter_artifact
+from module_snapshot import serving_dir
+from module_store import COVERAGE_PREFIX, iter_table, list_tables, store_frame
 
 
 def main():
-    outdir = ROOT / 'outputs'
-    panel_path = outdir / 'panel_clean.csv'
-    if not panel_path.exists():
-        raise FileNotFoundError(f'Panel not found: {panel_path}. Run pipeline first.')
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--chunk-rows', type=int, default=100_000, help='Panel rows read per chunk')
+    parser.add_argument('--outdir', type=Path, default=serving_dir(), help='Default: the published snapshot being served')
+    args = parser.parse_args()
 
-    panel = pd.read_csv(panel_path)
-    build_coverage_reports(panel, outdir)
+    outdir = args.outdir
+    if 'panel_clean' in list_tables(outdir):
+        chunks = iter_table(outdir, 'panel_clean', chunk_rows=args.chunk_rows)
+    else:
+        chunks = iter_artifact(outdir, 'panel_clean', chunk_rows=args.chunk_rows)
+    reports = build_coverage_reports(chunks, outdir)
+    for name, report in reports.items():
+        store_frame(report, outdir, f'{COVERAGE_PREFIX}{name}')
     print(f'Coverage reports written to {outdir}')
 
 
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Indexed queries against the embedded output store (outputs/iecggs.sqlite)."""
+from pathlib import Path
+import argparse
+import sys
+
+# Local import path for project/src
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / 'src'
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+import pandas as pd
+
+from module_snapshot import serving_dir
+from module_store import DEFAULT_TABLE, get_country_series, list_tables, query, top_n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--outdir', type=Path, default=serving_dir(), help='Default: the published snapshot being served')
+    parser.add_argument('--csv', action='store_true', help='Print CSV instead of a table')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('tables', help='List stored tables and row counts')
+    country = sub.add_parser('country', help='All years of one country')
+    country.add_argument('iso3')
+    country.add_argument('--table', default=DEFAULT_TABLE)
+    country.add_argument('--columns', help='Comma-separated columns (default: all)')
+    top = sub.add_parser('top', help='Highest scores of one year')
+    top.add_argument('year', type=int)
+    top.add_argument('--lambda', dest='lam', help='Penalty lambda, e.g. 0.25 (default: unpenalized IECGGS_raw)')
+    top.add_argument('-n', type=int, default=10)
+    sql = sub.add_parser('sql', help='Run a read-only SQL query')
+    sql.add_argument('statement')
+    args = parser.parse_args()
+
+    if args.command == 'tables':
+        out = pd.DataFrame([{'table': k, 'rows': v['rows']} for k, v in sorted(list_tables(args.outdir).items())])
+    elif args.command == 'country':
+        columns = args.columns.split(',') if args.columns else None
+        out = get_country_series(args.iso3, args.outdir, table=args.table, columns=columns)
+    elif args.command == 'top':
+        out = top_n(args.year, args.outdir, lam=args.lam, n=args.n)
+    else:
+        out = query(args.outdir, args.statement)
+    if args.csv:
+        out.to_csv(sys.stdout, index=False)
+    else:
+        print(out.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
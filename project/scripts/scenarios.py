@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Evaluate eligibility-threshold and penalty-lambda scenarios on one panel into outputs/scenarios."""
+from pathlib import Path
+import argparse
+import json
+import sys
+import time
+
+# Local import path for project/src
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / 'src'
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from module_incremental import load_bounds
+from module_output import read_artifact, write_artifact
+from module_scenarios import DEFAULT_CHUNK_SIZE, PARAM_COLUMNS, evaluate_scenarios, scenario_summary, scenario_table
+from module_snapshot import serving_dir
+
+
+def _grid_value(text: str):
+    values = [float(v) if '.' in v else int(v) for v in text.split(',') if v.strip()]
+    return values[0] if len(values) == 1 else values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--grid', action='append', default=[], metavar='KEY=V1,V2',
+                        help=f'Values crossed into a grid; KEY is one of {", ".join(PARAM_COLUMNS)} (e.g. dom=2,3,4)')
+    parser.add_argument('--config', type=Path,
+                        help='JSON config or list of configs, e.g. [{"dom": [2, 3], "lambda": 0.25}, {"index": 2}]')
+    parser.add_argument('--from-outputs', action='store_true',
+                        help='Reuse the published panel_clean instead of ingesting the sources')
+    parser.add_argument('--freeze-bounds', type=Path, help='Normalization bounds JSON (default: from the panel)')
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes (default: IECGGS_SCENARIO_JOBS or 1)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Scenarios per task')
+    parser.add_argument('--outdir', type=Path, default=ROOT / 'outputs')
+    args = parser.parse_args()
+
+    configs = json.loads(args.config.read_text(encoding='utf-8')) if args.config else []
+    configs = [configs] if isinstance(configs, dict) else configs
+    if args.grid:
+        configs.append({key: _grid_value(values) for key, values in (g.split('=', 1) for g in args.grid)})
+    table = scenario_table(configs or {})
+
+    t0 = time.perf_counter()
+    if args.from_outputs:
+        panel = read_artifact(serving_dir(), 'panel_clean')
+    else:
+        from module_build import build_panel
+
+        panel = build_panel()
+    t1 = time.perf_counter()
+    bounds = load_bounds(args.freeze_bounds) if args.freeze_bounds else None
+    results = evaluate_scenarios(panel, table, bounds=bounds, n_jobs=args.jobs, chunk_size=args.chunk_size)
+    t2 = time.perf_counter()
+    write_artifact(results, args.outdir, 'scenarios')
+
+    print(scenario_summary(results).to_string(index=False))
+    print(f'{len(table)} scenarios x {len(panel)} country-years: panel {t1 - t0:.1f}s, scenarios {t2 - t1:.2f}s')
+    print(f'Scenario outputs written to {args.outdir}')
+
+
+if __name__ == '__main__':
+    main()
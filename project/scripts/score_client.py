@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Score what-if rows against a running score_service.py (rows from a CSV/JSON file or --row)."""
+from pathlib import Path
+import argparse
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pandas as pd
+
+# Local import path for project/src
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / 'src'
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from module_service import DEFAULT_HOST, DEFAULT_PORT, MAX_BATCH_ROWS
+
+
+def _value(text: str):
+    # --row values: numbers as numbers, null as null, anything else as text ('yes', 'MEX')
+    if text.lower() in ('null', 'none', ''):
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def read_rows(path: Path) -> list[dict]:
+    # CSV: one row per line, empty cells are left out (the published value is kept);
+    # JSON: a list of objects or {"rows": [...]}
+    if path.suffix.lower() == '.json':
+        data = json.loads(path.read_text(encoding='utf-8'))
+        return data['rows'] if isinstance(data, dict) else data
+    df = pd.read_csv(path)
+    return [{k: v for k, v in row.items() if pd.notna(v)} for row in df.to_dict('records')]
+
+
+def post(url: str, payload: dict, timeout: float = 60.0) -> dict:
+    req = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                 headers={'Content-Type': 'application/json'}, method='POST')
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        message = json.loads(e.read() or b'{}').get('error', e.reason)
+        raise SystemExit(f'Service error {e.code}: {message}') from None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('input', nargs='?', type=Path, help='CSV or JSON file of rows')
+    parser.add_argument('--row', action='append', default=[],
+                        help='One row as comma-separated field=value, e.g. iso3=MEX,year=2020,SPAR_total=80')
+    parser.add_argument('--url', default=f'http://{DEFAULT_HOST}:{DEFAULT_PORT}')
+    parser.add_argument('--lambdas', help='Comma-separated penalty lambdas (default: the service\'s)')
+    parser.add_argument('--batch-size', type=int, default=1000, help=f'Rows per request (at most {MAX_BATCH_ROWS})')
+    parser.add_argument('--csv', action='store_true', help='Print CSV instead of a table')
+    args = parser.parse_args()
+
+    rows = read_rows(args.input) if args.input else []
+    rows += [{k: _value(v) for k, v in (item.split('=', 1) for item in spec.split(','))} for spec in args.row]
+    if not rows:
+        parser.error('no rows: give an input file or --row')
+    payload = {}
+    if args.lambdas:
+        payload['lambdas'] = [float(x) for x in args.lambdas.split(',')]
+
+    size = max(1, min(args.batch_size, MAX_BATCH_ROWS))
+    results, service_seconds = [], 0.0
+    t0 = time.perf_counter()
+    for start in range(0, len(rows), size):
+        out = post(args.url.rstrip('/') + '/score', {**payload, 'rows': rows[start:start + size]})
+        results.extend(out['rows'])
+        service_seconds += out['seconds']
+    elapsed = time.perf_counter() - t0
+    out = pd.DataFrame(results)
+    if args.csv:
+        out.to_csv(sys.stdout, index=False)
+    else:
+        print(out.to_string(index=False))
+    print(f'{len(out)} rows in {elapsed * 1000:.1f} ms ({service_seconds * 1000:.1f} ms scoring)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
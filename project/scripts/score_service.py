@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Local HTTP/JSON service scoring what-if country-year rows with frozen normalization bounds."""
+from pathlib import Path
+import argparse
+import sys
+
+# Local import path for project/src
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / 'src'
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from module_service import DEFAULT_HOST, DEFAULT_PORT, LAMBDAS, serve
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--outdir', type=Path, default=None, help='Default: the published snapshot being served')
+    parser.add_argument('--bounds', type=Path, default=None,
+                        help='Normalization bounds JSON (default: normalization_bounds.json of --outdir)')
+    parser.add_argument('--lambdas', default=','.join(str(x) for x in LAMBDAS), help='Default penalty lambdas')
+    parser.add_argument('--quiet', action='store_true', help='Do not log every request')
+    args = parser.parse_args()
+
+    lambdas = [float(x) for x in args.lambdas.split(',') if x.strip()]
+    server = serve(args.host, args.port, outdir=args.outdir, bounds_path=args.bounds, lambdas=lambdas, quiet=args.quiet)
+    info = server.scorer.info()
+    print(f"Scoring {info['rows']} panel rows from {info['source']} on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
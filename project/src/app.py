@@ -1,46 +1,275 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import os
+import time
+
+from module_output import find_artifact, list_artifacts, read_artifact
+from module_snapshot import OUTPUTS_DIR as OUTPUTS_ROOT, current_dir, read_status, start_worker
+from module_store import (
+    count_rows,
+    distinct_values,
+    get_country_series,
+    list_tables,
+    query,
+    select_rows,
+    store_path,
+    table_columns,
+    top_n,
+    value_range,
+)
 
 # Set page config
 st.set_page_config(page_title="Engagement Index", layout="wide")
 
-# Paths
-BASE_DIR = Path(__file__).resolve().parents[1]
-OUTDIR = BASE_DIR / "outputs"
+# Paths: the pipeline publishes versioned snapshots under outputs/ in the background; every
+# rerun serves the current one (or outputs/ itself when no snapshot was published)
+SNAPSHOT = current_dir(OUTPUTS_ROOT)
+OUTDIR = SNAPSHOT or OUTPUTS_ROOT
+STATUS_POLL_SECONDS = 5
+
+# Download preference: human-readable CSV variants first, then the Parquet file itself
+DOWNLOAD_ORDER = ["csv.gz", "csv.zst", "csv", "parquet"]
+MIME_TYPES = {
+    "csv": "text/csv",
+    "csv.gz": "application/gzip",
+    "csv.zst": "application/zstd",
+    "parquet": "application/vnd.apache.parquet",
+}
+PAGE_SIZES = [50, 100, 500, 1000]
+# st.download_button cannot stream: whatever it is given (bytes, a file handle or a deferred
+# callable) is read whole into the server's memory on click. Larger files are not offered.
+MAX_DOWNLOAD_BYTES = int(float(os.getenv("IECGGS_MAX_DOWNLOAD_MB", "200")) * 2**20)
+
+
+def file_signature(path):
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+@st.cache_data(max_entries=16, show_spinner="Loading artifact...")
+def load_artifact(outdir, name, mtime_ns, size):
+    # The directory, mtime and size only key the cache: a rewritten artifact or a new
+    # snapshot is parsed again
+    return read_artifact(Path(outdir), name)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def filter_rows(outdir, name, mtime_ns, size, countries, year_range, flags):
+    # Positions of the rows matching the filters; pages are sliced from these
+    df = load_artifact(outdir, name, mtime_ns, size)
+    mask = np.ones(len(df), dtype=bool)
+    if countries:
+        mask &= df["country"].isin(countries).to_numpy()
+    if year_range is not None:
+        years = df["year"].to_numpy()
+        mask &= (years >= year_range[0]) & (years <= year_range[1])
+    for flag in flags:
+        mask &= df[flag].fillna(False).to_numpy(dtype=bool)
+    return np.flatnonzero(mask)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def store_page(outdir, name, store_sig, countries, year_range, flags, limit, offset):
+    # One filtered page straight from the embedded store (indexed on iso3/year and flags)
+    n = count_rows(outdir, name, countries=countries, year_range=year_range, flags=flags)
+    page = select_rows(outdir, name, countries=countries, year_range=year_range, flags=flags, limit=limit, offset=offset)
+    return n, page
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def store_filters(outdir, name, store_sig):
+    # Filter widgets' options: distinct countries, year bounds and flag columns of a stored table
+    columns = table_columns(outdir, name)
+    countries = distinct_values(outdir, name, "country") if "country" in columns else []
+    years = value_range(outdir, name, "year") if "year" in columns else (None, None)
+    return columns, countries, years, [c for c in columns if c.startswith("flag_")]
+
+
+def file_reader(path):
+    # Deferred download: the file is read only when the button is clicked (and closed right away)
+    return lambda: Path(path).read_bytes()
+
+
+def filter_widgets(name, countries, years, flag_columns):
+    cols = st.columns(3)
+    selected = ()
+    if countries:
+        selected = tuple(cols[0].multiselect("Country", countries, key=f"{name}_country"))
+    year_range = None
+    lo, hi = years
+    if lo is not None and hi is not None and int(lo) < int(hi):
+        year_range = cols[1].slider("Year", int(lo), int(hi), (int(lo), int(hi)), key=f"{name}_year")
+    flags = ()
+    if flag_columns:
+        flags = tuple(cols[2].multiselect("Only rows where", flag_columns, key=f"{name}_flags"))
+    return selected, year_range, flags
+
+
+def page_widgets(name, n_rows):
+    page_cols = st.columns(2)
+    page_size = page_cols[0].selectbox("Rows per page", PAGE_SIZES, key=f"{name}_page_size")
+    n_pages = max(1, -(-n_rows // page_size))
+    page = page_cols[1].number_input("Page", min_value=1, max_value=n_pages, value=1, key=f"{name}_page")
+    return page, n_pages, page_size
+
+
+def download_buttons(name, entry):
+    # First preferred format within MAX_DOWNLOAD_BYTES (e.g. the Parquet file when the CSV is too big)
+    files = {f: entry["files"][f] for f in DOWNLOAD_ORDER if f in entry["files"]}
+    fmt = next((f for f, info in files.items() if info.get("bytes", 0) <= MAX_DOWNLOAD_BYTES), None)
+    if fmt is None and files:
+        sizes = ", ".join(f"{info['path']} ({info.get('bytes', 0) / 2**20:.0f} MB)" for info in files.values())
+        st.warning(f"Too large to download through the app (limit {MAX_DOWNLOAD_BYTES / 2**20:.0f} MB, "
+                   f"IECGGS_MAX_DOWNLOAD_MB): {sizes} in {OUTDIR}")
+    if fmt is not None:
+        path = OUTDIR / entry["files"][fmt]["path"]
+        st.download_button(
+            label=f"Download {path.name}",
+            data=file_reader(path),
+            file_name=path.name,
+            mime=MIME_TYPES[fmt],
+            key=f"{name}_download"
+        )
+
+
+def show_stored(name, entry, n_total):
+    # Tables in the store are filtered and paged in SQL; only the visible page is loaded
+    store_sig = file_signature(store_path(OUTDIR))
+    _, countries, years, flag_columns = store_filters(str(OUTDIR), name, store_sig)
+    countries, year_range, flags = filter_widgets(name, countries, years, flag_columns)
+    n_rows, _ = store_page(str(OUTDIR), name, store_sig, countries, year_range, flags, 0, 0)
+    page, n_pages, page_size = page_widgets(name, n_rows)
+    _, df = store_page(str(OUTDIR), name, store_sig, countries, year_range, flags, page_size, (page - 1) * page_size)
+    st.caption(f"{n_rows} of {n_total} rows match; page {page} of {n_pages}")
+    st.dataframe(df, hide_index=True)
+
+    download_buttons(name, entry)
+    if n_rows < n_total:
+        st.download_button(
+            label=f"Download filtered rows ({n_rows}) as CSV",
+            data=lambda: select_rows(OUTDIR, name, countries=countries, year_range=year_range, flags=flags).to_csv(index=False),
+            file_name=f"{name}_filtered.csv",
+            mime="text/csv",
+            key=f"{name}_download_filtered"
+        )
+
+
+def show_artifact(name, entry):
+    found = find_artifact(OUTDIR, name)
+    if found is None:
+        st.warning(f"Artifact files for {name} are missing.")
+        return
+    mtime_ns, size = file_signature(found[1])
+    df = load_artifact(str(OUTDIR), name, mtime_ns, size)
+
+    # Server-side filters
+    countries, years, flag_columns = [], (None, None), [c for c in df.columns if c.startswith("flag_")]
+    if "country" in df.columns:
+        countries = sorted(df["country"].dropna().astype(str).unique())
+    if "year" in df.columns and df["year"].notna().any():
+        years = (df["year"].min(), df["year"].max())
+    countries, year_range, flags = filter_widgets(name, countries, years, flag_columns)
+    rows = filter_rows(str(OUTDIR), name, mtime_ns, size, countries, year_range, flags)
+
+    # Paging
+    page, n_pages, page_size = page_widgets(name, len(rows))
+    start = (page - 1) * page_size
+    st.caption(f"{len(rows)} of {len(df)} rows match; page {page} of {n_pages}")
+    st.dataframe(df.iloc[rows[start:start + page_size]], hide_index=True)
+
+    download_buttons(name, entry)
+    if len(rows) < len(df):
+        st.download_button(
+            label=f"Download filtered rows ({len(rows)}) as CSV",
+            data=lambda: df.iloc[rows].to_csv(index=False),
+            file_name=f"{name}_filtered.csv",
+            mime="text/csv",
+            key=f"{name}_download_filtered"
+        )
+
+
+def show_queries(store_sig):
+    # Ranking of one year and one country's series, served by the store indexes
+    columns, countries, years, _ = store_filters(str(OUTDIR), "IECGGS_penalized", store_sig)
+    lambdas = [c.removeprefix("IECGGS_adj_lambda_") for c in columns if c.startswith("IECGGS_adj_lambda_")]
+    latest = query(OUTDIR, "SELECT MAX(year) AS year FROM IECGGS_penalized WHERE IECGGS_raw IS NOT NULL")["year"].iloc[0]
+    cols = st.columns(3)
+    year = cols[0].number_input("Year", min_value=int(years[0]), max_value=int(years[1]),
+                                value=int(latest if pd.notna(latest) else years[1]), key="top_year")
+    lam = cols[1].selectbox("Penalty λ", ["none"] + lambdas, key="top_lambda")
+    n = cols[2].number_input("Top", min_value=1, max_value=500, value=10, key="top_n")
+    st.dataframe(top_n(year, OUTDIR, lam=None if lam == "none" else lam, n=n), hide_index=True)
+    iso3 = st.selectbox("Country series", distinct_values(OUTDIR, "IECGGS_penalized", "iso3"), key="series_iso3")
+    series = get_country_series(iso3, OUTDIR, columns=["year", "IECGGS_raw"] + [f"IECGGS_adj_lambda_{x}" for x in lambdas])
+    st.line_chart(series.set_index("year"))
+
+
+@st.fragment(run_every=STATUS_POLL_SECONDS)
+def show_status():
+    # Recompute status of the background pipeline; reloads the page once a new snapshot is published
+    if current_dir(OUTPUTS_ROOT) != SNAPSHOT:
+        st.rerun()
+    status = read_status(OUTPUTS_ROOT)
+    label = f"snapshot {SNAPSHOT.name}" if SNAPSHOT is not None else f"outputs in {OUTDIR}"
+    state = status.get("state")
+    cols = st.columns([4, 1])
+    if state == "running":
+        started = time.strftime("%H:%M:%S", time.localtime(status.get("started") or time.time()))
+        cols[0].info(f"Recomputing in the background since {started}; showing {label}.")
+    elif state == "failed":
+        cols[0].warning(f"Last recompute failed ({status.get('error')}); showing {label}.")
+    else:
+        cols[0].caption(f"Showing {label}.")
+    if cols[1].button("Recompute now", disabled=state == "running", key="recompute"):
+        start_worker(OUTPUTS_ROOT)
+        st.rerun()
+
 
 st.title("Engagement Index Results")
 
 st.markdown("""
 This application displays the results of the Engagement Index pipeline.
-The data is processed on startup and the resulting CSV files are available below.
+The pipeline runs in the background: the last published results are shown meanwhile and the
+page reloads when a new version is ready. Artifacts are loaded when their section is opened.
 """)
 
+show_status()
+
 if not OUTDIR.exists():
     st.error(f"Output directory not found: {OUTDIR}")
 else:
-    # List CSV files
-    csv_files = sorted(list(OUTDIR.glob("*.csv")))
-    
-    if not csv_files:
-        st.warning("No CSV files found in output directory.")
+    # Artifacts recorded in the pipeline manifest
+    artifacts = list_artifacts(OUTDIR)
+    stored = list_tables(OUTDIR)
+
+    if "IECGGS_penalized" in stored:
+        queries = st.expander("Rankings and country series", expanded=False, key="queries_open", on_change="rerun")
+        with queries:
+            if queries.open:
+                try:
+                    show_queries(file_signature(store_path(OUTDIR)))
+                except Exception as e:
+                    st.error(f"Error querying the store: {e}")
+
+    if not artifacts and read_status(OUTPUTS_ROOT).get("state") == "running":
+        st.info("The first results are being computed; they will appear here when ready.")
+    elif not artifacts:
+        st.warning("No artifacts found in output directory (manifest.json missing or empty).")
     else:
-        st.write(f"Found {len(csv_files)} CSV files.")
-        
-        for csv_file in csv_files:
-            with st.expander(csv_file.name, expanded=False):
+        st.write(f"Found {len(artifacts)} artifacts.")
+
+        for name, entry in sorted(artifacts.items()):
+            expander = st.expander(f"{name} ({entry['rows']} rows)", expanded=False, key=f"{name}_open", on_change="rerun")
+            with expander:
+                # Only an open section reads its artifact
+                if not expander.open:
+                    continue
                 try:
-                    df = pd.read_csv(csv_file)
-                    st.dataframe(df)
-                    
-                    # Download button
-                    with open(csv_file, "rb") as f:
-                        st.download_button(
-                            label=f"Download {csv_file.name}",
-                            data=f,
-                            file_name=csv_file.name,
-                            mime="text/csv"
-                        )
+                    if name in stored:
+                        show_stored(name, entry, stored[name]["rows"])
+                    else:
+                        show_artifact(name, entry)
                 except Exception as e:
-                    st.error(f"Error reading {csv_file.name}: {e}")
+                    st.error(f"Error reading {name}: {e}")
@@ -1,60 +1,55 @@
+import argparse
+import os
+import time
 from pathlib import Path
 
+import pandas as pd
+
 from module_build import build_panel
+from module_cache import cache_stats, clear_cache
+from module_dag import Stage, run_dag
+from module_ingest import GHS_PATH, LOAD_ERRORS, SOURCES, load_all, load_ghs
+from module_output import artifact_paths, write_artifact
+from module_incremental import BOUNDS_NAME, IncrementalState, load_bounds, save_bounds, update_index, update_subindices
+from module_snapshot import publish_snapshot
+from module_store import COVERAGE_PREFIX, STORE_TABLES, store_frame, store_path
+from module_profile import RUN_REPORT_NAME, load_run_report, start_profile, stop_profile, write_prometheus, write_run_report
 from module_coverage import build_coverage_reports
+from module_sensitivity import sensitivity_grid
+from module_validation import validate_against_ghs
 from module_index import (
+    THRESHOLD_ENV,
     compute_subindices,
     compute_index,
     apply_penalty,
+    normalization_bounds,
     sensitivity_table,
 )
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 OUTDIR = BASE_DIR / "outputs"
 
+OUTPUT_ENV = ["IECGGS_OUTPUT_FORMATS"]
+IMPUTE_ENV = ["IECGGS_IMPUTE_MAX_GAP", "IECGGS_IMPUTE_DIRECTION"]
+VALIDATION_ENV = ["IECGGS_GHS_INDICATORS"]
+
+FLAG_COLUMNS = [
+    "iso3",
+    "year",
+    "n_reg_obs",
+    "n_dom_obs",
+    "n_part_obs",
+    "n_pillars_ok",
+    "flag_pillar_reg_ok",
+    "flag_pillar_dom_ok",
+    "flag_pillar_part_ok",
+    "flag_iecgss_ok",
+]
 
-def run_pipeline():
-    OUTDIR.mkdir(parents=True, exist_ok=True)
-    panel = build_panel()
-
-    # A) Coverage audit from pre-index panel
-    build_coverage_reports(panel, OUTDIR)
-
-    sub = compute_subindices(panel)
-    idx = compute_index(panel, sub)
-    pen = apply_penalty(idx)
-    sens = sensitivity_table(idx)
-
-    # Outputs principales
-    panel.to_csv(OUTDIR / "panel_clean.csv", index=False)
-    sub.to_csv(OUTDIR / "subindices.csv", index=False)
-    idx[["country", "year", "IECGGS_raw"]].to_csv(OUTDIR / "IECGGS_raw.csv", index=False)
-    pen.to_csv(OUTDIR / "IECGGS_penalized.csv", index=False)
-    sens.to_csv(OUTDIR / "sensitivity.csv", index=False)
-
-    # A) Eligibility flags output
-    panel_with_flags = panel.merge(
-        idx[
-            [
-                "country",
-                "year",
-                "n_reg_obs",
-                "n_dom_obs",
-                "n_part_obs",
-                "n_pillars_ok",
-                "flag_pillar_reg_ok",
-                "flag_pillar_dom_ok",
-                "flag_pillar_part_ok",
-                "flag_iecgss_ok",
-            ]
-        ],
-        on=["country", "year"],
-        how="left",
-    )
-    panel_with_flags.to_csv(OUTDIR / "panel_with_flags.csv", index=False)
 
+def write_data_dictionary(path):
     # Data dictionary minimal
-    with (OUTDIR / "data_dictionary.md").open("w", encoding="utf-8") as f:
+    with Path(path).open("w", encoding="utf-8") as f:
         f.write("Variables:\n")
         f.write("- SPAR_total: puntaje RSI (0-100)\n")
         f.write("- CHE_GDP: gasto corriente en salud / PIB\n")
@@ -65,10 +60,188 @@ def run_pipeline():
         f.write("- E_reg / E_dom / E_part: subíndices en 0-1\n")
         f.write("- IECGGS_raw: índice base (0-1)\n")
         f.write("- art7_excluded: 0/1 (exclusión Art.7)\n")
+        f.write("- imputed: máscara de bits de valores asignados al año más cercano (regla 5.4); bit por variable en imputation_report\n")
         f.write("- IECGGS_adj_lambda_{x}: índice penalizado con λ=x\n")
         f.write("- flag_pillar_*_ok: elegibilidad booleana por pilar\n")
         f.write("- flag_iecgss_ok: elegibilidad booleana del índice global\n")
 
 
+def pipeline_stages(outdir, use_cache=None, refresh_cache=False, incremental=False, frozen_bounds=None):
+    # `incremental` recomputes only new or changed rows of the subindices/index stages;
+    # `frozen_bounds` (a normalization_bounds.json of a reference vintage) fixes the scales
+    outdir = Path(outdir)
+    state = IncrementalState() if incremental else None
+    bounds_files = [Path(frozen_bounds)] if frozen_bounds else []
+    source_files = [fp for _, files, _ in SOURCES.values() for fp in files]
+    store = [store_path(outdir)]
+
+    def publish(df, name):
+        # Artifact files plus, for the queried tables, the embedded store (outputs/iecggs.sqlite)
+        write_artifact(df, outdir, name)
+        if name in STORE_TABLES or name.startswith(COVERAGE_PREFIX):
+            store_frame(df, outdir, name)
+
+    def ingest():
+        return load_all(use_cache=use_cache, refresh=refresh_cache)
+
+    def panel(ingest):
+        panel = build_panel(ingest)
+        publish(panel, "panel_clean")
+        if "join_report" in panel.attrs:
+            write_artifact(pd.DataFrame(panel.attrs["join_report"]), outdir, "join_report")
+        if "imputation_report" in panel.attrs:
+            write_artifact(pd.DataFrame(panel.attrs["imputation_report"]), outdir, "imputation_report")
+        return panel
+
+    def coverage(panel):
+        # A) Coverage audit from pre-index panel
+        reports = build_coverage_reports(panel, outdir)
+        for name, report in reports.items():
+            store_frame(report, outdir, f"{COVERAGE_PREFIX}{name}")
+        return reports
+
+    def subindices(panel):
+        bounds = load_bounds(frozen_bounds) if frozen_bounds else None
+        if state is not None:
+            sub, bounds, _ = update_subindices(panel, state, bounds)
+        else:
+            bounds = bounds or normalization_bounds(panel)
+            sub = compute_subindices(panel, bounds)
+        save_bounds(outdir / BOUNDS_NAME, bounds, frozen_from=str(frozen_bounds) if frozen_bounds else None,
+                    years=[int(panel["year"].min()), int(panel["year"].max())])
+        publish(sub, "subindices")
+        return sub
+
+    def index(panel, subindices):
+        if state is not None:
+            idx, _ = update_index(panel, subindices, state)
+        else:
+            idx = compute_index(panel, subindices)
+        write_artifact(idx[["iso3", "country", "year", "IECGGS_raw"]], outdir, "IECGGS_raw")
+        # A) Eligibility flags output
+        panel_with_flags = panel.merge(idx[FLAG_COLUMNS], on=["iso3", "year"], how="left", validate="one_to_one")
+        publish(panel_with_flags, "panel_with_flags")
+        return idx
+
+    def penalty(index):
+        pen = apply_penalty(index)
+        publish(pen, "IECGGS_penalized")
+        return pen
+
+    def sensitivity(index):
+        sens = sensitivity_table(index)
+        write_artifact(sens, outdir, "sensitivity")
+        _, ranks = sensitivity_grid(index)
+        write_artifact(ranks, outdir, "sensitivity_ranks")
+        return sens
+
+    def validation(index):
+        # External validation only: GHS Index scores never feed the index
+        ghs = load_ghs(use_cache=use_cache, refresh=refresh_cache)
+        report = validate_against_ghs(index, ghs)
+        write_artifact(report, outdir, "validation_ghs")
+        return report
+
+    def data_dictionary():
+        write_data_dictionary(outdir / "data_dictionary.md")
+
+    def targets(*names):
+        return [path for name in names for path in artifact_paths(outdir, name)]
+
+    coverage_targets = targets(
+        *(f"coverage_report_by_{k}" for k in ("variable", "country", "year", "pillar", "country_pillar", "year_pillar"))
+    ) + [outdir / "coverage_summary.md"]
+    return [
+        Stage("ingest", ingest, files=source_files),
+        Stage("panel", panel, deps=["ingest"], env=IMPUTE_ENV + OUTPUT_ENV,
+              targets=targets("panel_clean", "join_report", "imputation_report") + store),
+        Stage("coverage", coverage, deps=["panel"], env=OUTPUT_ENV, targets=coverage_targets + store),
+        Stage("subindices", subindices, deps=["panel"], files=bounds_files,
+              env=list(THRESHOLD_ENV.values()) + OUTPUT_ENV,
+              targets=targets("subindices") + store + [outdir / BOUNDS_NAME]),
+        Stage("index", index, deps=["panel", "subindices"], env=list(THRESHOLD_ENV.values()) + OUTPUT_ENV,
+              targets=targets("IECGGS_raw", "panel_with_flags") + store),
+        Stage("penalty", penalty, deps=["index"], env=OUTPUT_ENV, targets=targets("IECGGS_penalized") + store),
+        Stage("sensitivity", sensitivity, deps=["index"], env=OUTPUT_ENV, targets=targets("sensitivity", "sensitivity_ranks")),
+        Stage("validation", validation, deps=["index"], files=[GHS_PATH], env=VALIDATION_ENV + OUTPUT_ENV,
+              targets=targets("validation_ghs")),
+        Stage("data_dictionary", data_dictionary, targets=[outdir / "data_dictionary.md"]),
+    ]
+
+
+def run_pipeline(use_cache=None, refresh_cache=False, force=False, trace_memory=None, prometheus=None,
+                 incremental=None, frozen_bounds=None, outdir=None):
+    outdir = Path(outdir) if outdir is not None else OUTDIR
+    outdir.mkdir(parents=True, exist_ok=True)
+    if incremental is None:
+        incremental = os.getenv("IECGGS_INCREMENTAL", "0") == "1"
+    frozen_bounds = frozen_bounds or os.getenv("IECGGS_FROZEN_BOUNDS") or None
+    # Bypassing or refreshing the ingest cache implies re-reading the sources
+    if not force and (use_cache is False or refresh_cache):
+        force = ["ingest"]
+    stages = pipeline_stages(outdir, use_cache=use_cache, refresh_cache=refresh_cache, incremental=incremental,
+                             frozen_bounds=frozen_bounds)
+    start_profile(trace_memory=trace_memory)
+    t0 = time.perf_counter()
+    try:
+        _, report = run_dag(stages, force=force)
+    finally:
+        stop_profile()
+    # Per-stage/reader timings, memory and row counts: outputs/run_report.json (+ Prometheus text)
+    run_report = write_run_report(outdir, report, extra={
+        "seconds": round(time.perf_counter() - t0, 4),
+        "cache": cache_stats(),
+        "load_errors": dict(LOAD_ERRORS),
+    })
+    prometheus = prometheus or os.getenv("IECGGS_PROMETHEUS_FILE")
+    if prometheus:
+        write_prometheus(prometheus, run_report)
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the IECGGS pipeline")
+    parser.add_argument("--no-cache", action="store_true", help="Parse every source file, bypassing the ingest cache")
+    parser.add_argument("--refresh-cache", action="store_true", help="Re-parse every source and overwrite the ingest cache")
+    parser.add_argument("--clear-cache", action="store_true", help="Delete the ingest cache before running")
+    parser.add_argument("--force", action="store_true", help="Recompute every stage even if its inputs are unchanged")
+    parser.add_argument("--trace-memory", action="store_true", help="Record Python allocation peaks per span (tracemalloc; slower)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Recompute subindices/index only for new or changed country-years (IECGGS_INCREMENTAL=1)")
+    parser.add_argument("--freeze-bounds", metavar="PATH",
+                        help="Normalize with the bounds in PATH, e.g. a saved outputs/normalization_bounds.json (IECGGS_FROZEN_BOUNDS)")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Publish the run as a new versioned snapshot (outputs/snapshots, outputs/current) for the app")
+    parser.add_argument("--prometheus", metavar="PATH", help="Also write run metrics in Prometheus text format to PATH")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    run_pipeline()
\ No newline at end of file
+    args = parse_args()
+    if args.clear_cache:
+        clear_cache()
+    kwargs = dict(use_cache=False if args.no_cache else None, refresh_cache=args.refresh_cache, force=args.force,
+                  trace_memory=args.trace_memory or None, prometheus=args.prometheus,
+                  incremental=args.incremental or None, frozen_bounds=args.freeze_bounds)
+    outdir = OUTDIR
+    if args.snapshot:
+        runs = []
+        snapshot = publish_snapshot(lambda build_dir: runs.append(run_pipeline(outdir=build_dir, **kwargs)))
+        if snapshot is None:
+            print("Another snapshot run is in progress; nothing to do.")
+            raise SystemExit(0)
+        report, outdir = runs[0], snapshot
+        print(f"Published snapshot {snapshot.name}")
+    else:
+        report = run_pipeline(**kwargs)
+    for row in report:
+        print(f"Stage {row['stage']:<16} {row['status']:<8} {row['seconds']:.3f}s")
+    skipped = [row["stage"] for row in report if row["status"] == "skipped"]
+    print(f"Skipped {len(skipped)}/{len(report)} stages (inputs unchanged): {', '.join(skipped) or '-'}")
+    stats = cache_stats()
+    print(f"Ingest cache: {stats['hits']} hits, {stats['misses']} misses, {stats['writes']} writes")
+    run_report = load_run_report(outdir / RUN_REPORT_NAME) or {}
+    for row in run_report.get("regressions", []):
+        print(f"WARNING: span {row['span']} took {row['seconds']:.3f}s (previous run {row['previous_seconds']:.3f}s)")
+    for name, err in LOAD_ERRORS.items():
+        print(f"WARNING: source '{name}' failed to load and was left empty: {err}")
\ No newline at end of file
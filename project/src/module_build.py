@@ -4,57 +4,68 @@ import numpy as np
 from utils import standardize_country_column, coerce_year_column, map_discrete_policy_values
 from module_ingest import load_all
 from module_participation import clean_participation
+from module_join import assemble_panel
+from module_impute import impute_nearest_year
+from module_profile import profiled, span
+from module_schema import typed_panel
 
 
-def build_panel() -> pd.DataFrame:
-    data = load_all()
-    spar = data['spar'].copy()
-    che = data['che_gdp'].copy()
-    uhc = data['uhc'].copy()
+@profiled('build.panel')
+def build_panel(data=None, agg_rules=None, impute_max_gap=None, impute_direction=None) -> pd.DataFrame:
+    if data is None:
+        data = load_all()
+    # Sources are read, not modified: new columns go to derived frames
+    spar = data['spar']
+    che = data['che_gdp']
+    uhc = data['uhc']
     policy, plan, strategy = data['policy_plan_strategy']
-    rth = data['right_to_health'].copy()
-    excl = data['exclusions'].copy()
-    particip_raw = data['participation_raw'].copy()
+    rth = data['right_to_health']
+    excl = data['exclusions']
+    particip_raw = data['participation_raw']
 
     # Participation cleaning
-    particip = clean_participation(particip_raw)
-
-    # Standardize all country names
-    for df in [spar, che, uhc, policy, plan, strategy, rth, excl, particip]:
-        if 'country' in df.columns and 'iso3' not in df.columns:
-            df['country'] = df['country'].astype(str)
+    with span('build.clean_participation') as s:
+        s.inputs(particip_raw)
+        particip = clean_participation(particip_raw)
+        s.outputs(particip)
 
     # SPAR reported dummy
-    spar['SPAR_reported'] = (~spar['SPAR_total'].isna()).astype(int)
+    spar = spar.assign(SPAR_reported=spar['SPAR_total'].notna().astype(int))
 
     # Map discrete scales for policy/plan/strategy
-    for name, d in [('Policy_UHC', policy), ('Plan_UHC', plan), ('Strategy_UHC', strategy)]:
-        d[name] = d[name].apply(map_discrete_policy_values)
-
-    # Merge step-by-step into a panel on country-year
-    dfs = [spar[['country','year','SPAR_total','SPAR_reported']],
-           che[['country','year','CHE_GDP']],
-           uhc[['country','year','UHC_index']],
-           policy[['country','year','Policy_UHC']],
-           plan[['country','year','Plan_UHC']],
-           strategy[['country','year','Strategy_UHC']],
-           rth[['country','year','Right_to_health']],
-           particip[['country','year','participation_event','leadership_event','decision_event']],
-           excl[['country','year','art7_excluded']]
-           ]
-
-    # Outer merge to keep all available years
-    panel = None
-    for d in dfs:
-        if panel is None:
-            panel = d.copy()
-        else:
-            panel = panel.merge(d, on=['country','year'], how='outer')
-
-    # Sort and return
-    panel = panel.sort_values(['country','year']).reset_index(drop=True)
-
-    # Imputation flag for values carried to nearest year (rule 5.4): here we do not interpolate; leave NA.
-    panel['imputed'] = 0  # placeholder; if nearest-year assignment implemented, set 1 for those rows
+    with span('build.map_discrete') as s:
+        s.inputs([policy, plan, strategy])
+        policy, plan, strategy = (
+            d.assign(**{name: map_discrete_policy_values(d[name])})
+            for name, d in [('Policy_UHC', policy), ('Plan_UHC', plan), ('Strategy_UHC', strategy)]
+        )
+
+    # Deduplicate every source to one row per (iso3, year) and align them on a single key index
+    sources = {
+        'spar': spar[['country','iso3','year','SPAR_total','SPAR_reported']],
+        'che_gdp': che[['country','year','CHE_GDP']],
+        'uhc': uhc[['country','year','UHC_index']],
+        'policy': policy[['country','year','Policy_UHC']],
+        'plan': plan[['country','year','Plan_UHC']],
+        'strategy': strategy[['country','year','Strategy_UHC']],
+        'right_to_health': rth[['country','year','Right_to_health']],
+        'participation': particip[['country','year','participation_event','leadership_event','decision_event']],
+        'exclusions': excl[['country','year','art7_excluded']],
+    }
+    with span('build.assemble_panel') as s:
+        s.inputs(sources)
+        panel, join_report = assemble_panel(sources, agg_rules=agg_rules)
+        s.outputs(panel)
+    panel.attrs['join_report'] = join_report.to_dict('records')
+
+    # Nearest-year assignment (rule 5.4); `imputed` is a per-variable bitmask (module_impute.impute_bits)
+    with span('build.impute') as s:
+        s.inputs(panel)
+        panel, imputation_report = impute_nearest_year(panel, max_gap=impute_max_gap, direction=impute_direction)
+        s.outputs(panel)
+    panel.attrs['imputation_report'] = imputation_report.to_dict('records')
+
+    # Compact schema (categorical keys, int16 year, float32 policy codes, Int8 indicators)
+    panel = typed_panel(panel)
 
     return panel
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from utils import CACHE_DIR
+
+try:
+    import pyarrow  # noqa: F401
+    _HAS_ARROW = True
+except Exception:  # fallback to pickle if Parquet support is not available
+    _HAS_ARROW = False
+
+
+INGEST_CACHE_DIR = CACHE_DIR / 'ingest'
+CACHE_FORMAT_VERSION = 1
+
+CACHE_STATS = {'hits': 0, 'misses': 0, 'writes': 0, 'errors': 0, 'sources': {}}
+
+
+def file_digest(path: str | Path) -> str:
+    path = Path(path)
+    if not path.exists():
+        return 'missing'
+    h = hashlib.sha256()
+    with path.open('rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(name: str, files, version) -> str:
+    h = hashlib.sha256()
+    h.update(f'{name}|{version}|{CACHE_FORMAT_VERSION}'.encode())
+    for fp in files:
+        h.update(f'|{Path(fp).name}:{file_digest(fp)}'.encode())
+    return h.hexdigest()[:24]
+
+
+def _entry_dir(name: str, key: str) -> Path:
+    return INGEST_CACHE_DIR / name / key
+
+
+def _write_frame(df: pd.DataFrame, base: Path) -> str:
+    if _HAS_ARROW:
+        try:
+            df.to_parquet(base.with_suffix('.parquet'), index=False)
+            return 'parquet'
+        except Exception:
+            pass  # mixed-type object columns: keep them exact with pickle
+    df.to_pickle(base.with_suffix('.pkl'))
+    return 'pickle'
+
+
+def _read_frame(base: Path, fmt: str) -> pd.DataFrame:
+    if fmt == 'parquet':
+        return pd.read_parquet(base.with_suffix('.parquet'))
+    return pd.read_pickle(base.with_suffix('.pkl'))
+
+
+def load_cached(name: str, key: str):
+    entry = _entry_dir(name, key)
+    meta_path = entry / 'meta.json'
+    if not meta_path.exists():
+        return None
+    try:
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        frames = [_read_frame(entry / f'part{i}', fmt) for i, fmt in enumerate(meta['formats'])]
+    except Exception:
+        CACHE_STATS['errors'] += 1
+        return None
+    return tuple(frames) if meta['kind'] == 'tuple' else frames[0]
+
+
+def store_cached(name: str, key: str, result) -> None:
+    frames = list(result) if isinstance(result, tuple) else [result]
+    entry = _entry_dir(name, key)
+    tmp = entry.with_name(entry.name + '.tmp')
+    try:
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        formats = [_write_frame(df, tmp / f'part{i}') for i, df in enumerate(frames)]
+        meta = {'kind': 'tuple' if isinstance(result, tuple) else 'frame', 'formats': formats}
+        (tmp / 'meta.json').write_text(json.dumps(meta), encoding='utf-8')
+        # Drop stale entries for this source, then publish the new one atomically
+        for stale in entry.parent.iterdir():
+            if stale != tmp:
+                shutil.rmtree(stale, ignore_errors=True)
+        os.replace(tmp, entry)
+        CACHE_STATS['writes'] += 1
+    except OSError:
+        CACHE_STATS['errors'] += 1
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def lookup_cached(name: str, files, version, refresh: bool = False):
+    # Returns (key, cached result or None) and records the hit/miss
+    key = cache_key(name, files, version)
+    if not refresh:
+        hit = load_cached(name, key)
+        if hit is not None:
+            CACHE_STATS['hits'] += 1
+            CACHE_STATS['sources'][name] = 'hit'
+            return key, hit
+    CACHE_STATS['misses'] += 1
+    CACHE_STATS['sources'][name] = 'refresh' if refresh else 'miss'
+    return key, None
+
+
+def mark_disabled(name: str) -> None:
+    CACHE_STATS['sources'][name] = 'disabled'
+
+
+def cached_call(name: str, reader, files, version, use_cache: bool = True, refresh: bool = False):
+    if not use_cache:
+        mark_disabled(name)
+        return reader()
+    key, hit = lookup_cached(name, files, version, refresh=refresh)
+    if hit is not None:
+        return hit
+    result = reader()
+    store_cached(name, key, result)
+    return result
+
+
+def clear_cache() -> None:
+    shutil.rmtree(INGEST_CACHE_DIR, ignore_errors=True)
+
+
+def cache_stats() -> dict:
+    return {**CACHE_STATS, 'sources': dict(CACHE_STATS['sources'])}
+
+
+def reset_cache_stats() -> None:
+    CACHE_STATS.update({'hits': 0, 'misses': 0, 'writes': 0, 'errors': 0, 'sources': {}})
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
+from module_output import write_artifact
+from module_profile import profiled, span
+
 
 PILLAR_VARIABLES = {
     'reg': ['SPAR_total'],
@@ -11,105 +15,197 @@ PILLAR_VARIABLES = {
     'sanction': ['art7_excluded'],
 }
 
+KEY_COLUMNS = ('iso3', 'country', 'year')
 
-def _missingness(series: pd.Series) -> float:
-    if len(series) == 0:
-        return 0.0
-    return float(series.isna().mean())
+# Grouping dimensions of the coverage reports: report name -> grouping column. Countries are
+# grouped on iso3, so a country is one row however its sources spell it, and keep their label.
+GROUP_KEYS = {'country': 'iso3', 'year': 'year'}
 
 
-def build_coverage_reports(panel_df: pd.DataFrame, outdir: str | Path) -> dict[str, pd.DataFrame]:
-    outdir = Path(outdir)
-    outdir.mkdir(parents=True, exist_ok=True)
+class _GroupCounts:
+    # Per-group row counts and per-variable non-missing counts, grown across chunks
+    def __init__(self, n_vars: int):
+        self.index = {}
+        self.rows = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros((0, n_vars), dtype=np.int64)
+
+    def update(self, labels: pd.Series, notna: np.ndarray) -> None:
+        codes, uniques = pd.factorize(labels, use_na_sentinel=True)
+        keep = codes >= 0  # rows without a key are left out, as groupby does
+        if not keep.any():
+            return
+        codes, notna = codes[keep], notna[keep]
+        new = [u for u in uniques if u not in self.index]
+        if new:
+            for u in new:
+                self.index[u] = len(self.index)
+            self.rows = np.concatenate([self.rows, np.zeros(len(new), dtype=np.int64)])
+            self.counts = np.vstack([self.counts, np.zeros((len(new), self.counts.shape[1]), dtype=np.int64)])
+        target = np.fromiter((self.index[u] for u in uniques), dtype=np.int64, count=len(uniques))
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        groups = target[sorted_codes[starts]]
+        self.rows[groups] += np.diff(np.r_[starts, len(sorted_codes)])
+        self.counts[groups] += np.add.reduceat(notna[order].astype(np.int64), starts, axis=0)
+
+    def sorted_labels(self):
+        labels = list(self.index)
+        order = sorted(range(len(labels)), key=lambda i: labels[i])
+        return [labels[i] for i in order], np.asarray([self.index[labels[i]] for i in order], dtype=np.int64)
+
+
+class CoverageAccumulator:
+    # Streams panel chunks into non-missing counts: one notna matrix per chunk, from which
+    # every report (variable, country, year, pillar and their cross-tabs) is a reduction
+    def __init__(self):
+        self.value_cols = None
+        self.n_rows = 0
+        self.non_missing = None
+        self.groups = {}
+        self.labels = {}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        if self.value_cols is None:
+            self.value_cols = [c for c in chunk.columns if c not in KEY_COLUMNS]
+            self.non_missing = np.zeros(len(self.value_cols), dtype=np.int64)
+            self.groups = {name: _GroupCounts(len(self.value_cols)) for name, key in GROUP_KEYS.items()
+                           if key in chunk.columns}
+        notna = chunk[self.value_cols].notna().to_numpy()
+        self.n_rows += len(chunk)
+        self.non_missing += notna.sum(axis=0)
+        for name, counts in self.groups.items():
+            counts.update(chunk[GROUP_KEYS[name]], notna)
+        if 'iso3' in chunk.columns and 'country' in chunk.columns:
+            firsts = chunk[['iso3', 'country']].dropna().drop_duplicates('iso3')
+            for iso3, country in zip(firsts['iso3'], firsts['country']):
+                self.labels.setdefault(iso3, country)
+
+    def _pillar_columns(self):
+        for pillar, cols in PILLAR_VARIABLES.items():
+            yield pillar, [self.value_cols.index(c) for c in cols if c in self.value_cols]
+
+    def by_variable(self) -> pd.DataFrame:
+        missing = self.n_rows - self.non_missing
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rate = missing / self.n_rows if self.n_rows else np.zeros(len(self.value_cols))
+        out = pd.DataFrame({
+            'variable': self.value_cols,
+            'n_rows': self.n_rows,
+            'n_non_missing': self.non_missing,
+            'n_missing': missing,
+            'missing_rate': rate,
+            'coverage_rate': 1.0 - rate,
+        })
+        return out.sort_values(['missing_rate', 'variable'], ascending=[False, True])
+
+    def _group_frame(self, name: str, labels: list) -> pd.DataFrame:
+        # Grouping column of a report, plus the country label when grouped on iso3
+        key = GROUP_KEYS[name]
+        out = pd.DataFrame({key: labels})
+        if key == 'iso3':
+            out['country'] = [self.labels.get(k) for k in labels]
+        return out
 
-    # By variable
-    var_rows = []
-    for col in panel_df.columns:
-        if col in ('country', 'year'):
-            continue
-        s = panel_df[col]
-        var_rows.append({
-            'variable': col,
-            'n_rows': len(s),
-            'n_non_missing': int(s.notna().sum()),
-            'n_missing': int(s.isna().sum()),
-            'missing_rate': _missingness(s),
-            'coverage_rate': 1.0 - _missingness(s),
+    def by_group(self, name: str) -> pd.DataFrame:
+        counts = self.groups[name]
+        labels, idx = counts.sorted_labels()
+        out = self._group_frame(name, labels).assign(**{
+            'n_non_missing_cells': counts.counts[idx].sum(axis=1),
+            'n_total_cells': counts.rows[idx] * len(self.value_cols),
         })
-    by_variable = pd.DataFrame(var_rows).sort_values(['missing_rate', 'variable'], ascending=[False, True])
-
-    # By country
-    value_cols = [c for c in panel_df.columns if c not in ('country', 'year')]
-    by_country = (
-        panel_df.assign(_obs=panel_df[value_cols].notna().sum(axis=1), _total=len(value_cols))
-        .groupby('country', as_index=False)[['_obs', '_total']]
-        .sum()
-    )
-    by_country['coverage_rate'] = by_country['_obs'] / by_country['_total']
-    by_country['missing_rate'] = 1.0 - by_country['coverage_rate']
-    by_country = by_country.rename(columns={'_obs': 'n_non_missing_cells', '_total': 'n_total_cells'})
-
-    # By year
-    by_year = (
-        panel_df.assign(_obs=panel_df[value_cols].notna().sum(axis=1), _total=len(value_cols))
-        .groupby('year', as_index=False)[['_obs', '_total']]
-        .sum()
-    )
-    by_year['coverage_rate'] = by_year['_obs'] / by_year['_total']
-    by_year['missing_rate'] = 1.0 - by_year['coverage_rate']
-    by_year = by_year.rename(columns={'_obs': 'n_non_missing_cells', '_total': 'n_total_cells'})
-
-    # By pillar
-    pillar_rows = []
-    for pillar, cols in PILLAR_VARIABLES.items():
-        existing_cols = [c for c in cols if c in panel_df.columns]
-        if not existing_cols:
-            pillar_rows.append({
+        out['coverage_rate'] = out['n_non_missing_cells'] / out['n_total_cells']
+        out['missing_rate'] = 1.0 - out['coverage_rate']
+        return out
+
+    def by_pillar(self) -> pd.DataFrame:
+        rows = []
+        for pillar, cols in self._pillar_columns():
+            n_total = self.n_rows * len(cols)
+            n_non_missing = int(self.non_missing[cols].sum()) if cols else 0
+            coverage = float(n_non_missing / n_total) if n_total else 0.0
+            rows.append({
                 'pillar': pillar,
-                'n_variables': 0,
-                'n_total_cells': 0,
-                'n_non_missing_cells': 0,
-                'coverage_rate': 0.0,
-                'missing_rate': 1.0,
+                'n_variables': len(cols),
+                'n_total_cells': int(n_total),
+                'n_non_missing_cells': n_non_missing,
+                'coverage_rate': coverage,
+                'missing_rate': 1.0 - coverage,
             })
-            continue
-
-        sub = panel_df[existing_cols]
-        n_total = sub.shape[0] * sub.shape[1]
-        n_non_missing = int(sub.notna().sum().sum())
-        coverage = float(n_non_missing / n_total) if n_total else 0.0
-        pillar_rows.append({
-            'pillar': pillar,
-            'n_variables': len(existing_cols),
-            'n_total_cells': int(n_total),
-            'n_non_missing_cells': n_non_missing,
-            'coverage_rate': coverage,
-            'missing_rate': 1.0 - coverage,
-        })
-    by_pillar = pd.DataFrame(pillar_rows).sort_values('missing_rate', ascending=False)
+        return pd.DataFrame(rows).sort_values('missing_rate', ascending=False)
+
+    def by_group_pillar(self, name: str) -> pd.DataFrame:
+        # Long-format cross-tab: one row per group value and pillar
+        counts = self.groups[name]
+        labels, idx = counts.sorted_labels()
+        groups = self._group_frame(name, labels)
+        n_groups = len(labels)
+        parts = []
+        for pillar, cols in self._pillar_columns():
+            n_total = counts.rows[idx] * len(cols)
+            n_non_missing = counts.counts[idx][:, cols].sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                coverage = np.where(n_total > 0, n_non_missing / np.maximum(n_total, 1), 0.0)
+            parts.append(groups.assign(**{
+                'pillar': [pillar] * n_groups,
+                'n_variables': len(cols),
+                'n_total_cells': n_total,
+                'n_non_missing_cells': n_non_missing,
+                'coverage_rate': coverage,
+                'missing_rate': 1.0 - coverage,
+            }))
+        # parts are pillar-major; order rows by group, then pillar
+        order = np.lexsort((np.repeat(np.arange(len(parts)), n_groups), np.tile(np.arange(n_groups), len(parts))))
+        return pd.concat(parts, ignore_index=True).iloc[order].reset_index(drop=True)
+
+    def reports(self) -> dict[str, pd.DataFrame]:
+        out = {'by_variable': self.by_variable()}
+        for name in GROUP_KEYS:
+            if name in self.groups:
+                out[f'by_{name}'] = self.by_group(name)
+        out['by_pillar'] = self.by_pillar()
+        for name in GROUP_KEYS:
+            if name in self.groups:
+                out[f'by_{name}_pillar'] = self.by_group_pillar(name)
+        return out
+
+
+def coverage_reports(data) -> tuple[dict[str, pd.DataFrame], CoverageAccumulator]:
+    # `data` is a panel DataFrame or an iterable of panel chunks (e.g. module_output.iter_artifact)
+    acc = CoverageAccumulator()
+    for chunk in ([data] if isinstance(data, pd.DataFrame) else data):
+        acc.update(chunk)
+    if acc.value_cols is None:
+        raise ValueError('No panel rows to audit')
+    return acc.reports(), acc
+
+
+@profiled('coverage.build_reports')
+def build_coverage_reports(panel_df, outdir: str | Path, formats=None) -> dict[str, pd.DataFrame]:
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    with span('coverage.accumulate') as s:
+        reports, acc = coverage_reports(panel_df)
+        s.rows_in, s.cols_in = acc.n_rows, len(acc.value_cols)
+        s.outputs(reports)
 
     # Write outputs
-    by_variable.to_csv(outdir / 'coverage_report_by_variable.csv', index=False)
-    by_country.to_csv(outdir / 'coverage_report_by_country.csv', index=False)
-    by_year.to_csv(outdir / 'coverage_report_by_year.csv', index=False)
-    by_pillar.to_csv(outdir / 'coverage_report_by_pillar.csv', index=False)
+    for name, report in reports.items():
+        write_artifact(report, outdir, f'coverage_report_{name}', formats)
 
+    by_variable = reports['by_variable']
+    by_pillar = reports['by_pillar']
     summary_md = outdir / 'coverage_summary.md'
     worst_var = by_variable.iloc[0] if len(by_variable) else None
     worst_pillar = by_pillar.iloc[0] if len(by_pillar) else None
     with summary_md.open('w', encoding='utf-8') as f:
         f.write('# Coverage summary\n\n')
-        f.write(f'- Rows audited: {len(panel_df)}\n')
-        f.write(f'- Variables audited: {len(value_cols)}\n')
+        f.write(f'- Rows audited: {acc.n_rows}\n')
+        f.write(f'- Variables audited: {len(acc.value_cols)}\n')
         if worst_var is not None:
             f.write(f"- Highest missingness variable: `{worst_var['variable']}` ({worst_var['missing_rate']:.2%}).\n")
         if worst_pillar is not None:
             f.write(f"- Highest missingness pillar: `{worst_pillar['pillar']}` ({worst_pillar['missing_rate']:.2%}).\n")
-        f.write('- Reports generated: by variable, country, year, and pillar.\n')
-
-    return {
-        'by_variable': by_variable,
-        'by_country': by_country,
-        'by_year': by_year,
-        'by_pillar': by_pillar,
-    }
+        f.write('- Reports generated: by variable, country, year, and pillar, plus country x pillar and year x pillar.\n')
+
+    return reports
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import ast
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import time
+from pathlib import Path
+
+from module_cache import file_digest
+from module_profile import span
+from utils import CACHE_DIR
+
+
+STAGE_STORE_DIR = CACHE_DIR / 'stages'
+
+
+def _project_imports(path: Path) -> dict:
+    # {bound name: project module} for every `import X` / `from X import name` of `path`
+    # (function-level imports included) where X is a module next to `path`
+    names = {}
+    for node in ast.walk(ast.parse(path.read_text(encoding='utf-8'))):
+        if isinstance(node, ast.Import):
+            pairs = [(alias.asname or alias.name, alias.name) for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            pairs = [(alias.asname or alias.name, node.module) for alias in node.names]
+        else:
+            continue
+        names.update((name, module) for name, module in pairs if (path.parent / f'{module}.py').exists())
+    return names
+
+
+def _code_names(code) -> set:
+    names = set(code.co_names) | set(code.co_freevars)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _code_names(const)
+    return names
+
+
+def code_dependencies(func) -> tuple[list, str]:
+    # Code a stage function depends on: the project modules it references, closed over their
+    # project imports, and the source of the functions (and plain constants) it reaches in its
+    # own module, e.g. the closures and helpers of main.py. Project modules are the .py files
+    # next to the module defining `func`.
+    module_file = Path(inspect.getsourcefile(func)).resolve()
+    src_dir = module_file.parent
+    own = func.__globals__
+    own_imports = _project_imports(module_file)
+    modules, sources, seen, stack = set(), [], set(), [func]
+    while stack:
+        f = stack.pop()
+        if f in seen:
+            continue
+        seen.add(f)
+        sources.append(inspect.getsource(f))
+        cells = dict(zip(f.__code__.co_freevars, (c.cell_contents for c in f.__closure__ or ())))
+        for name in sorted(_code_names(f.__code__)):
+            if name in cells:
+                obj = cells[name]
+            elif name in f.__globals__:
+                obj = f.__globals__[name]
+                if name in own_imports:
+                    modules.add(own_imports[name])
+                elif isinstance(obj, (str, int, float, bool, tuple, list, dict, Path)):
+                    sources.append(f'{name} = {obj!r}')
+            else:
+                continue
+            if inspect.isfunction(obj) and obj.__globals__ is own:
+                stack.append(obj)
+                continue
+            module = obj.__name__ if inspect.ismodule(obj) else getattr(obj, '__module__', None)
+            if isinstance(module, str) and (src_dir / f'{module}.py').exists():
+                modules.add(module)
+    pending = sorted(modules)
+    while pending:
+        for module in _project_imports(src_dir / f'{pending.pop()}.py').values():
+            if module not in modules:
+                modules.add(module)
+                pending.append(module)
+    modules.discard(module_file.stem)
+    return [src_dir / f'{m}.py' for m in sorted(modules)], '\n'.join(sources)
+
+
+class Stage:
+    # A pipeline step. `func` receives the results of `deps` as keyword arguments (by stage
+    # name). The stage is stale when any declared input changed: source `files`, `env`
+    # variables, code, `version`, or the content of an upstream result. `targets` are files
+    # the stage writes; a missing target also makes it stale. The code is derived from `func`
+    # (code_dependencies) unless `code` files are given; when it cannot be derived (no
+    # source) every .py file next to the module defining `func` counts.
+    def __init__(self, name, func, deps=(), files=(), env=(), code=None, targets=(), version=1):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.files = tuple(files)
+        self.env = tuple(env)
+        self.source = ''
+        if code is None:
+            try:
+                code, self.source = code_dependencies(func)
+            except (OSError, TypeError):
+                code = sorted(Path(inspect.getfile(func)).resolve().parent.glob('*.py'))
+        self.code = tuple(code)
+        self.targets = tuple(targets)
+        self.version = version
+
+    def fingerprint(self, upstream_digests: dict) -> str:
+        h = hashlib.sha256()
+        h.update(f'{self.name}|{self.version}'.encode())
+        for fp in self.files:
+            h.update(f'|file:{Path(fp).name}:{file_digest(fp)}'.encode())
+        for fp in self.code:
+            h.update(f'|code:{Path(fp).name}:{file_digest(fp)}'.encode())
+        if self.source:
+            h.update(f'|source:{hashlib.sha256(self.source.encode()).hexdigest()}'.encode())
+        for var in self.env:
+            h.update(f'|env:{var}={os.getenv(var)}'.encode())
+        for dep in self.deps:
+            h.update(f'|dep:{dep}:{upstream_digests[dep]}'.encode())
+        for fp in self.targets:
+            h.update(f'|target:{fp}'.encode())
+        return h.hexdigest()
+
+
+def _meta_path(store: Path, name: str) -> Path:
+    return store / f'{name}.json'
+
+
+def _artifact_path(store: Path, name: str) -> Path:
+    return store / f'{name}.pkl'
+
+
+def _load_meta(store: Path, name: str):
+    try:
+        return json.loads(_meta_path(store, name).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def _save(store: Path, name: str, result, fingerprint: str) -> str:
+    payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+    digest = hashlib.sha256(payload).hexdigest()
+    store.mkdir(parents=True, exist_ok=True)
+    tmp = _artifact_path(store, name).with_suffix('.tmp')
+    tmp.write_bytes(payload)
+    os.replace(tmp, _artifact_path(store, name))
+    meta = {'fingerprint': fingerprint, 'output_digest': digest, 'updated': time.time()}
+    _meta_path(store, name).write_text(json.dumps(meta), encoding='utf-8')
+    return digest
+
+
+def run_dag(stages, store_dir=None, force=False):
+    # Runs stages in the given (topological) order, recomputing only stale ones. Returns
+    # ({stage name: result}, [per-stage report rows]). Results of skipped stages are only
+    # unpickled when a downstream stage actually has to run, so they may be absent.
+    # `force` is True (rerun everything) or a collection of stage names to rerun.
+    store = Path(store_dir) if store_dir is not None else STAGE_STORE_DIR
+    by_name = {}
+    for stage in stages:
+        missing = [d for d in stage.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown or later stages: {missing}")
+        by_name[stage.name] = stage
+
+    digests = {}
+    results = {}
+    report = []
+
+    def result_of(name):
+        if name not in results:
+            results[name] = pickle.loads(_artifact_path(store, name).read_bytes())
+        return results[name]
+
+    for stage in stages:
+        fingerprint = stage.fingerprint(digests)
+        meta = _load_meta(store, stage.name)
+        forced = force is True or (force and stage.name in force)
+        fresh = (
+            not forced
+            and meta is not None
+            and meta.get('fingerprint') == fingerprint
+            and _artifact_path(store, stage.name).exists()
+            and all(Path(t).exists() for t in stage.targets)
+        )
+        t0 = time.perf_counter()
+        if fresh:
+            digests[stage.name] = meta['output_digest']
+            status = 'skipped'
+        else:
+            inputs = {d: result_of(d) for d in stage.deps}
+            with span(f'stage.{stage.name}', kind='stage') as s:
+                s.inputs(list(inputs.values()))
+                result = stage.func(**inputs)
+                s.outputs(result)
+            results[stage.name] = result
+            digests[stage.name] = _save(store, stage.name, result, fingerprint)
+            status = 'ran'
+        report.append({
+            'stage': stage.name,
+            'status': status,
+            'seconds': round(time.perf_counter() - t0, 4),
+            'fingerprint': fingerprint[:12],
+        })
+
+    return results, report
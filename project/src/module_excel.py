@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import os
+import re
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from python_calamine import CalamineWorkbook
+    _HAS_CALAMINE = True
+except Exception:  # fallback to openpyxl in read-only mode
+    _HAS_CALAMINE = False
+
+
+# Workbooks are streamed row by row (calamine when installed, else openpyxl read-only,
+# without styles) and only the requested columns are kept, instead of pd.read_excel
+# materializing every cell of the sheet.
+
+EXCEL_ENGINES = ('auto', 'calamine', 'openpyxl')
+# The header row is looked for in this many leading rows
+HEADER_SCAN_ROWS = 20
+SAMPLE_ROWS = 50
+
+
+class ExcelLayoutError(ValueError):
+    pass
+
+
+def _label(value) -> str:
+    # Header matching ignores case and repeated/trailing whitespace ('Promedio total ')
+    return re.sub(r'\s+', ' ', str(value)).strip().lower() if value is not None else ''
+
+
+def _engine(engine=None) -> str:
+    engine = engine or os.getenv('IECGGS_EXCEL_ENGINE', 'auto')
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f'Unknown Excel engine: {engine} (expected one of {EXCEL_ENGINES})')
+    if engine == 'auto':
+        return 'calamine' if _HAS_CALAMINE else 'openpyxl'
+    if engine == 'calamine' and not _HAS_CALAMINE:
+        raise ImportError('python-calamine is not installed')
+    return engine
+
+
+@contextmanager
+def open_sheet(path: str | Path, sheet=None, engine=None):
+    # Yields rows(min_row=1, max_row=None, min_col=1, max_col=None): cell values of one sheet
+    # (default: the first) as tuples, empty cells as None, within those 1-based bounds.
+    # The workbook is opened once for any number of passes; openpyxl does not convert cells
+    # outside the column span.
+    if _engine(engine) == 'calamine':
+        wb = CalamineWorkbook.from_path(str(path))
+        ws = wb.get_sheet_by_index(0) if sheet is None else wb.get_sheet_by_name(sheet)
+
+        def rows(min_row=1, max_row=None, min_col=1, max_col=None):
+            for i, row in enumerate(ws.iter_rows(), start=1):
+                if max_row is not None and i > max_row:
+                    break
+                if i >= min_row:
+                    yield tuple(None if v == '' else v for v in row[min_col - 1:max_col])
+
+        yield rows
+        return
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0] if sheet is None else wb[sheet]
+
+        def rows(min_row=1, max_row=None, min_col=1, max_col=None):
+            return ws.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col, values_only=True)
+
+        yield rows
+    finally:
+        wb.close()
+
+
+def _blank(row) -> bool:
+    return all(v is None or (isinstance(v, str) and not v.strip()) for v in row)
+
+
+def _typed(values: list, dtype=None) -> pd.Series:
+    # One column from its cell values: explicit dtype, else inferred as pd.read_excel would
+    # (integral numbers as int64 unless a cell is missing, text as strings)
+    if dtype is not None and str(dtype).lower().startswith(('float', 'int')):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').astype(dtype)
+    if dtype is not None:
+        return pd.Series(values, dtype=dtype)
+    s = pd.Series(values)
+    if s.dtype.kind == 'f' and s.notna().all() and np.all(np.mod(s.to_numpy(), 1) == 0):
+        s = s.astype('int64')
+    return s
+
+
+def sniff_excel(path: str | Path, n_rows: int = SAMPLE_ROWS, sheet=None, engine=None) -> pd.DataFrame:
+    # First rows of a sheet with the first non-blank row as header, e.g. to pick columns
+    with open_sheet(path, sheet, engine) as rows:
+        it = rows()
+        header = next((row for row in it if not _blank(row)), None)
+        if header is None:
+            return pd.DataFrame()
+        body = []
+        for row in it:
+            if len(body) >= n_rows:
+                break
+            if not _blank(row):
+                body.append(row)
+    names = [str(h) if h is not None else f'Unnamed: {i}' for i, h in enumerate(header)]
+    return pd.DataFrame({n: _typed([r[i] if i < len(r) else None for r in body]) for i, n in enumerate(names)})
+
+
+def read_excel_columns(path: str | Path, columns: dict, required=(), dtypes=None, sheet=None,
+                       engine=None) -> pd.DataFrame:
+    # Only the `columns` ({output name: header aliases}) of a sheet. The header is the first of
+    # the leading HEADER_SCAN_ROWS rows naming every `required` column; optional columns
+    # absent from it are left out. Rows blank across those columns are skipped.
+    dtypes = dtypes or {}
+    wanted = {name: {_label(a) for a in ([aliases] if isinstance(aliases, str) else aliases)}
+              for name, aliases in columns.items()}
+    with open_sheet(path, sheet, engine) as rows:
+        positions = None
+        for i, row in enumerate(rows(max_row=HEADER_SCAN_ROWS), start=1):
+            labels = [_label(v) for v in row]
+            found = {}
+            for name, aliases in wanted.items():
+                pos = next((j for j, lab in enumerate(labels) if lab in aliases), None)
+                if pos is not None:
+                    found[name] = pos
+            if found and all(r in found for r in required):
+                header_row, positions = i, found
+                break
+        if positions is None:
+            raise ExcelLayoutError(
+                f'No header naming {list(required) or list(columns)} in the first {HEADER_SCAN_ROWS} rows of {Path(path).name}'
+            )
+        # Second pass below the header over the span of the wanted columns only
+        lo, hi = min(positions.values()), max(positions.values())
+        data = {name: [] for name in positions}
+        for row in rows(min_row=header_row + 1, min_col=lo + 1, max_col=hi + 1):
+            if _blank(row):
+                continue
+            n = len(row)
+            for name, j in positions.items():
+                data[name].append(row[j - lo] if j - lo < n else None)
+    return pd.DataFrame({name: _typed(values, dtypes.get(name)) for name, values in data.items()})
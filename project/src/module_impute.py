@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Variables eligible for nearest-year assignment (rule 5.4). Event counts and Art.7
+# exclusions are not imputed: a missing year there means no recorded event.
+IMPUTE_VARIABLES = [
+    'SPAR_total',
+    'CHE_GDP',
+    'UHC_index',
+    'Policy_UHC',
+    'Plan_UHC',
+    'Strategy_UHC',
+    'Right_to_health',
+]
+DIRECTIONS = ('backward', 'forward', 'nearest')
+DEFAULT_MAX_GAP = 3
+DEFAULT_DIRECTION = 'nearest'
+
+
+def impute_bits(variables=None) -> dict:
+    # Bit assigned to each variable in the `imputed` bitmask column
+    variables = IMPUTE_VARIABLES if variables is None else variables
+    return {var: 1 << i for i, var in enumerate(variables)}
+
+
+def _asof_source(valid: np.ndarray, groups: np.ndarray, years: np.ndarray, backward: bool):
+    # For every cell of a (rows sorted by group, year) x variables matrix: row index of the
+    # closest observed cell at or before (backward) / at or after (forward) it in the same
+    # group, and the year distance to it (inf when there is none).
+    n = len(valid)
+    pos = np.arange(n)[:, None]
+    if backward:
+        src = np.maximum.accumulate(np.where(valid, pos, -1), axis=0)
+    else:
+        src = np.minimum.accumulate(np.where(valid, pos, n)[::-1], axis=0)[::-1]
+    found = (src >= 0) & (src < n)
+    src = np.clip(src, 0, max(n - 1, 0))
+    found &= groups[src] == groups[:, None]
+    gap = np.where(found, np.abs(years[:, None] - years[src]), np.inf)
+    return src, gap
+
+
+def impute_nearest_year(panel: pd.DataFrame, variables=None, max_gap=None, direction=None,
+                        group='iso3') -> tuple[pd.DataFrame, pd.DataFrame]:
+    # Fills missing cells of `variables` with the value of the nearest observed year of the
+    # same country, at most `max_gap` years away (merge_asof semantics; 'nearest' prefers the
+    # earlier year on ties). Returns (panel copy with an `imputed` bitmask column, per-variable
+    # report). Bits follow impute_bits(variables); 0 means every value is observed.
+    if max_gap is None:
+        max_gap = int(os.getenv('IECGGS_IMPUTE_MAX_GAP', str(DEFAULT_MAX_GAP)))
+    if direction is None:
+        direction = os.getenv('IECGGS_IMPUTE_DIRECTION', DEFAULT_DIRECTION)
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {DIRECTIONS}, got '{direction}'")
+    bits = impute_bits(variables)
+    variables = [v for v in bits if v in panel.columns]
+
+    out = panel.copy(deep=False)
+    mask_dtype = np.min_scalar_type(max(1, (1 << len(bits)) - 1))
+    imputed = np.zeros(len(out), dtype=mask_dtype)
+    report = []
+    if variables and len(out) and max_gap > 0:
+        groups = pd.factorize(out[group])[0]
+        years = out['year'].to_numpy(dtype=float)
+        order = np.lexsort((years, groups))
+        groups, years = groups[order], years[order]
+        values = out[variables].to_numpy(dtype=float)[order]
+        valid = ~np.isnan(values)
+
+        back_src, back_gap = _asof_source(valid, groups, years, backward=True)
+        fwd_src, fwd_gap = _asof_source(valid, groups, years, backward=False)
+        if direction == 'backward':
+            use_back, gap = np.ones(valid.shape, dtype=bool), back_gap
+        elif direction == 'forward':
+            use_back, gap = np.zeros(valid.shape, dtype=bool), fwd_gap
+        else:
+            use_back = back_gap <= fwd_gap
+            gap = np.where(use_back, back_gap, fwd_gap)
+        src = np.where(use_back, back_src, fwd_src)
+        fill = ~valid & (gap <= max_gap)
+
+        cols = np.arange(len(variables))[None, :]
+        filled = np.where(fill, values[src, cols], values)
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        filled, fill, gap = filled[inverse], fill[inverse], gap[inverse]
+        for i, var in enumerate(variables):
+            if fill[:, i].any():
+                out[var] = filled[:, i]
+        weights = np.asarray([bits[v] for v in variables], dtype=np.int64)
+        imputed = (fill.astype(np.int64) @ weights).astype(mask_dtype)
+        n_filled = fill.sum(axis=0)
+        for i, var in enumerate(variables):
+            report.append({
+                'variable': var,
+                'bit': bits[var],
+                'n_observed': int(valid[:, i].sum()),
+                'n_imputed': int(n_filled[i]),
+                'mean_gap': float(gap[fill[:, i], i].mean()) if n_filled[i] else np.nan,
+                'max_gap': max_gap,
+                'direction': direction,
+            })
+    out['imputed'] = imputed
+    return out, pd.DataFrame(report, columns=['variable', 'bit', 'n_observed', 'n_imputed', 'mean_gap', 'max_gap', 'direction'])
+
+
+def imputed_mask(panel: pd.DataFrame, variable: str, variables=None) -> pd.Series:
+    # Boolean per-row flag: `variable` was filled by nearest-year imputation
+    return (panel['imputed'].astype(np.int64) & impute_bits(variables)[variable]) > 0
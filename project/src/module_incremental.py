@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from module_cache import file_digest
+from module_index import (
+    BOUNDED_COLUMNS,
+    COMPONENT_INPUTS,
+    compute_index,
+    compute_subindices,
+    eligibility_thresholds,
+    normalization_bounds,
+)
+from module_profile import span
+from module_schema import same_keys
+from utils import CACHE_DIR, winsorize_bounds
+
+
+STATE_DIR = CACHE_DIR / 'incremental'
+STATE_VERSION = 1
+BOUNDS_NAME = 'normalization_bounds.json'
+KEYS = ['iso3', 'year']
+DIGEST_COLUMN = '_row_digest'
+SRC_DIR = Path(__file__).resolve().parent
+# Beyond this share of changed rows one full computation is cheaper than splicing
+FULL_RECOMPUTE_SHARE = 0.5
+
+
+def _config_digest() -> str:
+    # Anything that changes every row at once: thresholds and the code computing the scores
+    t = eligibility_thresholds()
+    h = hashlib.sha256(f"{STATE_VERSION}|{t['reg']}|{t['dom']}|{t['part']}|{t['index']}".encode())
+    for name in ('module_index.py', 'module_schema.py', 'utils.py'):
+        h.update(f'|{name}:{file_digest(SRC_DIR / name)}'.encode())
+    return h.hexdigest()
+
+
+def row_digests(df: pd.DataFrame, columns) -> np.ndarray:
+    # One uint64 hash per row over `columns` (absent columns hash as missing)
+    cols = pd.DataFrame({c: df[c] if c in df.columns else np.nan for c in columns}, index=df.index)
+    return pd.util.hash_pandas_object(cols, index=False).to_numpy()
+
+
+def load_bounds(path: str | Path) -> dict:
+    # Bounds written by save_bounds (e.g. outputs/normalization_bounds.json of a reference vintage)
+    data = json.loads(Path(path).read_text(encoding='utf-8'))
+    bounds = data.get('bounds', data)
+    missing = [c for c in BOUNDED_COLUMNS if c not in bounds]
+    if missing:
+        raise ValueError(f'Normalization bounds in {path} lack {missing}')
+    return {c: [float('nan') if v is None else float(v) for v in bounds[c]] for c in BOUNDED_COLUMNS}
+
+
+def save_bounds(path: str | Path, bounds: dict, **meta) -> None:
+    # JSON has no NaN: missing bounds are written as null
+    payload = {
+        'bounds': {c: [None if math.isnan(v) else v for v in b] for c, b in bounds.items()},
+        'created': time.time(),
+        **meta,
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(payload, indent=2, sort_keys=True), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def _same(a, b) -> bool:
+    return all(x == y or (math.isnan(x) and math.isnan(y)) for x, y in zip(a, b))
+
+
+def update_bounds(previous: dict | None, panel: pd.DataFrame, appended: np.ndarray | None) -> dict:
+    # Global normalization statistics after new rows were appended. Min/max are merged with
+    # the appended rows only; the CHE_GDP winsorization quantiles cannot be merged and are
+    # recomputed from the column. Without an append-only delta everything is recomputed.
+    if previous is None or appended is None:
+        return normalization_bounds(panel)
+    added = normalization_bounds(panel[appended])
+    bounds = {}
+    for col in BOUNDED_COLUMNS:
+        if col == 'CHE_GDP':
+            bounds[col] = list(winsorize_bounds(panel[col])) if col in panel.columns else previous[col]
+        elif col == 'Right_to_health':
+            # Fixed scale, not a statistic of the rows
+            bounds[col] = added[col]
+        else:
+            bounds[col] = [float(np.fmin(previous[col][0], added[col][0])), float(np.fmax(previous[col][1], added[col][1]))]
+    return bounds
+
+
+class IncrementalState:
+    # Last outputs of each incremental step with one input digest per (iso3, year) row, kept
+    # under `state_dir`; any change of thresholds or scoring code discards the state
+    def __init__(self, state_dir: str | Path | None = None):
+        self.dir = Path(state_dir) if state_dir is not None else STATE_DIR
+        self.config = _config_digest()
+        try:
+            meta = json.loads((self.dir / 'state.json').read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            meta = {}
+        self.meta = meta if meta.get('config') == self.config else {}
+
+    def bounds(self) -> dict | None:
+        return self.meta.get('bounds')
+
+    def load(self, name: str) -> pd.DataFrame | None:
+        if name not in self.meta.get('steps', []):
+            return None
+        try:
+            return pd.read_pickle(self.dir / f'{name}.pkl')
+        except (OSError, ValueError):
+            return None
+
+    def save(self, name: str, out: pd.DataFrame, digests: np.ndarray, bounds: dict | None = None) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        frame = out.assign(**{DIGEST_COLUMN: digests})
+        tmp = self.dir / f'{name}.pkl.tmp'
+        frame.to_pickle(tmp)
+        os.replace(tmp, self.dir / f'{name}.pkl')
+        self.meta = {
+            'config': self.config,
+            'steps': sorted(set(self.meta.get('steps', [])) | {name}),
+            'bounds': bounds if bounds is not None else self.meta.get('bounds'),
+            'updated': time.time(),
+        }
+        (self.dir / 'state.json').write_text(json.dumps(self.meta), encoding='utf-8')
+
+
+def _match_previous(frame: pd.DataFrame, previous: pd.DataFrame | None, digests: np.ndarray):
+    # Row position of each `frame` key in `previous` (-1 when new) and whether its digest is unchanged
+    if previous is None:
+        return np.full(len(frame), -1), np.zeros(len(frame), dtype=bool)
+    if same_keys(frame, previous):
+        pos = np.arange(len(frame))
+    else:
+        pos = pd.MultiIndex.from_arrays([previous[k] for k in KEYS]).get_indexer(
+            pd.MultiIndex.from_arrays([frame[k] for k in KEYS])
+        )
+    same = pos >= 0
+    same[same] = previous[DIGEST_COLUMN].to_numpy()[pos[same]] == digests[same]
+    return pos, same
+
+
+def _unchanged(previous: pd.DataFrame | None, pos: np.ndarray, recompute: np.ndarray) -> bool:
+    # Nothing to recompute and the previous output already lists the rows in this order
+    return (previous is not None and not recompute.any() and len(previous) == len(pos)
+            and bool((pos == np.arange(len(pos))).all()))
+
+
+def _splice(frame: pd.DataFrame, previous: pd.DataFrame | None, pos, recompute, func) -> pd.DataFrame:
+    # Previous output rows where nothing changed, func(rows) elsewhere, in `frame` order with
+    # `frame`'s index and key columns
+    if recompute.mean() > FULL_RECOMPUTE_SHARE:
+        recompute[:] = True
+    fresh = func(recompute) if recompute.any() else None
+    if recompute.all():
+        return fresh.set_axis(frame.index)
+    kept = previous.drop(columns=DIGEST_COLUMN).iloc[pos[~recompute]]
+    if fresh is None:
+        out = kept
+    else:
+        order = np.argsort(np.r_[np.flatnonzero(~recompute), np.flatnonzero(recompute)], kind='stable')
+        out = pd.concat([kept, fresh], ignore_index=True).iloc[order]
+    out = out.set_axis(frame.index)
+    for col in ('iso3', 'country', 'year'):
+        if col in out.columns and col in frame.columns:
+            out[col] = frame[col]
+    dtypes = (fresh if fresh is not None else kept).dtypes
+    cast = {c: t for c, t in dtypes.items() if out[c].dtype != t and c not in ('iso3', 'country', 'year')}
+    return out.astype(cast) if cast else out
+
+
+def _plain(df: pd.DataFrame) -> pd.DataFrame:
+    # Shallow copy without attrs (build_panel's reports), which pandas deep-copies on every operation
+    out = df.copy(deep=False)
+    out.attrs = {}
+    return out
+
+
+def update_subindices(panel: pd.DataFrame, state: IncrementalState, bounds: dict | None = None):
+    # compute_subindices(panel, bounds) recomputing only rows that are new, whose component
+    # inputs changed, or whose normalization bounds moved. Without `bounds` (frozen from a
+    # reference vintage) the global statistics are updated from the previous run's.
+    # Returns (subindices, bounds used, number of recomputed rows).
+    panel = _plain(panel)
+    with span('incremental.subindices') as s:
+        s.inputs(panel)
+        previous = state.load('subindices')
+        digests = row_digests(panel, COMPONENT_INPUTS)
+        pos, same = _match_previous(panel, previous, digests)
+        if bounds is None:
+            # Append-only when every previous row is still there unchanged
+            append_only = previous is not None and same.sum() == len(previous)
+            bounds = update_bounds(state.bounds(), panel, ~same if append_only else None)
+        recompute = ~same
+        old_bounds = state.bounds()
+        for col in BOUNDED_COLUMNS:
+            # A moved bound rescales every row that has a value in that column
+            if old_bounds is not None and not _same(old_bounds[col], bounds[col]) and col in panel.columns:
+                recompute |= panel[col].notna().to_numpy()
+        sub = _splice(panel, previous, pos, recompute, lambda rows: compute_subindices(panel[rows], bounds))
+        if not (_unchanged(previous, pos, recompute) and all(_same(old_bounds[c], bounds[c]) for c in BOUNDED_COLUMNS)):
+            state.save('subindices', sub, digests, bounds)
+        s.outputs(sub)
+        s.set(rows_recomputed=int(recompute.sum()))
+    return sub, bounds, int(recompute.sum())
+
+
+def update_index(panel: pd.DataFrame, sub: pd.DataFrame, state: IncrementalState):
+    # compute_index(panel, sub) recomputing only rows whose subindices or art7_excluded changed.
+    # Returns (index, number of recomputed rows).
+    panel, sub = _plain(panel), _plain(sub)
+    with span('incremental.index') as s:
+        s.inputs(sub)
+        previous = state.load('index')
+        if same_keys(panel, sub):
+            excl = panel['art7_excluded'].to_numpy()
+        else:
+            excl = sub[KEYS].merge(panel[KEYS + ['art7_excluded']], on=KEYS, how='left')['art7_excluded'].to_numpy()
+        # Every subindices column is carried into the index, so all of them are inputs
+        inputs = sub.drop(columns=['iso3', 'country', 'year']).assign(art7_excluded=excl)
+        digests = row_digests(inputs, list(inputs.columns))
+        pos, same = _match_previous(sub, previous, digests)
+        recompute = ~same
+        idx = _splice(sub, previous, pos, recompute, lambda rows: compute_index(panel, sub[rows]))
+        if not _unchanged(previous, pos, recompute):
+            state.save('index', idx, digests)
+        s.outputs(idx)
+        s.set(rows_recomputed=int(recompute.sum()))
+    return idx, int(recompute.sum())
@@ -1,113 +1,187 @@
+from __future__ import annotations
+
 import os
 import pandas as pd
 import numpy as np
 
-from utils import minmax_scale, winsorize_series
-
-
-MIN_REG_OBS = int(os.getenv('IECGGS_MIN_REG_OBS', '1'))
-MIN_DOM_OBS = int(os.getenv('IECGGS_MIN_DOM_OBS', '3'))
-MIN_PART_OBS = int(os.getenv('IECGGS_MIN_PART_OBS', '2'))
-MIN_INDEX_PILLARS = int(os.getenv('IECGGS_MIN_INDEX_PILLARS', '3'))
-
-
-def compute_subindices(panel: pd.DataFrame) -> pd.DataFrame:
-    df = panel.copy()
+from utils import minmax_bounds, minmax_scale, winsorize_bounds, winsorize_series
+from module_sensitivity import sensitivity_grid
+from module_profile import profiled
+from module_schema import COUNT_DTYPE, INDICATOR_DTYPE, SCORE_DTYPE, same_keys, scores
+
+
+# Eligibility thresholds: observed components a pillar needs ('reg', 'dom', 'part') and
+# eligible pillars the index needs ('index'). Functions take them as a `thresholds` dict;
+# missing keys come from the environment at call time, so one process can compare several
+# configurations.
+THRESHOLD_ENV = {
+    'reg': 'IECGGS_MIN_REG_OBS',
+    'dom': 'IECGGS_MIN_DOM_OBS',
+    'part': 'IECGGS_MIN_PART_OBS',
+    'index': 'IECGGS_MIN_INDEX_PILLARS',
+}
+DEFAULT_THRESHOLDS = {'reg': 1, 'dom': 3, 'part': 2, 'index': 3}
+
+
+REG_COMPONENTS = ['SPAR_n']
+DOM_COMPONENTS = ['CHE_GDP_n', 'UHC_n', 'Policy_UHC', 'Plan_UHC', 'Right_n']
+PART_COUNTS = ['participation_event', 'leadership_event', 'decision_event']
+PART_COMPONENTS = [f'{col}_n' for col in PART_COUNTS]
+
+
+# Panel columns whose normalization depends on the data (bounds below) and every panel
+# column the pillar components are computed from
+BOUNDED_COLUMNS = ['CHE_GDP', 'Right_to_health'] + PART_COUNTS
+# Right_to_health is kept in the units of its source, recognition levels 0-5 (the 2024
+# "Country has recognized the right to health" export); Right_n divides by the top level
+RIGHT_TO_HEALTH_MAX = 5.0
+COMPONENT_INPUTS = ['SPAR_total', 'CHE_GDP', 'UHC_index', 'Policy_UHC', 'Plan_UHC', 'Right_to_health'] + PART_COUNTS
+
+
+def eligibility_thresholds(thresholds: dict | None = None) -> dict:
+    # {'reg', 'dom', 'part', 'index'} -> int: the given values, else IECGGS_MIN_* or the defaults
+    thresholds = {k: v for k, v in (thresholds or {}).items() if v is not None}
+    unknown = sorted(set(thresholds) - set(THRESHOLD_ENV))
+    if unknown:
+        raise ValueError(f'Unknown eligibility thresholds {unknown}; expected {list(THRESHOLD_ENV)}')
+    return {k: int(thresholds[k]) if k in thresholds else int(os.getenv(env, str(DEFAULT_THRESHOLDS[k])))
+            for k, env in THRESHOLD_ENV.items()}
+
+
+def normalization_bounds(panel: pd.DataFrame) -> dict:
+    # {column: [lo, hi]} used by normalize_components: winsorization limits for CHE_GDP (its
+    # min-max scale after clipping), the fixed 0-RIGHT_TO_HEALTH_MAX scale of Right_to_health
+    # and the min/max of the participation counts. Missing columns map to [nan, nan].
+    bounds = {}
+    for col in BOUNDED_COLUMNS:
+        s = panel[col] if col in panel.columns else pd.Series(np.nan, index=panel.index)
+        if col == 'CHE_GDP':
+            bounds[col] = list(winsorize_bounds(s))
+        elif col == 'Right_to_health':
+            bounds[col] = [0.0, RIGHT_TO_HEALTH_MAX]
+        else:
+            bounds[col] = list(minmax_bounds(s))
+    return bounds
+
+
+def normalize_components(panel: pd.DataFrame, bounds: dict | None = None) -> pd.DataFrame:
+    # Shallow copy of the panel plus every pillar component brought to 0-1 (float32); the
+    # panel's own columns are shared, not duplicated. `bounds` (see normalization_bounds)
+    # fixes the data-dependent scales, so any subset of rows normalizes exactly as it would
+    # within the full panel; by default they are taken from `panel` itself.
+    df = panel.copy(deep=False)
+    if bounds is None:
+        bounds = normalization_bounds(panel)
+    nan = np.full(len(df), np.nan)
     # Normalizations
     # CHE_GDP winsorize
     if 'CHE_GDP' in df.columns:
-        df['CHE_GDP_w'] = winsorize_series(df['CHE_GDP'])
-        df['CHE_GDP_n'] = minmax_scale(df['CHE_GDP_w'])
+        df['CHE_GDP_w'] = winsorize_series(df['CHE_GDP'], bounds=bounds['CHE_GDP'])
+        df['CHE_GDP_n'] = scores(minmax_scale(df['CHE_GDP_w'], bounds=bounds['CHE_GDP']))
     else:
-        df['CHE_GDP_n'] = np.nan
+        df['CHE_GDP_n'] = scores(nan)
     # UHC and SPAR already normalized (0-100); bring to 0-1
-    df['UHC_n'] = df['UHC_index'] / 100.0 if 'UHC_index' in df.columns else np.nan
-    df['SPAR_n'] = df['SPAR_total'] / 100.0 if 'SPAR_total' in df.columns else np.nan
+    df['UHC_n'] = scores(df['UHC_index'] / 100.0 if 'UHC_index' in df.columns else nan)
+    df['SPAR_n'] = scores(df['SPAR_total'] / 100.0 if 'SPAR_total' in df.columns else nan)
 
     # Discrete variables already mapped to 0-1 in build_panel
-    # Right_to_health assumed in 0-100 if provided -> normalize
+    # Right_to_health levels brought to 0-1 by the top level of the scale (normalization_bounds)
     if 'Right_to_health' in df.columns:
-        # detect likely scale
-        if df['Right_to_health'].max(skipna=True) > 1.0:
-            df['Right_n'] = df['Right_to_health'] / 100.0
-        else:
-            df['Right_n'] = df['Right_to_health']
+        df['Right_n'] = scores(df['Right_to_health'] / bounds['Right_to_health'][1])
     else:
-        df['Right_n'] = np.nan
+        df['Right_n'] = scores(nan)
 
     # Participation counts: normalize across all countries-years using min-max
-    for col in ['participation_event', 'leadership_event', 'decision_event']:
+    for col in PART_COUNTS:
         if col in df.columns:
-            df[f'{col}_n'] = minmax_scale(df[col])
+            df[f'{col}_n'] = scores(minmax_scale(df[col], bounds=bounds[col]))
         else:
-            df[f'{col}_n'] = np.nan
+            df[f'{col}_n'] = scores(nan)
+    return df
+
+
+def _pillar_mean(df: pd.DataFrame, components, ok: np.ndarray) -> np.ndarray:
+    return np.where(ok, df[components].mean(axis=1).to_numpy(dtype=SCORE_DTYPE), np.nan).astype(SCORE_DTYPE)
 
-    # Eligibility counters
-    reg_components = ['SPAR_n']
-    dom_components = ['CHE_GDP_n', 'UHC_n', 'Policy_UHC', 'Plan_UHC', 'Right_n']
-    part_components = ['participation_event_n', 'leadership_event_n', 'decision_event_n']
-
-    df['n_reg_obs'] = df[reg_components].notna().sum(axis=1)
-    df['n_dom_obs'] = df[dom_components].notna().sum(axis=1)
-    df['n_part_obs'] = df[part_components].notna().sum(axis=1)
-
-    df['flag_pillar_reg_ok'] = df['n_reg_obs'] >= MIN_REG_OBS
-    df['flag_pillar_dom_ok'] = df['n_dom_obs'] >= MIN_DOM_OBS
-    df['flag_pillar_part_ok'] = df['n_part_obs'] >= MIN_PART_OBS
-
-    # Subindices with explicit eligibility
-    df['E_reg'] = np.where(df['flag_pillar_reg_ok'], df[reg_components].mean(axis=1), np.nan)
-    df['E_dom'] = np.where(df['flag_pillar_dom_ok'], df[dom_components].mean(axis=1), np.nan)
-    df['E_part'] = np.where(df['flag_pillar_part_ok'], df[part_components].mean(axis=1), np.nan)
-
-    sub_cols = [
-        'country', 'year',
-        'E_reg', 'E_dom', 'E_part',
-        'n_reg_obs', 'n_dom_obs', 'n_part_obs',
-        'flag_pillar_reg_ok', 'flag_pillar_dom_ok', 'flag_pillar_part_ok',
-    ]
-    sub = df[sub_cols].copy()
-    return sub
-
-
-def compute_index(panel: pd.DataFrame, sub: pd.DataFrame) -> pd.DataFrame:
-    df = panel.merge(sub, on=['country', 'year'], how='left')
-    df['n_pillars_ok'] = df[['flag_pillar_reg_ok', 'flag_pillar_dom_ok', 'flag_pillar_part_ok']].sum(axis=1)
-    df['flag_iecgss_ok'] = df['n_pillars_ok'] >= MIN_INDEX_PILLARS
-    df['IECGGS_raw'] = np.where(df['flag_iecgss_ok'], df[['E_reg', 'E_dom', 'E_part']].mean(axis=1), np.nan)
-    return df[[
-        'country', 'year', 'IECGGS_raw', 'E_reg', 'E_dom', 'E_part', 'art7_excluded',
-        'n_reg_obs', 'n_dom_obs', 'n_part_obs', 'n_pillars_ok',
-        'flag_pillar_reg_ok', 'flag_pillar_dom_ok', 'flag_pillar_part_ok', 'flag_iecgss_ok'
-    ]]
 
+@profiled('index.compute_subindices')
+def compute_subindices(panel: pd.DataFrame, bounds: dict | None = None, thresholds: dict | None = None) -> pd.DataFrame:
+    df = normalize_components(panel, bounds)
+    t = eligibility_thresholds(thresholds)
 
+    # Eligibility counters
+    n_reg = df[REG_COMPONENTS].notna().sum(axis=1).to_numpy(dtype=COUNT_DTYPE)
+    n_dom = df[DOM_COMPONENTS].notna().sum(axis=1).to_numpy(dtype=COUNT_DTYPE)
+    n_part = df[PART_COMPONENTS].notna().sum(axis=1).to_numpy(dtype=COUNT_DTYPE)
+    reg_ok = n_reg >= t['reg']
+    dom_ok = n_dom >= t['dom']
+    part_ok = n_part >= t['part']
+
+    # Subindices with explicit eligibility; keys are shared with the panel, not copied
+    return pd.DataFrame({
+        'iso3': panel['iso3'],
+        'country': panel['country'],
+        'year': panel['year'],
+        'E_reg': _pillar_mean(df, REG_COMPONENTS, reg_ok),
+        'E_dom': _pillar_mean(df, DOM_COMPONENTS, dom_ok),
+        'E_part': _pillar_mean(df, PART_COMPONENTS, part_ok),
+        'n_reg_obs': n_reg,
+        'n_dom_obs': n_dom,
+        'n_part_obs': n_part,
+        'flag_pillar_reg_ok': reg_ok,
+        'flag_pillar_dom_ok': dom_ok,
+        'flag_pillar_part_ok': part_ok,
+    }, index=panel.index)
+
+
+@profiled('index.compute_index')
+def compute_index(panel: pd.DataFrame, sub: pd.DataFrame, thresholds: dict | None = None) -> pd.DataFrame:
+    # Only art7_excluded comes from the panel: taken positionally when sub was built from this
+    # panel (the usual case), otherwise matched on (iso3, year)
+    if same_keys(panel, sub):
+        excl = panel['art7_excluded']
+    else:
+        excl = sub[['iso3', 'year']].merge(
+            panel[['iso3', 'year', 'art7_excluded']], on=['iso3', 'year'], how='left', validate='one_to_one'
+        )['art7_excluded']
+    flags = sub[['flag_pillar_reg_ok', 'flag_pillar_dom_ok', 'flag_pillar_part_ok']].to_numpy(dtype=bool)
+    n_pillars_ok = flags.sum(axis=1).astype(COUNT_DTYPE)
+    ok = n_pillars_ok >= eligibility_thresholds(thresholds)['index']
+    raw = np.where(ok, sub[['E_reg', 'E_dom', 'E_part']].mean(axis=1).to_numpy(dtype=SCORE_DTYPE), np.nan)
+    df = sub[['iso3', 'country', 'year']].assign(
+        IECGGS_raw=raw.astype(SCORE_DTYPE),
+        E_reg=sub['E_reg'],
+        E_dom=sub['E_dom'],
+        E_part=sub['E_part'],
+        art7_excluded=excl.astype(INDICATOR_DTYPE).array,
+        n_reg_obs=sub['n_reg_obs'],
+        n_dom_obs=sub['n_dom_obs'],
+        n_part_obs=sub['n_part_obs'],
+        n_pillars_ok=n_pillars_ok,
+        flag_pillar_reg_ok=sub['flag_pillar_reg_ok'],
+        flag_pillar_dom_ok=sub['flag_pillar_dom_ok'],
+        flag_pillar_part_ok=sub['flag_pillar_part_ok'],
+        flag_iecgss_ok=ok,
+    )
+    return df
+
+
+@profiled('index.apply_penalty')
 def apply_penalty(index_df: pd.DataFrame, lambdas=(0.1, 0.25, 0.5)) -> pd.DataFrame:
-    out = index_df.copy()
-    out['art7_excluded'] = out['art7_excluded'].fillna(0)
+    # Penalized columns are added to a shallow copy: the index columns are shared, not copied
+    excl = index_df['art7_excluded'].fillna(0).astype('int8')
+    raw = index_df['IECGGS_raw'].to_numpy(dtype=SCORE_DTYPE)
+    factor = excl.to_numpy(dtype=SCORE_DTYPE)
+    out = index_df.copy(deep=False)
+    out['art7_excluded'] = excl
     for lam in lambdas:
-        out[f'IECGGS_adj_lambda_{lam}'] = out['IECGGS_raw'] * (1 - lam * out['art7_excluded'])
+        out[f'IECGGS_adj_lambda_{lam}'] = raw * (1 - SCORE_DTYPE(lam) * factor)
     return out
 
 
+@profiled('index.sensitivity_table')
 def sensitivity_table(index_df: pd.DataFrame, lambdas=(0.1, 0.25, 0.5), weight_schemes=None) -> pd.DataFrame:
-    if weight_schemes is None:
-        weight_schemes = {
-            'equal': (1 / 3, 1 / 3, 1 / 3),
-            'reg_heavy': (0.5, 0.25, 0.25),
-            'dom_heavy': (0.25, 0.5, 0.25),
-            'part_heavy': (0.25, 0.25, 0.5),
-        }
-    rows = []
-    for lam in lambdas:
-        for scheme_name, (wr, wd, wp) in weight_schemes.items():
-            base = index_df.copy()
-            base['IECGGS_weighted'] = wr * base['E_reg'] + wd * base['E_dom'] + wp * base['E_part']
-            base['IECGGS_adj'] = base['IECGGS_weighted'] * (1 - lam * base['art7_excluded'].fillna(0))
-            rows.append({
-                'lambda': lam,
-                'scheme': scheme_name,
-                'mean_IECGGS_adj': base['IECGGS_adj'].mean(skipna=True),
-                'std_IECGGS_adj': base['IECGGS_adj'].std(skipna=True),
-            })
-    return pd.DataFrame(rows)
+    # Mean/std of the re-weighted, penalized index per (lambda, scheme); see
+    # module_sensitivity.sensitivity_grid for quantiles, rank statistics and large grids
+    summary, _ = sensitivity_grid(index_df, lambdas=lambdas, weight_schemes=weight_schemes, quantiles=(), rank_stats=False)
+    return summary[['lambda', 'scheme', 'mean_IECGGS_adj', 'std_IECGGS_adj']]
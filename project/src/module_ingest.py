@@ -1,4 +1,6 @@
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Tuple
 
@@ -6,30 +8,64 @@ import pandas as pd
 import numpy as np
 
 from utils import standardize_country_column, coerce_year_column, long_from_wide_indicator
+from module_cache import cached_call, lookup_cached, mark_disabled, store_cached
+from module_excel import ExcelLayoutError, read_excel_columns, sniff_excel
+from module_numbers import NUMBERS_READER_VERSION, is_numbers_document, read_table_file
+from module_profile import add_spans, span, take_spans
 
 FILES_DIR = Path(__file__).resolve().parents[2] / "files"
 
+SPAR_PATH = os.path.join(FILES_DIR, "6d1cd8c3c3b54015a3ebf7d77b7e8941.xlsx")
+CHE_GDP_PATH = os.path.join(FILES_DIR, "4b09fbba02e247b7a1497204a0c24cf3.csv")
+UHC_PATH = os.path.join(FILES_DIR, "00cf6dbc70fd4017a7987b365d4abba2.csv")
+POLICY_PATH = os.path.join(FILES_DIR, "8e043d9282aa4e9eb2a6d3cde6f6884e.csv")
+PLAN_PATH = os.path.join(FILES_DIR, "6a90891159ad4a6895a6d3f1de9f6d0c.csv")
+STRATEGY_PATH = os.path.join(FILES_DIR, "fc9853b355d642cbbf5ed3f52acafd5d.csv")
+RIGHT_TO_HEALTH_PATH = os.path.join(FILES_DIR, "c4da32f6d88f4fc9a1556831f24b3b1c.csv")
+EXCLUSIONS_PATH = os.path.join(FILES_DIR, "620a7cada3584b62b348fa698de4f28e.xlsx")
+PARTICIPATION_PATH = os.path.join(FILES_DIR, "00e422b990fa433395247ed6b6578aae.xlsx")
+# Excel sources: {output column: header labels}, matched case-insensitively in the
+# leading rows; only these columns are read
+SPAR_COLUMNS = {
+    'country': ['Estado Parte de IHR'],
+    'iso3': ['ISO Code'],
+    'year': ['Datos recividos'],
+    'SPAR_total': ['Promedio total', 'Total score', 'SPAR_total', 'Overall score'],
+}
+EXCLUSIONS_COLUMNS = {'country': ['País', 'Pais'], 'year': ['Año', 'Anio']}
+PARTICIPATION_COLUMNS = {
+    'WHA': ['WHA'],
+    'Actividad': ['Actividad', 'Activity', 'Descripcion', 'Descripción', 'Description', 'Texto', 'Text'],
+    'country': ['País', 'Pais', 'Country'],
+    'year': ['Año', 'Anio', 'Year'],
+}
+
+# GHS Index export (2019/2021 vintages), a validation source only: never a panel input
+GHS_PATH = os.path.join(FILES_DIR, "8b1d4fdf3ffc42729cecef25ef0b172e.csv")
+
+# Indicator codes parsed from the GHS export by default: the overall score and its six
+# categories. Any code of the hierarchy (e.g. "2.1", "1.1.1a") can be requested.
+GHS_OVERALL = "0"
+GHS_DEFAULT_INDICATORS = [GHS_OVERALL, "1", "2", "3", "4", "5", "6"]
+GHS_VERSION = 1
+# "1.1.1a) National plan ..." -> code "1.1.1a", name "National plan ..."
+GHS_CODE_RE = re.compile(r"^\s*(\d+(?:\.\d+)*[a-z]?)\)\s*(.*)$")
+
 
 def read_spar() -> pd.DataFrame:
     # A_e-SPAR.xlsx like structure resides in 6d1cd8c3c3b54015a3ebf7d77b7e8941.xlsx
-    xls_path = os.path.join(FILES_DIR, "6d1cd8c3c3b54015a3ebf7d77b7e8941.xlsx")
-    df = pd.read_excel(xls_path)
-    # Detect total score column
-    total_col = None
-    for c in df.columns:
-        if str(c).lower().strip() in ["promedio total", "total score", "spar_total", "overall score", "promedio total "]:
-            total_col = c
-            break
-    if total_col is None:
-        # fallback: look for a column that is numeric and resembles average
-        num_cols = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
-        if len(num_cols) > 0:
-            total_col = num_cols[0]
-    df = df.rename(columns={total_col: 'SPAR_total'})
-    df = df.rename(columns={"ISO Code": "iso3", "Estado Parte de IHR": "country"})
+    xls_path = SPAR_PATH
+    try:
+        df = read_excel_columns(xls_path, SPAR_COLUMNS, required=['SPAR_total'], dtypes={'SPAR_total': 'float64'})
+    except ExcelLayoutError:
+        # fallback: the first column that is numeric in the leading rows stands for the total score
+        head = sniff_excel(xls_path)
+        num_cols = [c for c in head.columns if pd.api.types.is_numeric_dtype(head[c])]
+        if not num_cols:
+            raise
+        columns = {**SPAR_COLUMNS, 'SPAR_total': [num_cols[0]]}
+        df = read_excel_columns(xls_path, columns, required=['SPAR_total'], dtypes={'SPAR_total': 'float64'})
     # Provide year if present; SPAR often by year
-    if 'Datos recividos' in df.columns:
-        df = df.rename(columns={'Datos recividos': 'year'})
     if 'year' not in df.columns:
         df['year'] = np.nan
     df = df[['country', 'iso3', 'year', 'SPAR_total']]
@@ -38,20 +74,20 @@ def read_spar() -> pd.DataFrame:
 
 
 def read_che_gdp() -> pd.DataFrame:
-    csv_path = os.path.join(FILES_DIR, "4b09fbba02e247b7a1497204a0c24cf3.csv")
+    csv_path = CHE_GDP_PATH
     df = pd.read_csv(csv_path)
     # filter indicator
     ind_mask = df['Indicator'].str.contains('Current health expenditure', case=False, na=False)
     df = df.loc[ind_mask].copy()
     id_cols = ['Country', 'Indicator']
-    m = long_from_wide_indicator(df, id_cols=id_cols)
+    m = long_from_wide_indicator(df, id_cols=id_cols, key_grid_col='Country')
     m = m.rename(columns={'Country': 'country', 'value': 'CHE_GDP'})
     return m[['country', 'year', 'CHE_GDP']]
 
 
 def read_uhc() -> pd.DataFrame:
     # UHC index is in 00cf6dbc70fd4017a7987b365d4abba2.csv (tidy format)
-    csv_path = os.path.join(FILES_DIR, "00cf6dbc70fd4017a7987b365d4abba2.csv")
+    csv_path = UHC_PATH
     # Some rows may include non-UTF8 bytes; read with latin1 fallback
     df = pd.read_csv(csv_path, encoding='latin1')
     df = df[df['IND_PER_CODE'].str.contains('UHC_INDEX', na=False)].copy()
@@ -62,21 +98,19 @@ def read_uhc() -> pd.DataFrame:
 
 
 def read_policy_plan_strategy() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    policy_path = os.path.join(FILES_DIR, "8e043d9282aa4e9eb2a6d3cde6f6884e.csv")
+    policy_path = POLICY_PATH
     # Plan file may not be available or may be embedded in another dataset; attempt to read if exists
-    plan_path = os.path.join(FILES_DIR, "c4da32f6d88f4fc9a1556831f24b3b1c.csv")
-    strategy_path = os.path.join(FILES_DIR, "fc9853b355d642cbbf5ed3f52acafd5d.csv")
+    plan_path = PLAN_PATH
+    strategy_path = STRATEGY_PATH
 
     def read_discrete(fp: str, varname: str) -> pd.DataFrame:
         if not os.path.exists(fp):
             return pd.DataFrame(columns=['country','year',varname])
-        try:
-            d = pd.read_csv(fp)
-        except Exception:
-            # If CSV is a container (e.g., zip/Numbers), return empty
-            return pd.DataFrame(columns=['country','year',varname])
+        # Apple Numbers documents saved under a .csv name are decoded natively. Parse errors
+        # propagate: load_all records them in LOAD_ERRORS instead of an all-NA column.
+        d = read_table_file(fp)
         id_cols = ['Country', 'Indicator'] if 'Indicator' in d.columns else ['Country']
-        m = long_from_wide_indicator(d, id_cols=id_cols)
+        m = long_from_wide_indicator(d, id_cols=id_cols, key_grid_col='Country')
         m = m.rename(columns={'Country': 'country', 'value': varname})
         return m[['country', 'year', varname]]
 
@@ -87,17 +121,15 @@ def read_policy_plan_strategy() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFram
 
 
 def read_right_to_health() -> pd.DataFrame:
-    # Recognition file path may be an Apple Numbers container; handle gracefully
-    csv_path = os.path.join(FILES_DIR, "5709f9c0c9924954a8265dee0251b1c1.csv")
+    # Recognition file is an Apple Numbers container saved under a .csv name
+    csv_path = RIGHT_TO_HEALTH_PATH
     if not os.path.exists(csv_path):
         return pd.DataFrame(columns=['country','year','Right_to_health'])
-    try:
-        df = pd.read_csv(csv_path)
-    except Exception:
-        return pd.DataFrame(columns=['country','year','Right_to_health'])
+    # Parse errors propagate to load_all (LOAD_ERRORS)
+    df = read_table_file(csv_path)
     # Assume columns Country, Year, value; otherwise pivot
     if 'Indicator' in df.columns:
-        ind_mask = df['Indicator'].str.contains('recognition', case=False, na=False)
+        ind_mask = df['Indicator'].str.contains('recogni|right to health', case=False, na=False)
         if ind_mask.any():
             df = df.loc[ind_mask]
     if 'Year' in df.columns and 'Value' in df.columns:
@@ -105,39 +137,238 @@ def read_right_to_health() -> pd.DataFrame:
         return df[['country', 'year', 'Right_to_health']]
     # Otherwise try melt
     id_cols = ['Country', 'Indicator'] if 'Indicator' in df.columns else ['Country']
-    m = long_from_wide_indicator(df, id_cols=id_cols)
+    m = long_from_wide_indicator(df, id_cols=id_cols, key_grid_col='Country')
     m = m.rename(columns={'Country': 'country', 'value': 'Right_to_health'})
     return m[['country', 'year', 'Right_to_health']]
 
 
 def read_exclusions() -> pd.DataFrame:
     # C_Exclusiones.xlsx mapped to 620a7cada3584b62b348fa698de4f28e.xlsx
-    xls_path = os.path.join(FILES_DIR, "620a7cada3584b62b348fa698de4f28e.xlsx")
-    df = pd.read_excel(xls_path)
-    df = df.rename(columns={'Año': 'year', 'País': 'country'})
+    xls_path = EXCLUSIONS_PATH
+    df = read_excel_columns(xls_path, EXCLUSIONS_COLUMNS, required=['country', 'year'])
     df['art7_excluded'] = 1
     return df[['country', 'year', 'art7_excluded']]
 
 
 def read_participation_raw() -> pd.DataFrame:
-    # C_Particip.xlsx is likely 00e422b990fa433395247ed6b6578aae.xlsx
-    xls_path = os.path.join(FILES_DIR, "00e422b990fa433395247ed6b6578aae.xlsx")
-    df = pd.read_excel(xls_path)
-    # Harmonize potential column names
-    if 'País' in df.columns:
-        df = df.rename(columns={'País': 'country'})
-    if 'Año' in df.columns:
-        df = df.rename(columns={'Año': 'year'})
-    return df
+    # C_Particip.xlsx is likely 00e422b990fa433395247ed6b6578aae.xlsx; the year is derived
+    # from the WHA session when the sheet has no year column
+    xls_path = PARTICIPATION_PATH
+    return read_excel_columns(xls_path, PARTICIPATION_COLUMNS, required=['country'])
+
+
+def ghs_indicator(label: str):
+    # (code, parent code, level, name) of a GHS column label; None for non-indicator columns.
+    # Level 1 is a category, 2 an indicator, 3 a sub-indicator and 4 a lettered question;
+    # the overall score is level 0.
+    label = str(label).strip()
+    if label.upper() == "OVERALL SCORE":
+        return GHS_OVERALL, None, 0, "Overall score"
+    match = GHS_CODE_RE.match(label)
+    if match is None:
+        return None
+    code, name = match.groups()
+    if code[-1].isalpha():
+        parent, level = code[:-1], code.count(".") + 2
+    else:
+        parent, level = (code.rsplit(".", 1)[0] if "." in code else GHS_OVERALL), code.count(".") + 1
+    return code, parent, level, name
+
+
+def ghs_hierarchy(csv_path: str = GHS_PATH) -> pd.DataFrame:
+    # Indicator tree of the GHS export from its header row alone
+    header = pd.read_csv(csv_path, nrows=0, encoding="utf-8-sig").columns
+    rows = [(label, *parsed) for label in header if (parsed := ghs_indicator(label)) is not None]
+    return pd.DataFrame(rows, columns=["label", "indicator", "parent", "level", "name"])
+
+
+def read_ghs(indicators=None, csv_path: str = GHS_PATH) -> pd.DataFrame:
+    # Tidy long GHS scores (country, year, indicator, category, level, value) for the requested
+    # indicator codes. Only those columns are parsed (usecols) and straight into float32; the
+    # full header is only used to map codes to labels.
+    indicators = list(indicators or GHS_DEFAULT_INDICATORS)
+    tree = ghs_hierarchy(csv_path)
+    tree = tree.loc[tree["indicator"].isin(indicators)]
+    unknown = sorted(set(indicators) - set(tree["indicator"]))
+    if unknown:
+        raise KeyError(f"GHS indicators not in {Path(csv_path).name}: {unknown}")
+    labels = dict(zip(tree["label"], tree["indicator"]))
+    df = pd.read_csv(
+        csv_path,
+        encoding="utf-8-sig",
+        usecols=["Country", "Year", *labels],
+        dtype={"Country": "str", "Year": "int16", **{label: "float32" for label in labels}},
+    )
+    wide = df[list(labels)].to_numpy(dtype="float32")
+    present = ~np.isnan(wide)
+    # Column-major walk of the observed cells: one block per indicator, as melt would give
+    col_idx, row_idx = np.nonzero(present.T)
+    codes = list(labels.values())
+    # Category (first code segment) each score rolls up to; the overall score is its own
+    category = [code.split(".")[0].rstrip("abcdefghijklmnopqrstuvwxyz") for code in codes]
+    level = tree.set_index("indicator")["level"].reindex(codes).to_numpy(dtype="int8")
+    m = pd.DataFrame({
+        "country": pd.Categorical(df["Country"].to_numpy()[row_idx]),
+        "year": df["Year"].to_numpy()[row_idx],
+        "indicator": pd.Categorical.from_codes(col_idx, categories=codes),
+        "category": pd.Categorical(np.asarray(category, dtype=object)[col_idx]),
+        "level": level[col_idx],
+        "value": wide.T[present.T],
+    })
+    m.attrs["ghs_names"] = dict(zip(tree["indicator"], tree["name"]))
+    return m
+
+
+def load_ghs(indicators=None, use_cache=None, refresh: bool = False) -> pd.DataFrame:
+    # read_ghs through the ingest cache, one entry per indicator selection. The selection
+    # defaults to IECGGS_GHS_INDICATORS (comma-separated codes) or GHS_DEFAULT_INDICATORS.
+    if indicators is None:
+        env = os.getenv("IECGGS_GHS_INDICATORS", "")
+        indicators = [c.strip() for c in env.split(",") if c.strip()] or GHS_DEFAULT_INDICATORS
+    if use_cache is None:
+        use_cache = os.getenv("IECGGS_NO_CACHE", "0") != "1"
+    indicators = list(dict.fromkeys(indicators))
+    version = f"{GHS_VERSION}|{','.join(indicators)}"
+    with span("ingest.ghs", kind="reader") as s:
+        result = cached_call("ghs", lambda: read_ghs(indicators), [GHS_PATH], version, use_cache=use_cache,
+                             refresh=refresh)
+        s.outputs(result)
+    return result
+
+
+# name -> (reader, input files, reader version). Bump a reader's version whenever its
+# output changes so cached frames from older code are not reused; readers of files that
+# may be Numbers documents also carry the decoder's version.
+SOURCES = {
+    'spar': (read_spar, [SPAR_PATH], 2),
+    'che_gdp': (read_che_gdp, [CHE_GDP_PATH], 2),
+    'uhc': (read_uhc, [UHC_PATH], 1),
+    'policy_plan_strategy': (read_policy_plan_strategy, [POLICY_PATH, PLAN_PATH, STRATEGY_PATH], f'4|numbers{NUMBERS_READER_VERSION}'),
+    'right_to_health': (read_right_to_health, [RIGHT_TO_HEALTH_PATH], f'4|numbers{NUMBERS_READER_VERSION}'),
+    'exclusions': (read_exclusions, [EXCLUSIONS_PATH], 1),
+    'participation_raw': (read_participation_raw, [PARTICIPATION_PATH], 2),
+}
+
+
+# Column layout returned for a source whose reader failed, so one broken file does not
+# abort the whole run
+EMPTY_COLUMNS = {
+    'spar': ['country', 'iso3', 'year', 'SPAR_total'],
+    'che_gdp': ['country', 'year', 'CHE_GDP'],
+    'uhc': ['country', 'year', 'UHC_index'],
+    'policy_plan_strategy': (['country', 'year', 'Policy_UHC'], ['country', 'year', 'Plan_UHC'], ['country', 'year', 'Strategy_UHC']),
+    'right_to_health': ['country', 'year', 'Right_to_health'],
+    'exclusions': ['country', 'year', 'art7_excluded'],
+    'participation_raw': ['WHA', 'Actividad', 'country', 'year'],
+}
+
+EXECUTORS = ('auto', 'serial', 'thread', 'process')
+
+# Errors from the last load_all() call, by source name
+LOAD_ERRORS: Dict[str, str] = {}
+
+
+def _empty_result(name: str):
+    cols = EMPTY_COLUMNS[name]
+    if isinstance(cols, tuple):
+        return tuple(pd.DataFrame(columns=c) for c in cols)
+    return pd.DataFrame(columns=cols)
+
+
+def _run_reader(name: str):
+    # Module-level so it can be pickled into a process pool by source name
+    with span(f'ingest.{name}', kind='reader') as s:
+        result = SOURCES[name][0]()
+        s.outputs(result)
+    return result
+
+
+def _run_reader_in_worker(name: str):
+    # Process-pool variant: returns the reader's spans with its result, since the worker's
+    # records (including any copied from the parent at fork) are otherwise lost
+    take_spans()
+    result = _run_reader(name)
+    return result, take_spans()
+
+
+def _is_cpu_bound(files) -> bool:
+    # openpyxl and Numbers (pure-Python Snappy/protobuf) parsing hold the GIL; CSV parsing
+    # mostly releases it
+    return any(str(fp).endswith('.xlsx') or is_numbers_document(fp) for fp in files)
+
+
+def _read_sources(names, executor: str, max_workers=None) -> Dict[str, object]:
+    results = {}
+    if executor == 'serial' or len(names) <= 1:
+        for name in names:
+            try:
+                results[name] = _run_reader(name)
+            except Exception as e:
+                LOAD_ERRORS[name] = f'{type(e).__name__}: {e}'
+        return results
+
+    if executor == 'auto':
+        proc_names = [n for n in names if _is_cpu_bound(SOURCES[n][1])]
+    elif executor == 'process':
+        proc_names = list(names)
+    else:
+        proc_names = []
+    thread_names = [n for n in names if n not in proc_names]
+
+    futures = {}
+    pools = []
+    try:
+        if proc_names:
+            pools.append(ProcessPoolExecutor(max_workers=min(len(proc_names), max_workers or os.cpu_count() or 1)))
+            futures.update({n: pools[-1].submit(_run_reader_in_worker, n) for n in proc_names})
+        if thread_names:
+            pools.append(ThreadPoolExecutor(max_workers=min(len(thread_names), max_workers or 8)))
+            futures.update({n: pools[-1].submit(_run_reader, n) for n in thread_names})
+        for name in names:
+            try:
+                results[name] = futures[name].result()
+                if name in proc_names:
+                    results[name], spans = results[name]
+                    add_spans(spans)
+            except Exception as e:
+                LOAD_ERRORS[name] = f'{type(e).__name__}: {e}'
+    finally:
+        for pool in pools:
+            pool.shutdown(wait=True)
+    return results
+
+
+def load_all(use_cache=None, refresh: bool = False, executor=None, max_workers=None) -> Dict[str, pd.DataFrame]:
+    if use_cache is None:
+        use_cache = os.getenv('IECGGS_NO_CACHE', '0') != '1'
+    if executor is None:
+        executor = os.getenv('IECGGS_INGEST_EXECUTOR', 'auto')
+    if executor not in EXECUTORS:
+        raise ValueError(f'Unknown executor: {executor} (expected one of {EXECUTORS})')
+    LOAD_ERRORS.clear()
+
+    results = {}
+    keys = {}
+    with span('ingest.cache_lookup') as s:
+        for name, (reader, files, version) in SOURCES.items():
+            if not use_cache:
+                mark_disabled(name)
+                continue
+            keys[name], hit = lookup_cached(name, files, version, refresh=refresh)
+            if hit is not None:
+                results[name] = hit
+        s.outputs(list(results.values()))
+        s.set(hits=len(results))
 
+    pending = [name for name in SOURCES if name not in results]
+    fresh = _read_sources(pending, executor, max_workers=max_workers)
+    for name in pending:
+        if name in fresh:
+            results[name] = fresh[name]
+            if use_cache:
+                store_cached(name, keys[name], fresh[name])
+        else:
+            results[name] = _empty_result(name)
 
-def load_all() -> Dict[str, pd.DataFrame]:
-    return {
-        'spar': read_spar(),
-        'che_gdp': read_che_gdp(),
-        'uhc': read_uhc(),
-        'policy_plan_strategy': read_policy_plan_strategy(),
-        'right_to_health': read_right_to_health(),
-        'exclusions': read_exclusions(),
-        'participation_raw': read_participation_raw(),
-    }
+    # Stable source order regardless of completion order
+    return {name: results[name] for name in SOURCES}
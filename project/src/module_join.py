@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from utils import KEY_GRID_ATTR, resolve_iso3
+
+
+PANEL_KEY = ['iso3', 'year']
+
+# How duplicated (iso3, year) rows inside one source are collapsed before joining.
+# Columns not listed fall back to DEFAULT_AGG.
+DEFAULT_AGG = 'mean'
+DEFAULT_AGG_RULES = {
+    'SPAR_total': 'mean',
+    'SPAR_reported': 'max',
+    'CHE_GDP': 'mean',
+    'UHC_index': 'mean',
+    'Policy_UHC': 'max',
+    'Plan_UHC': 'max',
+    'Strategy_UHC': 'max',
+    'Right_to_health': 'max',
+    'participation_event': 'sum',
+    'leadership_event': 'sum',
+    'decision_event': 'sum',
+    'art7_excluded': 'max',
+}
+
+
+class KeyCardinalityError(ValueError):
+    pass
+
+
+def attach_iso3(df: pd.DataFrame) -> pd.DataFrame:
+    # Keep iso3 codes a source already carries; resolve the rest from country names
+    df = df.copy(deep=False)
+    resolved = resolve_iso3(df['country']) if 'country' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    if 'iso3' in df.columns:
+        iso3 = df['iso3'].where(df['iso3'].notna() & (df['iso3'].astype(str).str.len() == 3))
+        df['iso3'] = iso3.fillna(resolved)
+    else:
+        df['iso3'] = resolved
+    return df
+
+
+def _restore_key_grid(out: pd.DataFrame, grid: dict) -> pd.DataFrame:
+    # Keys of the empty cells a wide reader dropped (long_from_wide_indicator): every resolved
+    # country of the table by every year column, named after the table's first row of that iso3
+    names = pd.Series(grid['country'], dtype=object)
+    iso3 = resolve_iso3(names)
+    first = names[iso3.notna()].groupby(iso3[iso3.notna()].astype(str), sort=False).first()
+    if first.empty or not grid['year']:
+        return out
+    keys = pd.MultiIndex.from_product([first.index, [int(y) for y in grid['year']]], names=PANEL_KEY)
+    out = out.reindex(out.index.union(keys).sort_values())
+    if 'country' in out.columns:
+        named = out.index.get_level_values('iso3').map(first)
+        out['country'] = out['country'].where(named.isna(), named)
+    return out
+
+
+def normalize_source(df: pd.DataFrame, name: str, agg_rules=None, on_duplicate: str = 'aggregate'):
+    if on_duplicate not in ('aggregate', 'raise'):
+        raise ValueError(f'Unknown on_duplicate policy: {on_duplicate}')
+    rules = dict(DEFAULT_AGG_RULES)
+    rules.update(agg_rules or {})
+
+    value_cols = [c for c in df.columns if c not in ('country', 'iso3', 'year')]
+    stats = {'source': name, 'rows_in': len(df)}
+    grid = df.attrs.get(KEY_GRID_ATTR)
+
+    df = attach_iso3(df)
+    df['year'] = pd.to_numeric(df['year'], errors='coerce')
+    no_key = df['iso3'].isna() | df['year'].isna()
+    stats['rows_missing_key'] = int(no_key.sum())
+    df = df.loc[~no_key]
+    df = df.assign(year=df['year'].astype(int), iso3=df['iso3'].astype(str))
+
+    dup = df.duplicated(PANEL_KEY, keep=False)
+    stats['rows_duplicate_key'] = int(dup.sum())
+    if stats['rows_duplicate_key'] and on_duplicate == 'raise':
+        raise KeyCardinalityError(
+            f"Source '{name}' has {stats['rows_duplicate_key']} rows sharing an (iso3, year) key"
+        )
+
+    grp = df.groupby(PANEL_KEY, sort=True)
+    out = {}
+    if 'country' in df.columns:
+        out['country'] = grp['country'].first()
+    for col in value_cols:
+        rule = rules.get(col, DEFAULT_AGG)
+        if rule == 'sum':
+            out[col] = grp[col].sum(min_count=1)
+        else:
+            out[col] = grp[col].agg(rule)
+    out = pd.DataFrame(out, index=grp.size().index)
+    out = out.reindex(columns=(['country'] if 'country' in df.columns else []) + value_cols)
+    if grid is not None:
+        out = _restore_key_grid(out, grid)
+    stats['rows_out'] = len(out)
+    return out, stats
+
+
+def assemble_panel(sources: dict[str, pd.DataFrame], agg_rules=None, on_duplicate: str = 'aggregate'):
+    normalized = []
+    report = []
+    for name, df in sources.items():
+        norm, stats = normalize_source(df, name, agg_rules=agg_rules, on_duplicate=on_duplicate)
+        normalized.append(norm)
+        report.append(stats)
+
+    # Single precomputed key index: union of all (iso3, year) keys, sorted once
+    keys = pd.concat([n.index.to_frame(index=False) for n in normalized], ignore_index=True)
+    keys = keys.drop_duplicates().sort_values(PANEL_KEY)
+    key_index = pd.MultiIndex.from_frame(keys)
+
+    # One label per iso3, whatever the year or source: sources spell countries differently
+    # ('Mexico' vs 'Mexico '), so the first non-null stripped label in source order wins
+    labels = pd.Series(dtype=object)
+    columns = []
+    for name, norm in zip(sources, normalized):
+        # One row per key is what makes the reindex below a one-to-one join
+        if not norm.index.is_unique:
+            raise KeyCardinalityError(f"Source '{name}' still has duplicate (iso3, year) keys after normalization")
+        aligned = norm.reindex(key_index)
+        if 'country' in norm.columns:
+            named = norm['country'].astype(object).str.strip().replace('', pd.NA).dropna()
+            labels = labels.combine_first(named.groupby(level='iso3').first())
+            aligned = aligned.drop(columns='country')
+        columns.append(aligned)
+    iso3 = key_index.get_level_values('iso3')
+    country = pd.Series(labels.reindex(iso3).to_numpy(), index=key_index, dtype=object, name='country')
+
+    panel = pd.concat([country] + columns, axis=1).reset_index()
+    panel = panel[['iso3', 'country', 'year'] + [c for c in panel.columns if c not in ('iso3', 'country', 'year')]]
+    return panel, pd.DataFrame(report)
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import struct
+import zipfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pandas as pd
+
+
+# Apple Numbers documents are zip containers of Snappy-compressed protobuf archives
+# (.iwa). Only the pieces needed to rebuild plain tables are decoded here: the IWA chunk
+# framing, raw Snappy, the protobuf wire format, and the TST table model/tile/string
+# archives (cell storage version 5, as written by Numbers 10+).
+
+ZIP_MAGIC = b'PK\x03\x04'
+DOCUMENT_IWA = 'Index/Document.iwa'
+NUMBERS_READER_VERSION = 1
+
+# TSP/TST message types
+TABLE_MODEL_TYPE = 6001
+TILE_TYPE = 6002
+TABLE_DATA_LIST_TYPE = 6005
+
+# Cell storage (v5): optional fields present according to the flags word, in this order
+_CELL_FIELD_SIZES = [
+    (0x1, 'decimal128', 16),
+    (0x2, 'double', 8),
+    (0x4, 'seconds', 8),
+    (0x8, 'string_id', 4),
+    (0x10, 'rich_id', 4),
+]
+BOOL_CELL_TYPE = 6
+EPOCH = datetime(2001, 1, 1)
+
+
+class NumbersFormatError(ValueError):
+    pass
+
+
+def is_zip_container(path: str | Path) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(4) == ZIP_MAGIC
+    except OSError:
+        return False
+
+
+def is_numbers_document(path: str | Path) -> bool:
+    # Detected by content, whatever the extension (several sources are Numbers files named .csv)
+    if not is_zip_container(path):
+        return False
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return DOCUMENT_IWA in zf.namelist()
+    except zipfile.BadZipFile:
+        return False
+
+
+def _varint(buf, pos: int):
+    result = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def snappy_decompress(buf: bytes) -> bytes:
+    # Raw Snappy block: varint uncompressed length, then literal / back-reference elements
+    size, pos = _varint(buf, 0)
+    out = bytearray()
+    end = len(buf)
+    while pos < end:
+        tag = buf[pos]
+        pos += 1
+        kind = tag & 3
+        if kind == 0:
+            length = tag >> 2
+            if length >= 60:
+                nbytes = length - 59
+                length = int.from_bytes(buf[pos:pos + nbytes], 'little')
+                pos += nbytes
+            length += 1
+            out += buf[pos:pos + length]
+            pos += length
+            continue
+        if kind == 1:
+            length = ((tag >> 2) & 7) + 4
+            offset = ((tag >> 5) << 8) | buf[pos]
+            pos += 1
+        elif kind == 2:
+            length = (tag >> 2) + 1
+            offset = int.from_bytes(buf[pos:pos + 2], 'little')
+            pos += 2
+        else:
+            length = (tag >> 2) + 1
+            offset = int.from_bytes(buf[pos:pos + 4], 'little')
+            pos += 4
+        if offset == 0 or offset > len(out):
+            raise NumbersFormatError('Corrupt Snappy stream: invalid copy offset')
+        start = len(out) - offset
+        if offset >= length:
+            out += out[start:start + length]
+        else:
+            # overlapping copy repeats the last `offset` bytes
+            out += (out[start:] * (length // offset + 1))[:length]
+    if len(out) != size:
+        raise NumbersFormatError(f'Corrupt Snappy stream: expected {size} bytes, got {len(out)}')
+    return bytes(out)
+
+
+def iwa_decompress(data: bytes) -> bytes:
+    # IWA framing: chunks of [0x00][3-byte little-endian length][Snappy block]
+    out = bytearray()
+    pos = 0
+    while pos < len(data):
+        if data[pos] != 0:
+            raise NumbersFormatError(f'Unexpected IWA chunk header {data[pos]:#x}')
+        length = int.from_bytes(data[pos + 1:pos + 4], 'little')
+        pos += 4
+        out += snappy_decompress(data[pos:pos + length])
+        pos += length
+    return bytes(out)
+
+
+def parse_message(buf: bytes) -> dict:
+    # Protobuf wire format without a schema: field number -> list of raw values (int for
+    # varints, bytes for length-delimited and fixed-width fields)
+    fields = {}
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = _varint(buf, pos)
+        wire = key & 7
+        if wire == 0:
+            value, pos = _varint(buf, pos)
+        elif wire == 1:
+            value = buf[pos:pos + 8]
+            pos += 8
+        elif wire == 2:
+            length, pos = _varint(buf, pos)
+            value = buf[pos:pos + length]
+            pos += length
+        elif wire == 5:
+            value = buf[pos:pos + 4]
+            pos += 4
+        else:
+            raise NumbersFormatError(f'Unsupported protobuf wire type {wire}')
+        fields.setdefault(key >> 3, []).append(value)
+    return fields
+
+
+def _field(msg: dict, number: int, default=None):
+    values = msg.get(number)
+    return values[0] if values else default
+
+
+def _ref(msg: dict, number: int):
+    # TSP.Reference { identifier = 1 }
+    value = _field(msg, number)
+    return None if value is None else _field(parse_message(value), 1)
+
+
+def _iter_archives(data: bytes):
+    # Decompressed .iwa: repeated [varint length][ArchiveInfo][message payloads...]
+    pos = 0
+    while pos < len(data):
+        length, pos = _varint(data, pos)
+        info = parse_message(data[pos:pos + length])
+        pos += length
+        identifier = _field(info, 1)
+        for raw in info.get(2, []):
+            msg_info = parse_message(raw)
+            size = _field(msg_info, 3, 0)
+            yield identifier, _field(msg_info, 1), data[pos:pos + size]
+            pos += size
+
+
+def read_objects(zf: zipfile.ZipFile) -> dict:
+    # identifier -> (message type, payload) over every archive in the container
+    objects = {}
+    for name in zf.namelist():
+        if name.startswith('Index/') and name.endswith('.iwa'):
+            for identifier, msg_type, payload in _iter_archives(iwa_decompress(zf.read(name))):
+                objects[identifier] = (msg_type, payload)
+    return objects
+
+
+def _decimal128(b: bytes) -> float:
+    exponent = (((b[15] & 0x7F) << 7) | (b[14] >> 1)) - 0x1820
+    mantissa = b[14] & 1
+    for i in range(13, -1, -1):
+        mantissa = mantissa * 256 + b[i]
+    if b[15] & 0x80:
+        mantissa = -mantissa
+    return float(Decimal(mantissa).scaleb(exponent))
+
+
+def _cell_value(buf: bytes, offset: int, strings: dict):
+    cell_type = buf[offset + 1]
+    flags = struct.unpack_from('<I', buf, offset + 8)[0]
+    pos = offset + 12
+    fields = {}
+    for flag, name, size in _CELL_FIELD_SIZES:
+        if flags & flag:
+            fields[name] = buf[pos:pos + size]
+            pos += size
+    if 'string_id' in fields:
+        return strings.get(struct.unpack('<i', fields['string_id'])[0])
+    if 'decimal128' in fields:
+        return _decimal128(fields['decimal128'])
+    if 'double' in fields:
+        value = struct.unpack('<d', fields['double'])[0]
+        return bool(value) if cell_type == BOOL_CELL_TYPE else value
+    if 'seconds' in fields:
+        return EPOCH + timedelta(seconds=struct.unpack('<d', fields['seconds'])[0])
+    return None  # empty, rich text, error and formula-only cells
+
+
+def _string_table(objects: dict, identifier) -> dict:
+    if identifier not in objects:
+        return {}
+    entries = parse_message(objects[identifier][1]).get(3, [])
+    strings = {}
+    for raw in entries:
+        entry = parse_message(raw)
+        text = _field(entry, 3)
+        strings[_field(entry, 1)] = None if text is None else text.decode('utf-8')
+    return strings
+
+
+def _table_grid(objects: dict, model: dict) -> list:
+    n_rows = _field(model, 6, 0)
+    n_cols = _field(model, 7, 0)
+    store = parse_message(_field(model, 4, b''))
+    strings = _string_table(objects, _ref(store, 4))
+    tiles = parse_message(_field(store, 3, b''))
+    tile_size = _field(tiles, 2, 256)
+    grid = [[None] * n_cols for _ in range(n_rows)]
+    for raw in tiles.get(1, []):
+        entry = parse_message(raw)
+        tile_id = _field(entry, 1, 0)
+        tile_ref = _ref(entry, 2)
+        if tile_ref not in objects:
+            continue
+        tile = parse_message(objects[tile_ref][1])
+        for raw_row in tile.get(5, []):
+            row_info = parse_message(raw_row)
+            row = tile_id * tile_size + _field(row_info, 1, 0)
+            buf = _field(row_info, 6)
+            offsets = _field(row_info, 7)
+            if buf is None or offsets is None:
+                raise NumbersFormatError('Only Numbers cell storage v5 (Numbers 10+) is supported')
+            if row >= n_rows:
+                continue
+            wide = _field(row_info, 8, 0)
+            for col, off in enumerate(struct.unpack(f'<{len(offsets) // 2}h', offsets)[:n_cols]):
+                if off < 0:  # 0xFFFF: no cell
+                    continue
+                grid[row][col] = _cell_value(buf, off * 4 if wide else off, strings)
+    return grid
+
+
+def _header_name(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return '' if value is None else str(value)
+
+
+def decode_numbers_tables(path: str | Path) -> dict:
+    # table name -> DataFrame, with the first row used as the header (as a CSV export would)
+    tables = {}
+    with zipfile.ZipFile(path) as zf:
+        objects = read_objects(zf)
+    for msg_type, payload in objects.values():
+        if msg_type != TABLE_MODEL_TYPE:
+            continue
+        model = parse_message(payload)
+        name = _field(model, 8, b'').decode('utf-8') or f'Table {len(tables) + 1}'
+        grid = _table_grid(objects, model)
+        if not grid:
+            tables[name] = pd.DataFrame()
+            continue
+        columns = [_header_name(v) for v in grid[0]]
+        tables[name] = pd.DataFrame.from_records(grid[1:], columns=columns)
+    return tables
+
+
+def read_numbers(path: str | Path, table=None) -> pd.DataFrame:
+    # One table of a Numbers document (default: the one with the most cells). Not cached
+    # here: the ingest reader calling it caches its whole result (module_ingest.SOURCES,
+    # whose version includes NUMBERS_READER_VERSION).
+    tables = decode_numbers_tables(path)
+    if not tables:
+        raise NumbersFormatError(f'No tables found in {path}')
+    if table is not None:
+        return tables[table]
+    return max(tables.values(), key=lambda df: df.size)
+
+
+def read_table_file(path: str | Path, **read_csv_kwargs) -> pd.DataFrame:
+    # CSV reader that transparently handles Numbers documents saved with a .csv name
+    if is_numbers_document(path):
+        return read_numbers(path)
+    return pd.read_csv(path, **read_csv_kwargs)
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from module_cache import file_digest
+from module_profile import span
+
+try:
+    import pyarrow  # noqa: F401
+    _HAS_ARROW = True
+except Exception:  # without Parquet support artifacts fall back to gzip CSV
+    _HAS_ARROW = False
+
+try:
+    import zstandard  # noqa: F401
+    _HAS_ZSTD = True
+except Exception:
+    _HAS_ZSTD = False
+
+
+MANIFEST_NAME = 'manifest.json'
+DEFAULT_FORMATS = ('parquet',)
+# Suffix and pandas compression for every supported artifact format
+FORMATS = {
+    'parquet': ('.parquet', None),
+    'csv': ('.csv', None),
+    'csv.gz': ('.csv.gz', 'gzip'),
+    'csv.zst': ('.csv.zst', 'zstd'),
+}
+# Read preference when several formats of one artifact exist
+READ_ORDER = ('parquet', 'csv', 'csv.gz', 'csv.zst')
+
+CATEGORY_COLUMNS = ('iso3', 'country')
+NUMERIC_KINDS = ('empty', 'floating', 'integer', 'mixed-integer-float')
+
+
+def output_formats(formats=None) -> tuple:
+    # Formats from the argument or IECGGS_OUTPUT_FORMATS (comma-separated), e.g. "parquet,csv.gz"
+    if formats is None:
+        formats = os.getenv('IECGGS_OUTPUT_FORMATS') or ','.join(DEFAULT_FORMATS)
+    if isinstance(formats, str):
+        formats = [f.strip() for f in formats.split(',') if f.strip()]
+    formats = tuple(dict.fromkeys(formats))
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        raise ValueError(f'Unknown output format(s) {unknown}; expected some of {list(FORMATS)}')
+    if 'csv.zst' in formats and not _HAS_ZSTD:
+        raise ValueError("Output format 'csv.zst' requires the zstandard package")
+    if 'parquet' in formats and not _HAS_ARROW:
+        formats = tuple(f for f in formats if f != 'parquet') or ('csv.gz',)
+    return formats
+
+
+def artifact_paths(outdir: str | Path, name: str, formats=None) -> list[Path]:
+    return [Path(outdir) / f'{name}{FORMATS[fmt][0]}' for fmt in output_formats(formats)]
+
+
+def typed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # Compact, self-describing dtypes: categorical country codes, int16 years, bool flags
+    out = df.copy(deep=False)
+    for col in out.columns:
+        s = out[col]
+        if col in CATEGORY_COLUMNS:
+            out[col] = s.astype('category')
+        elif col == 'year' and pd.api.types.is_numeric_dtype(s):
+            out[col] = s.astype('int16') if s.notna().all() else s.astype('Int16')
+        elif col.startswith('flag_') and not pd.api.types.is_bool_dtype(s):
+            out[col] = s.astype(bool) if s.notna().all() else s.astype('boolean')
+        elif s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) in NUMERIC_KINDS:
+            # numbers held in object columns (e.g. all-missing sources) are stored as float
+            out[col] = s.astype('float64')
+    return out
+
+
+def _schema(df: pd.DataFrame) -> list[dict]:
+    return [{'name': str(col), 'dtype': str(dtype)} for col, dtype in df.dtypes.items()]
+
+
+def _write_one(df: pd.DataFrame, path: Path, fmt: str) -> None:
+    tmp = path.with_name(path.name + '.tmp')
+    if fmt == 'parquet':
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False, compression=FORMATS[fmt][1])
+    os.replace(tmp, path)
+
+
+def load_manifest(outdir: str | Path) -> dict:
+    try:
+        return json.loads((Path(outdir) / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {'artifacts': {}}
+
+
+def _save_manifest(outdir: Path, manifest: dict) -> None:
+    path = outdir / MANIFEST_NAME
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def write_artifact(df: pd.DataFrame, outdir: str | Path, name: str, formats=None) -> dict:
+    # Writes `name` in every requested format and records rows, schema and checksums
+    # in outdir/manifest.json. Formats no longer requested are removed from disk.
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    formats = output_formats(formats)
+    with span(f'write.{name}', kind='write') as s:
+        s.inputs(df)
+        typed = typed_frame(df)
+        files = {}
+        for fmt in formats:
+            path = outdir / f'{name}{FORMATS[fmt][0]}'
+            _write_one(typed, path, fmt)
+            files[fmt] = {'path': path.name, 'bytes': path.stat().st_size, 'sha256': file_digest(path)}
+        s.outputs(typed)
+        s.set(bytes=sum(f['bytes'] for f in files.values()), formats=list(formats))
+    for fmt, (suffix, _) in FORMATS.items():
+        if fmt not in formats:
+            (outdir / f'{name}{suffix}').unlink(missing_ok=True)
+
+    entry = {'rows': len(typed), 'columns': _schema(typed), 'files': files, 'updated': time.time()}
+    manifest = load_manifest(outdir)
+    manifest.setdefault('artifacts', {})[name] = entry
+    _save_manifest(outdir, manifest)
+    return entry
+
+
+def find_artifact(outdir: str | Path, name: str):
+    # (format, path) of the preferred existing file for `name`, or None
+    for fmt in READ_ORDER:
+        path = Path(outdir) / f'{name}{FORMATS[fmt][0]}'
+        if path.exists() and (fmt != 'parquet' or _HAS_ARROW):
+            return fmt, path
+    return None
+
+
+def read_artifact(outdir: str | Path, name: str, columns=None) -> pd.DataFrame:
+    found = find_artifact(outdir, name)
+    if found is None:
+        raise FileNotFoundError(f"Artifact '{name}' not found in {outdir}. Run pipeline first.")
+    fmt, path = found
+    if fmt == 'parquet':
+        return pd.read_parquet(path, columns=columns)
+    return typed_frame(pd.read_csv(path, usecols=columns, compression=FORMATS[fmt][1]))
+
+
+def iter_artifact(outdir: str | Path, name: str, chunk_rows: int = 100_000, columns=None):
+    # Yields typed frames of at most chunk_rows rows without loading the whole artifact
+    found = find_artifact(outdir, name)
+    if found is None:
+        raise FileNotFoundError(f"Artifact '{name}' not found in {outdir}. Run pipeline first.")
+    fmt, path = found
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(path, usecols=columns, compression=FORMATS[fmt][1], chunksize=chunk_rows):
+            yield typed_frame(chunk)
+
+
+def list_artifacts(outdir: str | Path) -> dict:
+    return load_manifest(outdir).get('artifacts', {})
+
+
+def verify_artifact(outdir: str | Path, name: str) -> bool:
+    # True when every file recorded for `name` still matches its manifest checksum
+    entry = list_artifacts(outdir).get(name)
+    if not entry:
+        return False
+    return all(file_digest(Path(outdir) / f['path']) == f['sha256'] for f in entry['files'].values())
@@ -21,7 +21,45 @@ INSTITUTIONAL_PARTICIPATION_PATTERNS = [
 ]
 
 ADMIN_BODY_PATTERNS = [
-    r"caja comun de pensiones", r"common pension fund", r"administrative", r"financ(e|ial)" ,
+    r"caja comun de pensiones", r"common pension fund", r"administrative", r"financ(?:e|ial)" ,
+]
+
+FALLBACK_INSTITUTIONAL_PATTERN = r"election|appoint|nombramiento|eleccion"
+
+# Category precedence: the first category with any matching pattern wins
+CATEGORY_PATTERNS = [
+    ('leadership', LEADERSHIP_PATTERNS),
+    ('decision_body', DECISION_BODY_PATTERNS),
+    ('institutional_participation', INSTITUTIONAL_PARTICIPATION_PATTERNS),
+    ('administrative_body', ADMIN_BODY_PATTERNS),
+    ('institutional_participation', [FALLBACK_INSTITUTIONAL_PATTERN]),
+]
+
+# activity_type -> country-year count column produced by clean_participation. Adding a
+# category here adds a column to the same aggregation pass.
+EVENT_COLUMNS = {
+    'leadership': 'leadership_event',
+    'decision_body': 'decision_event',
+    'institutional_participation': 'institutional_event',
+    'administrative_body': 'administrative_event',
+    'other': 'other_event',
+}
+
+# Texts are lower-cased before matching, so IGNORECASE only changes the outcome for the
+# two lower-case letters that case-fold onto ASCII ('ı' -> i, 'ſ' -> s). Texts holding
+# them take the (much slower) IGNORECASE path; everything else matches case-sensitively.
+_CASEFOLD_SPECIAL = re.compile("[\u0131\u017f]")
+
+
+def _compile_category(name: str, pats, flags=0):
+    return re.compile(f"(?P<{name}>{'|'.join(pats)})", flags)
+
+
+# One alternation per category; the fallback keeps its original case-sensitive match
+ACTIVITY_CLASSIFIERS = [
+    (label, _compile_category(f"c{i}_{label}", pats),
+     _compile_category(f"c{i}_{label}", pats, 0 if i == len(CATEGORY_PATTERNS) - 1 else re.IGNORECASE))
+    for i, (label, pats) in enumerate(CATEGORY_PATTERNS)
 ]
 
 
@@ -34,31 +72,74 @@ def normalize_activity_text(s: str) -> str:
     return s2
 
 
+def normalize_activity_series(s: pd.Series) -> pd.Series:
+    # Vectorized normalize_activity_text over unique raw values
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    norm = (
+        pd.Series(uniques, dtype=object).astype(str)
+        .str.replace(r"\s+", " ", regex=True).str.strip().str.lower()
+    )
+    out = np.where(codes >= 0, norm.to_numpy(dtype=object)[codes.clip(min=0)], "")
+    return pd.Series(out, index=s.index, dtype=object)
+
+
 def classify_activity(activity_raw: str) -> str:
     txt = normalize_activity_text(activity_raw)
     if not txt:
         return 'unknown'
-    # rule-based matching in order
-    for pat in LEADERSHIP_PATTERNS:
-        if re.search(pat, txt, flags=re.IGNORECASE):
-            return 'leadership'
-    for pat in DECISION_BODY_PATTERNS:
-        if re.search(pat, txt, flags=re.IGNORECASE):
-            return 'decision_body'
-    for pat in INSTITUTIONAL_PARTICIPATION_PATTERNS:
-        if re.search(pat, txt, flags=re.IGNORECASE):
-            return 'institutional_participation'
-    for pat in ADMIN_BODY_PATTERNS:
-        if re.search(pat, txt, flags=re.IGNORECASE):
-            return 'administrative_body'
-    # fallback: if contains election/appoint keywords
-    if re.search(r"election|appoint|nombramiento|eleccion", txt):
-        return 'institutional_participation'
+    # rule-based matching in precedence order
+    for label, _, rx in ACTIVITY_CLASSIFIERS:
+        if rx.search(txt):
+            return label
     return 'other'
 
 
-def clean_participation(df_raw: pd.DataFrame) -> pd.DataFrame:
-    df = df_raw.copy()
+def classify_activities(texts: pd.Series) -> pd.Series:
+    # Classify already-normalized texts over unique values only; each category regex runs
+    # once over the texts no earlier category has claimed, then labels are broadcast back
+    codes, uniques = pd.factorize(texts.fillna(""))
+    uniques = np.asarray(uniques, dtype=object)
+    labels = np.full(len(uniques), 'other', dtype=object)
+    labels[uniques == ""] = 'unknown'
+    special = np.fromiter((_CASEFOLD_SPECIAL.search(t) is not None for t in uniques), bool, len(uniques))
+    pending = labels == 'other'
+    for label, rx_fast, rx_fold in ACTIVITY_CLASSIFIERS:
+        for mask, rx in ((pending & ~special, rx_fast), (pending & special, rx_fold)):
+            if not mask.any():
+                continue
+            idx = np.flatnonzero(mask)
+            hit = np.fromiter((rx.search(t) is not None for t in uniques[idx]), bool, len(idx))
+            labels[idx[hit]] = label
+            pending[idx[hit]] = False
+    return pd.Series(labels[codes], index=texts.index, dtype=object)
+
+
+def aggregate_events(df: pd.DataFrame, event_columns=None) -> pd.DataFrame:
+    # One groupby over (country, year, activity_type): every count column is a slice of
+    # the unstacked table and participation_event is its row total
+    if event_columns is None:
+        event_columns = EVENT_COLUMNS
+    counts = (
+        df.groupby(['country', 'year', 'activity_type'], dropna=False)
+        .size()
+        .unstack('activity_type', fill_value=0)
+    )
+    out = pd.DataFrame({'participation_event': counts.sum(axis=1)}, index=counts.index)
+    for category, col in event_columns.items():
+        out[col] = counts[category] if category in counts.columns else 0
+    out = out.reset_index()
+    # Remove rows without valid year
+    out = out[pd.notna(out['year'])]
+    out['year'] = out['year'].astype(int)
+    return out[['country', 'year', 'participation_event'] + list(event_columns.values())]
+
+
+def clean_participation(df_raw: pd.DataFrame, event_columns=None) -> pd.DataFrame:
+    if event_columns is None:
+        event_columns = EVENT_COLUMNS
+    if df_raw.empty:
+        return pd.DataFrame(columns=['country','year','participation_event'] + list(event_columns.values()))
+    df = df_raw.copy(deep=False)
     # Identify activity column
     candidate_cols = ['Actividad', 'Activity', 'Descripcion', 'Descripción', 'Description', 'Texto', 'Text']
     act_col = None
@@ -77,18 +158,10 @@ def clean_participation(df_raw: pd.DataFrame) -> pd.DataFrame:
     df = coerce_year_column(df)
     # Normalize activity text
     if act_col is not None:
-        df['activity_raw'] = df[act_col].apply(normalize_activity_text)
+        df['activity_raw'] = normalize_activity_series(df[act_col])
     else:
         df['activity_raw'] = ''
     # Classify
-    df['activity_type'] = df['activity_raw'].apply(classify_activity)
+    df['activity_type'] = classify_activities(df['activity_raw'])
     # Aggregations by country-year
-    grp = df.groupby(['country','year'], dropna=False)
-    participation_event = grp.size().rename('participation_event')
-    leadership_event = grp.apply(lambda g: (g['activity_type']=='leadership').sum()).rename('leadership_event')
-    decision_event = grp.apply(lambda g: (g['activity_type']=='decision_body').sum()).rename('decision_event')
-    out = pd.concat([participation_event, leadership_event, decision_event], axis=1).reset_index()
-    # Remove rows without valid year
-    out = out[pd.notna(out['year'])]
-    out['year'] = out['year'].astype(int)
-    return out[['country','year','participation_event','leadership_event','decision_event']]
+    return aggregate_events(df, event_columns)
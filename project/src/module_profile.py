@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import resource
+    _HAS_RESOURCE = True
+except Exception:  # not available on Windows; peak RSS is then not reported
+    _HAS_RESOURCE = False
+
+RUN_REPORT_NAME = 'run_report.json'
+RUN_HISTORY_NAME = 'run_history.jsonl'
+RUN_REPORT_VERSION = 1
+# Runs kept in run_history.jsonl: history_baseline only needs the recent timings, so the file
+# is trimmed to the last runs instead of growing with every run
+MAX_HISTORY_RUNS = int(os.getenv('IECGGS_MAX_HISTORY_RUNS', '50'))
+# A span is reported as a regression when it is this many times slower than in the previous
+# run and slower by at least REGRESSION_MIN_SECONDS (tiny spans are mostly noise)
+REGRESSION_RATIO = 1.5
+REGRESSION_MIN_SECONDS = 0.05
+PROMETHEUS_PREFIX = 'iecggs'
+
+# Finished spans of the current run, in completion order; the oldest are dropped beyond
+# MAX_SPANS so long-lived processes that never call start_profile() stay bounded
+MAX_SPANS = 10_000
+SPANS: list[dict] = []
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+
+
+def _rss_bytes():
+    # Current resident set size (Linux /proc); falls back to the process high-water mark
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return _max_rss_bytes()
+
+
+def _max_rss_bytes():
+    if not _HAS_RESOURCE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # bytes on macOS, KiB on Linux
+
+
+def frame_shape(obj):
+    # (rows, columns) of a DataFrame, or summed over the frames of a tuple/list/dict result
+    if isinstance(obj, pd.DataFrame):
+        return len(obj), obj.shape[1]
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (tuple, list)):
+        shapes = [frame_shape(o) for o in obj]
+        shapes = [s for s in shapes if s != (None, None)]
+        if shapes:
+            return sum(s[0] for s in shapes), sum(s[1] for s in shapes)
+    return None, None
+
+
+def _stack() -> list:
+    if not hasattr(_LOCAL, 'stack'):
+        _LOCAL.stack = []
+    return _LOCAL.stack
+
+
+class Span:
+    # One timed section. rows/cols in and out are filled through inputs()/outputs().
+    # The tracemalloc peak is only measured while tracing is on (start_profile(trace_memory=True)).
+    def __init__(self, name: str, tags: dict):
+        self.name = name
+        self.tags = tags
+        self.rows_in = self.cols_in = self.rows_out = self.cols_out = None
+        self._py_peak = 0
+
+    def inputs(self, obj) -> None:
+        self.rows_in, self.cols_in = frame_shape(obj)
+
+    def outputs(self, obj) -> None:
+        self.rows_out, self.cols_out = frame_shape(obj)
+
+    def set(self, **values) -> None:
+        self.tags.update(values)
+
+    def _bump_peak(self, peak: int) -> None:
+        self._py_peak = max(self._py_peak, peak)
+
+
+@contextmanager
+def span(name: str, **tags):
+    # Records wall and CPU time, RSS before/after, the process RSS high-water mark and the
+    # Python allocation peak (tracemalloc) of the enclosed block into SPANS
+    stack = _stack()
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        # the peak is process-wide: hand it to the open spans before resetting it for this one
+        for parent in stack:
+            parent._bump_peak(peak)
+        tracemalloc.reset_peak()
+        py_start = current
+    s = Span(name, tags)
+    parent_name = stack[-1].name if stack else None
+    stack.append(s)
+    rss_start = _rss_bytes()
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    error = None
+    try:
+        yield s
+    except BaseException as e:
+        error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        seconds = time.perf_counter() - t0
+        cpu = time.process_time() - cpu0
+        stack.pop()
+        record = {
+            'span': name,
+            'parent': parent_name,
+            'seconds': round(seconds, 4),
+            'cpu_seconds': round(cpu, 4),
+            'rss_start_bytes': rss_start,
+            'rss_end_bytes': _rss_bytes(),
+            'rss_peak_bytes': _max_rss_bytes(),
+            'py_alloc_bytes': None,
+            'py_peak_bytes': None,
+            'rows_in': s.rows_in,
+            'cols_in': s.cols_in,
+            'rows_out': s.rows_out,
+            'cols_out': s.cols_out,
+            'pid': os.getpid(),
+            'error': error,
+            **s.tags,
+        }
+        if tracing and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            s._bump_peak(peak)
+            for parent in stack:
+                parent._bump_peak(s._py_peak)
+            record['py_alloc_bytes'] = current - py_start
+            record['py_peak_bytes'] = s._py_peak - py_start
+        with _LOCK:
+            SPANS.append(record)
+            del SPANS[:-MAX_SPANS]
+
+
+def profiled(name: str):
+    # Decorator: runs the function inside span(name); DataFrame arguments count as inputs
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name) as s:
+                s.inputs([a for a in args if isinstance(a, pd.DataFrame)])
+                result = func(*args, **kwargs)
+                s.outputs(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def start_profile(trace_memory=None) -> None:
+    # Clears recorded spans; tracemalloc (slower) is on with trace_memory or IECGGS_PROFILE_MEMORY=1
+    if trace_memory is None:
+        trace_memory = os.getenv('IECGGS_PROFILE_MEMORY', '0') == '1'
+    with _LOCK:
+        SPANS.clear()
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def stop_profile() -> None:
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def take_spans() -> list[dict]:
+    # Removes and returns the recorded spans (used to ship spans back from worker processes)
+    with _LOCK:
+        out = list(SPANS)
+        SPANS.clear()
+    return out
+
+
+def add_spans(records) -> None:
+    with _LOCK:
+        SPANS.extend(records)
+        del SPANS[:-MAX_SPANS]
+
+
+def span_totals(report: dict) -> dict:
+    # span name -> total seconds (a name may occur more than once per run)
+    totals = {}
+    for rec in report.get('spans', []):
+        if rec.get('error') is None:
+            totals[rec['span']] = totals.get(rec['span'], 0.0) + rec['seconds']
+    return {name: round(seconds, 4) for name, seconds in totals.items()}
+
+
+def compare_reports(baseline: dict, current: dict, ratio: float = REGRESSION_RATIO,
+                    min_seconds: float = REGRESSION_MIN_SECONDS) -> list[dict]:
+    # Spans of `current` that got slower than in `baseline` ({span: seconds}, e.g. from
+    # history_baseline) by more than `ratio` and `min_seconds`
+    out = []
+    for name, seconds in span_totals(current).items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        if seconds - old >= min_seconds and seconds > old * ratio:
+            out.append({'span': name, 'previous_seconds': round(old, 4), 'seconds': round(seconds, 4),
+                        'ratio': round(seconds / old, 2) if old > 0 else None})
+    return sorted(out, key=lambda r: r['seconds'] - r['previous_seconds'], reverse=True)
+
+
+def load_run_history(outdir: str | Path, limit: int | None = MAX_HISTORY_RUNS) -> list[dict]:
+    # The last `limit` runs recorded by write_run_report (all of them with limit=None)
+    path = Path(outdir) / RUN_HISTORY_NAME
+    rows = deque(maxlen=limit)
+    try:
+        with path.open(encoding='utf-8') as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return list(rows)
+
+
+def history_baseline(history) -> dict:
+    # Latest recorded seconds of every span; stages skipped in recent runs keep older timings
+    baseline = {}
+    for row in history:
+        baseline.update(row.get('spans', {}))
+    return baseline
+
+
+def load_run_report(path: str | Path):
+    try:
+        return json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(text, encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def build_run_report(stages=None, extra=None) -> dict:
+    env = {k: v for k, v in sorted(os.environ.items()) if k.startswith('IECGGS_')}
+    return {
+        'version': RUN_REPORT_VERSION,
+        'created': time.time(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'pid': os.getpid(),
+        'env': env,
+        'rss_peak_bytes': _max_rss_bytes(),
+        'stages': list(stages or []),
+        'spans': list(SPANS),
+        **(extra or {}),
+    }
+
+
+def write_run_report(outdir: str | Path, stages=None, extra=None) -> dict:
+    # Writes outdir/run_report.json and appends per-span totals to outdir/run_history.jsonl,
+    # keeping the last MAX_HISTORY_RUNS runs. Regressions are measured against the latest
+    # timing of each span in the history.
+    outdir = Path(outdir)
+    report = build_run_report(stages, extra)
+    history = load_run_history(outdir)
+    report['regressions'] = compare_reports(history_baseline(history), report)
+    _atomic_write(outdir / RUN_REPORT_NAME, json.dumps(report, indent=2, default=str))
+    summary = {
+        'created': report['created'],
+        'seconds': report.get('seconds'),
+        'rss_peak_bytes': report['rss_peak_bytes'],
+        'stages': {row['stage']: row['status'] for row in report['stages']},
+        'spans': span_totals(report),
+    }
+    history = (history + [summary])[-max(MAX_HISTORY_RUNS, 1):]
+    _atomic_write(outdir / RUN_HISTORY_NAME, ''.join(json.dumps(row) + '\n' for row in history))
+    return report
+
+
+def _label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+PROMETHEUS_METRICS = [
+    ('span_seconds', 'seconds', 'Wall time of a pipeline span'),
+    ('span_cpu_seconds', 'cpu_seconds', 'CPU time of a pipeline span'),
+    ('span_rss_end_bytes', 'rss_end_bytes', 'Resident set size at the end of a span'),
+    ('span_rss_peak_bytes', 'rss_peak_bytes', 'Process RSS high-water mark at the end of a span'),
+    ('span_py_peak_bytes', 'py_peak_bytes', 'Peak traced Python allocations within a span'),
+    ('span_rows_in', 'rows_in', 'Rows entering a span'),
+    ('span_rows_out', 'rows_out', 'Rows leaving a span'),
+    ('span_cols_out', 'cols_out', 'Columns leaving a span'),
+]
+
+
+def prometheus_text(report: dict) -> str:
+    # Prometheus text exposition format (e.g. for the node_exporter textfile collector)
+    lines = []
+    for metric, key, help_text in PROMETHEUS_METRICS:
+        samples = {}
+        for rec in report.get('spans', []):
+            if rec.get(key) is None:
+                continue
+            labels = f'span="{_label(rec["span"])}"'
+            # repeated spans: times add up, sizes keep the last value
+            samples[labels] = samples.get(labels, 0) + rec[key] if key.endswith('seconds') else rec[key]
+        if not samples:
+            continue
+        lines.append(f'# HELP {PROMETHEUS_PREFIX}_{metric} {help_text}')
+        lines.append(f'# TYPE {PROMETHEUS_PREFIX}_{metric} gauge')
+        lines.extend(f'{PROMETHEUS_PREFIX}_{metric}{{{labels}}} {value}' for labels, value in samples.items())
+    lines.append(f'# HELP {PROMETHEUS_PREFIX}_stage_ran Whether a pipeline stage was recomputed (0 = skipped)')
+    lines.append(f'# TYPE {PROMETHEUS_PREFIX}_stage_ran gauge')
+    for row in report.get('stages', []):
+        lines.append(f'{PROMETHEUS_PREFIX}_stage_ran{{stage="{_label(row["stage"])}"}} {int(row["status"] == "ran")}')
+    lines.append(f'# HELP {PROMETHEUS_PREFIX}_run_regressions Spans slower than in the previous run')
+    lines.append(f'# TYPE {PROMETHEUS_PREFIX}_run_regressions gauge')
+    lines.append(f'{PROMETHEUS_PREFIX}_run_regressions {len(report.get("regressions", []))}')
+    lines.append(f'# HELP {PROMETHEUS_PREFIX}_run_timestamp_seconds Time the run report was written')
+    lines.append(f'# TYPE {PROMETHEUS_PREFIX}_run_timestamp_seconds gauge')
+    lines.append(f'{PROMETHEUS_PREFIX}_run_timestamp_seconds {report["created"]:.3f}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path: str | Path, report: dict) -> None:
+    _atomic_write(Path(path), prometheus_text(report))
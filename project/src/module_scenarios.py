@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from module_index import (
+    DOM_COMPONENTS,
+    PART_COMPONENTS,
+    REG_COMPONENTS,
+    THRESHOLD_ENV,
+    eligibility_thresholds,
+    normalize_components,
+)
+from module_profile import span
+from module_schema import COUNT_DTYPE, SCORE_DTYPE, scores
+
+
+# Threshold and lambda scenarios evaluated on one panel: components are normalized and the
+# n_*_obs counters computed once, then every scenario is a threshold comparison on them
+# (rows x scenarios arrays), mirroring compute_subindices, compute_index and apply_penalty.
+
+DEFAULT_LAMBDAS = (0.1, 0.25, 0.5)
+# Scenario parameter -> column of the scenario table and of the consolidated output
+PARAM_COLUMNS = {
+    'reg': 'min_reg_obs',
+    'dom': 'min_dom_obs',
+    'part': 'min_part_obs',
+    'index': 'min_index_pillars',
+    'lambda': 'lambda',
+}
+PILLARS = ('reg', 'dom', 'part')
+# Scenarios evaluated per task (bounds the rows x scenarios arrays of one task)
+DEFAULT_CHUNK_SIZE = 64
+
+
+def scenario_table(configs) -> pd.DataFrame:
+    # One row per scenario from a config ({'reg': 2, 'dom': [2, 3], 'lambda': [0.1, 0.5]}) or
+    # a list of configs: list values are crossed into a grid, omitted thresholds take their
+    # configured value (IECGGS_MIN_*) and an omitted lambda every default lambda.
+    # Duplicate scenarios are kept once, in first-seen order.
+    if isinstance(configs, dict):
+        configs = [configs]
+    rows = []
+    for config in configs:
+        unknown = sorted(set(config) - set(PARAM_COLUMNS))
+        if unknown:
+            raise ValueError(f'Unknown scenario parameters {unknown}; expected {list(PARAM_COLUMNS)}')
+        defaults = eligibility_thresholds()
+        values = {}
+        for key in PARAM_COLUMNS:
+            value = config.get(key, DEFAULT_LAMBDAS if key == 'lambda' else defaults[key])
+            values[key] = list(value) if isinstance(value, (list, tuple, np.ndarray)) else [value]
+        rows.extend(itertools.product(*values.values()))
+    table = pd.DataFrame(rows, columns=list(PARAM_COLUMNS.values())).drop_duplicates(ignore_index=True)
+    table = table.astype({PARAM_COLUMNS[k]: COUNT_DTYPE for k in THRESHOLD_ENV})
+    table['lambda'] = table['lambda'].astype(float)
+    table.insert(0, 'scenario', np.arange(len(table), dtype=np.int32))
+    return table
+
+
+def scenario_inputs(panel: pd.DataFrame, bounds: dict | None = None) -> tuple[pd.DataFrame, dict]:
+    # Scenario-invariant arrays: per-pillar counters and means (before eligibility) and the
+    # Art.7 penalty factor; `bounds` as in compute_subindices
+    df = normalize_components(panel, bounds)
+    static = {}
+    for pillar, components in zip(PILLARS, (REG_COMPONENTS, DOM_COMPONENTS, PART_COMPONENTS)):
+        static[f'n_{pillar}'] = df[components].notna().sum(axis=1).to_numpy(dtype=COUNT_DTYPE)
+        static[f'mean_{pillar}'] = df[components].mean(axis=1).to_numpy(dtype=SCORE_DTYPE)
+    static['excl'] = df['art7_excluded'].fillna(0).to_numpy(dtype=SCORE_DTYPE)
+    return panel[['iso3', 'country', 'year']].reset_index(drop=True), static
+
+
+def evaluate_chunk(static: dict, params: dict) -> dict:
+    # rows x scenarios results for the scenario parameters `params` ({key: array})
+    out = {}
+    n_ok = np.zeros((len(static['excl']), len(params['lambda'])), dtype=COUNT_DTYPE)
+    total = np.zeros(n_ok.shape, dtype=SCORE_DTYPE)
+    count = np.zeros(n_ok.shape, dtype=SCORE_DTYPE)
+    for pillar in PILLARS:
+        ok = static[f'n_{pillar}'][:, None] >= np.asarray(params[pillar])[None, :]
+        value = np.where(ok, static[f'mean_{pillar}'][:, None], np.nan).astype(SCORE_DTYPE)
+        present = ~np.isnan(value)
+        out[f'flag_pillar_{pillar}_ok'] = ok
+        out[f'E_{pillar}'] = value
+        n_ok += ok
+        total += np.where(present, value, 0)
+        count += present
+    ok = n_ok >= np.asarray(params['index'])[None, :]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        raw = scores(np.where(ok, total / count, np.nan))
+    out['n_pillars_ok'] = n_ok
+    out['flag_iecgss_ok'] = ok
+    out['IECGGS_raw'] = raw
+    lams = np.asarray(params['lambda'], dtype=SCORE_DTYPE)[None, :]
+    out['IECGGS_adj'] = raw * (1 - lams * static['excl'][:, None])
+    return out
+
+
+def evaluate_scenarios(panel: pd.DataFrame, scenarios, bounds: dict | None = None, n_jobs=None,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    # One consolidated frame indexed by scenario: every (scenario, iso3, year) with the
+    # scenario's parameters, pillar subindices and flags, IECGGS_raw and IECGGS_adj (penalized
+    # with the scenario's lambda). `scenarios`: configs or a scenario_table. Chunks of
+    # `chunk_size` scenarios run in a process pool when n_jobs (or IECGGS_SCENARIO_JOBS) > 1.
+    table = scenarios if isinstance(scenarios, pd.DataFrame) else scenario_table(scenarios)
+    with span('scenarios.evaluate') as s:
+        s.inputs(panel)
+        keys, static = scenario_inputs(panel, bounds)
+        params = {k: table[col].to_numpy() for k, col in PARAM_COLUMNS.items()}
+        starts = range(0, len(table), max(1, chunk_size))
+        chunks = [{k: v[a:a + chunk_size] for k, v in params.items()} for a in starts]
+        if n_jobs is None:
+            n_jobs = int(os.getenv('IECGGS_SCENARIO_JOBS', '1'))
+        if n_jobs > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks))) as pool:
+                results = list(pool.map(evaluate_chunk, itertools.repeat(static), chunks))
+        else:
+            results = [evaluate_chunk(static, chunk) for chunk in chunks]
+        out = _consolidate(keys, table, results)
+        s.outputs(out)
+        s.set(scenarios=len(table), n_jobs=n_jobs)
+    return out
+
+
+def _consolidate(keys: pd.DataFrame, table: pd.DataFrame, results: list) -> pd.DataFrame:
+    # rows x scenarios chunks -> long frame, scenario-major (all rows of scenario 0 first)
+    n_rows, n_scen = len(keys), len(table)
+    if results:
+        merged = {name: np.concatenate([r[name] for r in results], axis=1) for name in results[0]}
+    else:
+        merged = {}
+    out = {'scenario': np.repeat(table['scenario'].to_numpy(), n_rows)}
+    for col in keys.columns:
+        values = keys[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            out[col] = pd.Categorical.from_codes(np.tile(values.cat.codes.to_numpy(), n_scen), dtype=values.dtype)
+        else:
+            out[col] = np.tile(values.to_numpy(), n_scen)
+    for col in PARAM_COLUMNS.values():
+        out[col] = np.repeat(table[col].to_numpy(), n_rows)
+    columns = ['E_reg', 'E_dom', 'E_part', 'flag_pillar_reg_ok', 'flag_pillar_dom_ok', 'flag_pillar_part_ok',
+               'n_pillars_ok', 'flag_iecgss_ok', 'IECGGS_raw', 'IECGGS_adj']
+    for col in columns:
+        # Transposed so each scenario's rows are contiguous
+        out[col] = merged[col].T.reshape(-1) if merged else np.array([], dtype=SCORE_DTYPE)
+    return pd.DataFrame(out)
+
+
+def scenario_summary(results: pd.DataFrame) -> pd.DataFrame:
+    # Per scenario: parameters, eligible country-years and mean raw/penalized index
+    by = ['scenario'] + list(PARAM_COLUMNS.values())
+    return results.groupby(by, sort=True, observed=True).agg(
+        n_eligible=('flag_iecgss_ok', 'sum'),
+        mean_IECGGS_raw=('IECGGS_raw', 'mean'),
+        mean_IECGGS_adj=('IECGGS_adj', 'mean'),
+    ).reset_index()
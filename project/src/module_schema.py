@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+# Compact dtypes the panel carries from build_panel through the index stages
+KEY_CATEGORIES = ('iso3', 'country')
+YEAR_DTYPE = 'int16'
+SCORE_DTYPE = np.float32  # normalized components, subindices and index scores
+COUNT_DTYPE = np.int8  # eligibility counters (n_*_obs, n_pillars_ok)
+# 0/0.5/1 policy codes: float32 holds the half step exactly while keeping the published scale
+POLICY_COLUMNS = ('Policy_UHC', 'Plan_UHC', 'Strategy_UHC')
+# 0/1 indicators that are missing outside their source rows
+INDICATOR_COLUMNS = ('SPAR_reported', 'art7_excluded')
+INDICATOR_DTYPE = 'Int8'
+EVENT_COLUMNS = ('participation_event', 'leadership_event', 'decision_event')
+EVENT_DTYPE = 'Int32'
+
+
+def scores(values) -> np.ndarray:
+    return np.asarray(values, dtype=SCORE_DTYPE)
+
+
+def typed_panel(panel: pd.DataFrame) -> pd.DataFrame:
+    # Panel with the compact schema above; columns are converted on a shallow copy, so the
+    # caller's frame is left as it was and untouched columns are not duplicated
+    out = panel.copy(deep=False)
+    for col in KEY_CATEGORIES:
+        if col in out.columns and not isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype('category')
+    if 'year' in out.columns and out['year'].notna().all():
+        out['year'] = out['year'].astype(YEAR_DTYPE)
+    for col in POLICY_COLUMNS:
+        if col in out.columns:
+            out[col] = out[col].astype(SCORE_DTYPE)
+    for col in INDICATOR_COLUMNS:
+        if col in out.columns:
+            out[col] = pd.to_numeric(out[col], errors='coerce').round().astype(INDICATOR_DTYPE)
+    for col in EVENT_COLUMNS:
+        if col in out.columns:
+            out[col] = pd.to_numeric(out[col], errors='coerce').round().astype(EVENT_DTYPE)
+    return out
+
+
+def same_keys(left: pd.DataFrame, right: pd.DataFrame, keys=('iso3', 'year')) -> bool:
+    # True when both frames hold the same keys in the same row order (positional alignment is safe)
+    if len(left) != len(right):
+        return False
+    return all(left[k].reset_index(drop=True).equals(right[k].reset_index(drop=True)) for k in keys)
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+PILLARS = ['E_reg', 'E_dom', 'E_part']
+
+DEFAULT_WEIGHT_SCHEMES = {
+    'equal': (1 / 3, 1 / 3, 1 / 3),
+    'reg_heavy': (0.5, 0.25, 0.25),
+    'dom_heavy': (0.25, 0.5, 0.25),
+    'part_heavy': (0.25, 0.25, 0.5),
+}
+
+DEFAULT_QUANTILES = (0.05, 0.5, 0.95)
+
+# Upper bound on rows x scenarios float64 cells materialized at once (~64 MB)
+DEFAULT_MAX_CELLS = 8_000_000
+
+
+def dirichlet_weight_schemes(n: int, alpha=(1.0, 1.0, 1.0), seed=None) -> dict:
+    rng = np.random.default_rng(seed)
+    draws = rng.dirichlet(np.asarray(alpha, dtype=float), size=n)
+    width = len(str(n - 1))
+    return {f'dirichlet_{i:0{width}d}': tuple(w) for i, w in enumerate(draws)}
+
+
+def _rank_desc_min(block: np.ndarray) -> np.ndarray:
+    # block: scenarios x rows of one group. Ranks each scenario row descending with ties
+    # sharing the lowest rank (pandas method='min'); NaN scores get rank 0 (unranked).
+    key = -block
+    idx = np.argsort(key, axis=1)
+    srt = np.take_along_axis(key, idx, 1)
+    new = np.ones(srt.shape, dtype=bool)
+    new[:, 1:] = srt[:, 1:] != srt[:, :-1]
+    first = np.maximum.accumulate(np.where(new, np.arange(key.shape[1]), 0), axis=1)
+    ranked = np.where(np.isnan(srt), 0, first + 1)
+    out = np.empty_like(ranked)
+    np.put_along_axis(out, idx, ranked, 1)
+    return out
+
+
+class RankAccumulator:
+    # Streams within-group ranks (1 = highest score) of many scenario columns into per-row
+    # running moments plus a rank histogram, so rank quantiles are exact while memory stays
+    # at rows x max group size regardless of the number of scenarios.
+    def __init__(self, groups: np.ndarray):
+        groups = np.asarray(groups)
+        self.n_rows = len(groups)
+        self.order = np.argsort(groups, kind='stable')
+        sorted_groups = groups[self.order]
+        starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]) if self.n_rows else np.array([], int)
+        self.segments = list(zip(starts, np.r_[starts[1:], self.n_rows]))
+        self.max_rank = int(max((b - a for a, b in self.segments), default=0))
+        self.count = np.zeros(self.n_rows, dtype=np.int64)
+        self.total = np.zeros(self.n_rows)
+        self.total_sq = np.zeros(self.n_rows)
+        self.min = np.full(self.n_rows, np.inf)
+        self.max = np.full(self.n_rows, -np.inf)
+        # column 0 collects unranked (NaN) cells and is ignored
+        self.hist = np.zeros((self.n_rows, self.max_rank + 1), dtype=np.int64)
+
+    def ranks(self, scores: np.ndarray) -> np.ndarray:
+        # rows x scenarios scores -> rows x scenarios integer ranks (0 = unranked)
+        scores_t = np.ascontiguousarray(scores[self.order].T)
+        ranks_t = np.empty(scores_t.shape, dtype=np.int64)
+        for a, b in self.segments:
+            ranks_t[:, a:b] = _rank_desc_min(scores_t[:, a:b])
+        out = np.empty(scores.shape, dtype=np.int64)
+        out[self.order] = ranks_t.T
+        return out
+
+    def update(self, scores: np.ndarray) -> None:
+        if scores.size == 0:
+            return
+        self.add(self.ranks(scores))
+
+    def add(self, ranks: np.ndarray) -> None:
+        # rows x scenarios integer ranks as returned by ranks()
+        if ranks.size == 0:
+            return
+        valid = ranks > 0
+        r = ranks.astype(float)
+        self.count += valid.sum(axis=1)
+        self.total += r.sum(axis=1)
+        self.total_sq += (r * r).sum(axis=1)
+        self.min = np.minimum(self.min, np.where(valid, r, np.inf).min(axis=1))
+        self.max = np.maximum(self.max, r.max(axis=1, initial=-np.inf, where=valid))
+        flat = ranks + (np.arange(self.n_rows) * (self.max_rank + 1))[:, None]
+        self.hist += np.bincount(flat.ravel(), minlength=self.hist.size).reshape(self.hist.shape)
+
+    def merge(self, other: RankAccumulator) -> None:
+        # Folds in an accumulator built on the same groups (e.g. by another worker)
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.hist += other.hist
+
+    def quantile(self, q: float) -> np.ndarray:
+        target = np.maximum(np.ceil(q * self.count), 1)
+        cum = self.hist[:, 1:].cumsum(axis=1)
+        out = 1 + (cum < target[:, None]).sum(axis=1).astype(float)
+        return np.where(self.count > 0, out, np.nan)
+
+    def summary(self, quantiles=DEFAULT_QUANTILES) -> pd.DataFrame:
+        n = self.count.astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.total / n
+            var = (self.total_sq - n * mean ** 2) / (n - 1)
+        out = {
+            'n_ranked': self.count,
+            'rank_mean': mean,
+            'rank_std': np.sqrt(np.clip(var, 0, None)),
+            'rank_min': np.where(self.count > 0, self.min, np.nan),
+            'rank_max': np.where(self.count > 0, self.max, np.nan),
+        }
+        for q in quantiles:
+            out[f'rank_q{q:g}'] = self.quantile(q)
+        return pd.DataFrame(out)
+
+
+def _scenario_chunks(n_schemes: int, n_lambdas: int, n_rows: int, max_cells: int):
+    per_chunk = max(1, max_cells // max(1, n_rows * n_lambdas))
+    for start in range(0, n_schemes, per_chunk):
+        yield slice(start, min(n_schemes, start + per_chunk))
+
+
+def iter_sensitivity(index_df: pd.DataFrame, lambdas=(0.1, 0.25, 0.5), weight_schemes=None,
+                     quantiles=DEFAULT_QUANTILES, max_cells: int = DEFAULT_MAX_CELLS, ranks=None):
+    # Yields one summary frame per chunk of weight schemes. Each chunk is a single
+    # (rows x 3) @ (3 x schemes) product broadcast over the lambda vector. A row with any
+    # missing pillar is NaN under every weighting, so only complete rows enter the product;
+    # when a RankAccumulator (built on those rows' years) is given, within-year ranks of
+    # every scenario are streamed into it.
+    if weight_schemes is None:
+        weight_schemes = DEFAULT_WEIGHT_SCHEMES
+    names = list(weight_schemes)
+    weights = np.asarray([weight_schemes[n] for n in names], dtype=float).T  # 3 x S
+    lams = np.asarray(lambdas, dtype=float)
+    pillars = index_df[PILLARS].to_numpy(dtype=float)
+    complete = ~np.isnan(pillars).any(axis=1)
+    pillars = pillars[complete]
+    excl = index_df['art7_excluded'].fillna(0).to_numpy(dtype=float)[complete]
+    penalty = 1 - excl[:, None] * lams[None, :]  # rows x L
+    n_obs = len(pillars)
+
+    for chunk in _scenario_chunks(len(names), len(lams), n_obs, max_cells):
+        n_schemes = chunk.stop - chunk.start
+        weighted = pillars @ weights[:, chunk]  # rows x s
+        flat = (weighted[:, None, :] * penalty[:, :, None]).reshape(n_obs, len(lams) * n_schemes)  # rows x (L*s)
+        if ranks is not None:
+            ranks.update(flat)
+        out = {
+            'lambda': np.repeat(lams, n_schemes),
+            'scheme': np.tile(np.asarray(names[chunk], dtype=object), len(lams)),
+            'n_obs': np.full(flat.shape[1], n_obs),
+            'mean_IECGGS_adj': flat.mean(axis=0) if n_obs else np.full(flat.shape[1], np.nan),
+            'std_IECGGS_adj': flat.std(axis=0, ddof=1) if n_obs > 1 else np.full(flat.shape[1], np.nan),
+        }
+        if len(quantiles):
+            qs = np.quantile(flat, quantiles, axis=0) if n_obs else np.full((len(quantiles), flat.shape[1]), np.nan)
+            for q, row in zip(quantiles, qs):
+                out[f'q{q:g}_IECGGS_adj'] = row
+        yield pd.DataFrame(out)
+
+
+def sensitivity_grid(index_df: pd.DataFrame, lambdas=(0.1, 0.25, 0.5), weight_schemes=None,
+                     quantiles=DEFAULT_QUANTILES, rank_stats: bool = True,
+                     max_cells: int = DEFAULT_MAX_CELLS, out_path=None):
+    # Full lambda x weight-scheme sweep. Returns (summary per scenario, rank statistics per
+    # country-year or None). With out_path the per-scenario summary is appended to that CSV
+    # chunk by chunk (in chunk, lambda, scheme order) instead of being kept in memory, and
+    # the returned summary is None.
+    complete = index_df[PILLARS].notna().all(axis=1).to_numpy()
+    ranks = RankAccumulator(index_df['year'].to_numpy()[complete]) if rank_stats else None
+    parts = []
+    first = True
+    for part in iter_sensitivity(index_df, lambdas, weight_schemes, quantiles, max_cells, ranks):
+        if out_path is not None:
+            part.to_csv(out_path, mode='w' if first else 'a', header=first, index=False)
+            first = False
+        else:
+            parts.append(part)
+
+    summary = None
+    if out_path is None:
+        # chunks are lambda-major inside; restore the (lambda, scheme) order of the inputs
+        summary = pd.concat(parts, ignore_index=True)
+        lam_pos = {lam: i for i, lam in reversed(list(enumerate(np.asarray(lambdas, dtype=float))))}
+        summary = summary.iloc[np.argsort(summary['lambda'].map(lam_pos).to_numpy(), kind='stable')]
+        summary = summary.reset_index(drop=True)
+
+    rank_df = None
+    if ranks is not None:
+        keys = [c for c in ('iso3', 'country', 'year') if c in index_df.columns]
+        rank_df = pd.concat([index_df.loc[complete, keys].reset_index(drop=True), ranks.summary(quantiles)], axis=1)
+    return summary, rank_df
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+from module_incremental import BOUNDS_NAME, load_bounds
+from module_index import COMPONENT_INPUTS, apply_penalty, compute_index, compute_subindices, normalization_bounds
+from module_output import read_artifact
+from module_schema import POLICY_COLUMNS, typed_panel
+from module_snapshot import serving_dir
+from utils import DISCRETE_CODES, map_discrete_policy_values
+
+
+# What-if scoring over HTTP/JSON: the panel and its normalization bounds (CHE_GDP
+# winsorization quantiles, Right_to_health scale, participation min/max) are loaded once,
+# then batches of country-year rows are scored with the pipeline's own compute_subindices,
+# compute_index and apply_penalty. A row naming a published (iso3, year) starts from that
+# panel row and overrides only the fields it gives; null clears a field.
+#
+#   GET  /health   panel rows, source directory and load time
+#   GET  /bounds   frozen normalization bounds and default lambdas
+#   POST /score    {"rows": [{...}, ...], "lambdas": [0.1, ...]} -> {"rows": [...], "n", "seconds"}
+#   POST /reload   reload panel and bounds (e.g. after a new snapshot was published)
+
+DEFAULT_HOST = os.getenv('IECGGS_SERVICE_HOST', '127.0.0.1')
+DEFAULT_PORT = int(os.getenv('IECGGS_SERVICE_PORT', '8502'))
+LAMBDAS = (0.1, 0.25, 0.5)
+MAX_BATCH_ROWS = 10_000
+MAX_BODY_BYTES = 16 * 1024 * 1024
+KEY_FIELDS = ['iso3', 'country', 'year']
+SCORE_INPUTS = COMPONENT_INPUTS + ['art7_excluded']
+RESULT_COLUMNS = [
+    'iso3', 'country', 'year', 'base_found',
+    'E_reg', 'E_dom', 'E_part', 'n_reg_obs', 'n_dom_obs', 'n_part_obs',
+    'flag_pillar_reg_ok', 'flag_pillar_dom_ok', 'flag_pillar_part_ok', 'n_pillars_ok', 'flag_iecgss_ok',
+    'art7_excluded', 'IECGGS_raw',
+]
+# Scores are float32 in the pipeline; JSON carries them rounded to this many decimals
+JSON_DECIMALS = 6
+
+
+class ScoringError(ValueError):
+    pass
+
+
+def _json_bounds(bounds: dict) -> dict:
+    return {c: [None if math.isnan(v) else v for v in b] for c, b in bounds.items()}
+
+
+class Scorer:
+    # Panel inputs as one float64 matrix keyed by (iso3, year), plus the frozen bounds
+    def __init__(self, panel: pd.DataFrame, bounds: dict | None = None, lambdas=LAMBDAS, source=None):
+        self.bounds = bounds if bounds is not None else normalization_bounds(panel)
+        self.lambdas = tuple(float(x) for x in lambdas)
+        self.source = str(source) if source is not None else None
+        self.loaded = time.time()
+        self.rows = len(panel)
+        self._positions = {
+            (iso3, int(year)): i for i, (iso3, year) in enumerate(zip(panel['iso3'].astype(str), panel['year']))
+        }
+        self._countries = np.append(panel['country'].astype(object).to_numpy(), None)
+        values = np.full((len(panel) + 1, len(SCORE_INPUTS)), np.nan)
+        for j, col in enumerate(SCORE_INPUTS):
+            if col in panel.columns:
+                values[:-1, j] = pd.to_numeric(panel[col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        # The last row stands for keys absent from the panel
+        self._values = values
+
+    @classmethod
+    def from_outputs(cls, outdir=None, bounds_path=None, lambdas=LAMBDAS) -> 'Scorer':
+        # Panel of the served snapshot (module_snapshot.serving_dir) and the bounds its run used
+        outdir = Path(outdir) if outdir is not None else serving_dir()
+        panel = read_artifact(outdir, 'panel_clean')
+        path = Path(bounds_path) if bounds_path is not None else outdir / BOUNDS_NAME
+        bounds = load_bounds(path) if path.exists() else None
+        return cls(panel, bounds, lambdas=lambdas, source=outdir)
+
+    def frame(self, rows) -> pd.DataFrame:
+        # Panel-shaped frame of the requested rows: published values overridden by the request
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            raise ScoringError('"rows" must be a list of objects')
+        if len(rows) > MAX_BATCH_ROWS:
+            raise ScoringError(f'At most {MAX_BATCH_ROWS} rows per request (got {len(rows)})')
+        unknown = sorted({k for r in rows for k in r} - set(KEY_FIELDS) - set(SCORE_INPUTS))
+        if unknown:
+            raise ScoringError(f'Unknown fields {unknown}; expected {KEY_FIELDS + SCORE_INPUTS}')
+        req = pd.DataFrame.from_records(rows, columns=KEY_FIELDS + SCORE_INPUTS)
+        iso3 = req['iso3'].astype(object).where(req['iso3'].notna(), None)
+        iso3 = pd.Series([str(x).strip().upper() if x is not None else None for x in iso3], dtype=object)
+        year = self._numeric(req['year'], 'year')
+        if (year.notna() & (year != year.round())).any():
+            raise ScoringError('"year" must be an integer')
+        keys = zip(iso3, year.fillna(-1).astype('int64'))
+        pos = np.fromiter((self._positions.get(k, -1) for k in keys), dtype=np.int64, count=len(rows))
+        values = self._values[pos].copy()  # -1 picks the all-missing row
+        for j, col in enumerate(SCORE_INPUTS):
+            given = np.fromiter((col in r for r in rows), dtype=bool, count=len(rows))
+            if given.any():
+                values[given, j] = self._numeric(req.loc[given, col], col).to_numpy(dtype=float, na_value=np.nan)
+        country = req['country'].astype(object).where(req['country'].notna(), pd.Series(self._countries[pos], dtype=object))
+        frame = pd.DataFrame(values, columns=SCORE_INPUTS)
+        frame.insert(0, 'iso3', iso3.to_numpy())
+        frame.insert(1, 'country', country.where(country.notna(), iso3).to_numpy())
+        frame.insert(2, 'year', year.to_numpy())
+        frame['base_found'] = pos >= 0
+        return typed_panel(frame)
+
+    @staticmethod
+    def _numeric(values: pd.Series, col: str) -> pd.Series:
+        # Numbers on the panel's scale; policy columns take 0/0.5/1 or the labels build_panel
+        # maps ('yes', 'partial', 'no', ...)
+        values = values.astype(object)
+        out = pd.to_numeric(values.map(lambda v: float(v) if isinstance(v, bool) else v), errors='coerce')
+        if col in POLICY_COLUMNS:
+            labels = out.isna() & values.notna()
+            if labels.any():
+                out[labels] = map_discrete_policy_values(values[labels]).to_numpy()
+            out = out.where(out.isin(DISCRETE_CODES) | out.isna(), np.inf)
+        bad = (out.isna() & values.notna()) | np.isinf(out)
+        if bad.any():
+            raise ScoringError(f'Invalid value {values[bad].iloc[0]!r} for "{col}"')
+        return out.astype(float)
+
+    def score(self, rows, lambdas=None) -> pd.DataFrame:
+        # Subindices, eligibility, index and penalized variants of every row, in request order
+        lambdas = self.lambdas if lambdas is None else tuple(float(x) for x in lambdas)
+        panel = self.frame(rows)
+        if panel.empty:
+            return pd.DataFrame(columns=RESULT_COLUMNS + [f'IECGGS_adj_lambda_{lam}' for lam in lambdas])
+        sub = compute_subindices(panel, self.bounds)
+        pen = apply_penalty(compute_index(panel, sub), lambdas)
+        pen['base_found'] = panel['base_found'].to_numpy()
+        return pen[RESULT_COLUMNS + [f'IECGGS_adj_lambda_{lam}' for lam in lambdas]]
+
+    def info(self) -> dict:
+        return {'status': 'ok', 'rows': self.rows, 'source': self.source, 'loaded': self.loaded}
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    server_version = 'IECGGSScoring/1'
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status: int, body: str) -> None:
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str) -> None:
+        self._send(status, json.dumps({'error': message}))
+
+    def _body(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise ScoringError(f'Request body larger than {MAX_BODY_BYTES} bytes')
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError as e:
+            raise ScoringError(f'Invalid JSON: {e}') from None
+        if not isinstance(body, dict):
+            raise ScoringError('Request body must be a JSON object')
+        return body
+
+    def do_GET(self):
+        scorer = self.server.scorer
+        path = urlparse(self.path).path
+        if path == '/health':
+            self._send(HTTPStatus.OK, json.dumps(scorer.info()))
+        elif path == '/bounds':
+            self._send(HTTPStatus.OK, json.dumps({'bounds': _json_bounds(scorer.bounds), 'lambdas': scorer.lambdas}))
+        else:
+            self._error(HTTPStatus.NOT_FOUND, f'No such endpoint: {path}')
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        try:
+            body = self._body()
+            if path == '/score':
+                t0 = time.perf_counter()
+                out = self.server.scorer.score(body.get('rows', []), body.get('lambdas'))
+                rows = out.to_json(orient='records', double_precision=JSON_DECIMALS)
+                seconds = time.perf_counter() - t0
+                self._send(HTTPStatus.OK, f'{{"n": {len(out)}, "seconds": {seconds:.6f}, "rows": {rows}}}')
+            elif path == '/reload':
+                self.server.reload()
+                self._send(HTTPStatus.OK, json.dumps(self.server.scorer.info()))
+            else:
+                self._error(HTTPStatus.NOT_FOUND, f'No such endpoint: {path}')
+        except (ScoringError, TypeError, ValueError) as e:
+            self._error(HTTPStatus.BAD_REQUEST, str(e))
+        except Exception as e:
+            self._error(HTTPStatus.INTERNAL_SERVER_ERROR, f'{type(e).__name__}: {e}')
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, loader, quiet: bool = False):
+        # loader() -> Scorer; called now and on POST /reload
+        self.loader = loader
+        self.scorer = loader()
+        self.quiet = quiet
+        self._reload_lock = threading.Lock()
+        super().__init__(address, ScoringHandler)
+
+    def reload(self) -> None:
+        # Requests in flight keep the scorer they started with
+        with self._reload_lock:
+            self.scorer = self.loader()
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, outdir=None, bounds_path=None,
+          lambdas=LAMBDAS, quiet: bool = False) -> ScoringServer:
+    # Bound, not yet serving: call serve_forever() (or run it in a thread)
+    return ScoringServer((host, port), lambda: Scorer.from_outputs(outdir, bounds_path, lambdas), quiet=quiet)
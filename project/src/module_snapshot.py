@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import traceback
+from pathlib import Path
+
+
+# Versioned pipeline outputs served to the app while the next version is computed:
+#
+#   outputs/snapshots/build/     stable working directory of the background run (so the
+#                                stage DAG can skip unchanged stages between runs)
+#   outputs/snapshots/<version>/ published, never modified again
+#   outputs/current -> snapshots/<version>   swapped atomically after a successful run
+#   outputs/status.json          state of the background run, read by the app
+#
+# A failed run leaves `current` untouched, so the last good snapshot keeps being served.
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+OUTPUTS_DIR = Path(os.getenv('IECGGS_OUTPUTS_DIR', BASE_DIR / 'outputs'))
+SNAPSHOTS_NAME = 'snapshots'
+BUILD_NAME = 'build'
+CURRENT_NAME = 'current'
+STATUS_NAME = 'status.json'
+LOCK_NAME = '.snapshot.lock'
+WORKER_LOG_NAME = 'worker.log'
+# Published snapshots kept besides the current one
+DEFAULT_KEEP = 2
+
+
+def _root(root=None) -> Path:
+    return Path(root) if root is not None else OUTPUTS_DIR
+
+
+def current_dir(root=None) -> Path | None:
+    # Directory of the snapshot being served, or None before the first published run
+    link = _root(root) / CURRENT_NAME
+    try:
+        target = link.resolve(strict=True)
+    except (OSError, RuntimeError):
+        return None
+    return target if target.is_dir() else None
+
+
+def serving_dir(root=None) -> Path:
+    # What the app reads: the current snapshot, else outputs/ itself (runs without snapshots)
+    return current_dir(root) or _root(root)
+
+
+def read_status(root=None) -> dict:
+    try:
+        status = json.loads((_root(root) / STATUS_NAME).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {'state': 'idle'}
+    # A worker that died without recording its end (killed, container restart) is not running
+    if status.get('state') == 'running' and not _alive(status.get('pid')):
+        status['state'] = 'failed'
+        status.setdefault('error', 'worker exited without finishing')
+    return status
+
+
+def _write_status(root: Path, **fields) -> dict:
+    status = {**read_status(root), **fields, 'updated': time.time()}
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = root / f'{STATUS_NAME}.{os.getpid()}.tmp'
+    tmp.write_text(json.dumps(status, indent=2), encoding='utf-8')
+    os.replace(tmp, root / STATUS_NAME)
+    return status
+
+
+def _alive(pid) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _lock_holder(root: Path) -> int | None:
+    # pid of the live run holding the lock, if any
+    try:
+        pid = int((root / LOCK_NAME).read_text(encoding='utf-8') or 0)
+    except (OSError, ValueError):
+        return None
+    return pid if _alive(pid) else None
+
+
+def _acquire_lock(root: Path) -> bool:
+    # One background run at a time; a lock left by a dead worker is taken over
+    path = root / LOCK_NAME
+    root.mkdir(parents=True, exist_ok=True)
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if _lock_holder(root):
+                return False
+            path.unlink(missing_ok=True)
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
+    return False
+
+
+def _swap_current(root: Path, target: Path) -> None:
+    # Relative symlink replaced with rename(2), so readers see either snapshot, never neither
+    tmp = root / f'{CURRENT_NAME}.{os.getpid()}.tmp'
+    tmp.unlink(missing_ok=True)
+    tmp.symlink_to(target.relative_to(root), target_is_directory=True)
+    os.replace(tmp, root / CURRENT_NAME)
+
+
+def list_snapshots(root=None) -> list[Path]:
+    snapshots = _root(root) / SNAPSHOTS_NAME
+    if not snapshots.is_dir():
+        return []
+    return sorted(p for p in snapshots.iterdir() if p.is_dir() and p.name != BUILD_NAME and not p.name.endswith('.tmp'))
+
+
+def prune_snapshots(root=None, keep: int = DEFAULT_KEEP) -> list[Path]:
+    # Drops published snapshots beyond the `keep` most recent ones other than the current one
+    current = current_dir(root)
+    old = [p for p in list_snapshots(root) if p != current]
+    removed = old[:max(len(old) - keep, 0)]
+    for path in removed:
+        shutil.rmtree(path, ignore_errors=True)
+    return removed
+
+
+def publish_snapshot(build, root=None, keep=None) -> Path | None:
+    # Runs build(outdir) in the stable build directory and publishes a copy of it as a new
+    # versioned snapshot. Returns the snapshot path, or None when another run holds the lock.
+    root = _root(root)
+    keep = int(os.getenv('IECGGS_KEEP_SNAPSHOTS', DEFAULT_KEEP)) if keep is None else keep
+    if not _acquire_lock(root):
+        return None
+    snapshots = root / SNAPSHOTS_NAME
+    build_dir = snapshots / BUILD_NAME
+    started = time.time()
+    try:
+        _write_status(root, state='running', pid=os.getpid(), started=started, finished=None, error=None, traceback=None)
+        build_dir.mkdir(parents=True, exist_ok=True)
+        build(build_dir)
+        version = time.strftime('%Y%m%dT%H%M%S', time.localtime(started)) + f'-{os.getpid()}'
+        tmp = snapshots / f'{version}.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.copytree(build_dir, tmp)
+        target = snapshots / version
+        os.replace(tmp, target)
+        _swap_current(root, target)
+        prune_snapshots(root, keep)
+        _write_status(root, state='ok', version=version, finished=time.time(), error=None,
+                      seconds=round(time.time() - started, 3))
+        return target
+    except BaseException as e:
+        _write_status(root, state='failed', finished=time.time(), error=f'{type(e).__name__}: {e}',
+                      traceback=traceback.format_exc(limit=5))
+        raise
+    finally:
+        (root / LOCK_NAME).unlink(missing_ok=True)
+
+
+def start_worker(root=None, args=()) -> int | None:
+    # Launches `main.py --snapshot` detached from the caller (e.g. the app); None when a run
+    # holds the lock. Only the worker, once it holds the lock, writes the status.
+    root = _root(root)
+    if _lock_holder(root):
+        return None
+    root.mkdir(parents=True, exist_ok=True)
+    cmd = [sys.executable, str(Path(__file__).resolve().parent / 'main.py'), '--snapshot', *args]
+    env = {**os.environ, 'IECGGS_OUTPUTS_DIR': str(root)}
+    with (root / WORKER_LOG_NAME).open('ab') as log:
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                env=env, start_new_session=True)
+    return proc.pid
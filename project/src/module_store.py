@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from module_output import typed_frame
+from module_profile import span
+
+
+STORE_NAME = 'iecggs.sqlite'
+# Artifacts materialized into the store by run_pipeline
+STORE_TABLES = ('panel_clean', 'subindices', 'IECGGS_penalized', 'panel_with_flags')
+COVERAGE_PREFIX = 'coverage_report_'
+META_TABLE = '_tables'
+DEFAULT_TABLE = 'IECGGS_penalized'
+KEY_INDEX = ('iso3', 'year')
+INSERT_CHUNK_ROWS = 50_000
+
+
+def store_path(outdir: str | Path) -> Path:
+    return Path(outdir) / STORE_NAME
+
+
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _sql_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # SQLite column types: categories as text, booleans (nullable too) as 0/1 integers
+    out = typed_frame(df)
+    for col in out.columns:
+        s = out[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            out[col] = s.astype(object).where(s.notna(), None)
+        elif pd.api.types.is_bool_dtype(s):
+            out[col] = s.astype('Int8')
+    return out
+
+
+def connect(outdir: str | Path, readonly: bool = True) -> sqlite3.Connection:
+    path = store_path(outdir)
+    if readonly:
+        if not path.exists():
+            raise FileNotFoundError(f"Store '{path}' not found. Run pipeline first.")
+        return sqlite3.connect(f'{path.as_uri()}?mode=ro', uri=True, check_same_thread=False)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(path)
+    # WAL: readers (the app, scripts) keep a consistent view while a table is replaced
+    con.execute('PRAGMA journal_mode=WAL')
+    return con
+
+
+def store_frame(df: pd.DataFrame, outdir: str | Path, name: str) -> dict:
+    # Replaces table `name` in outdir/iecggs.sqlite in one transaction and indexes it on
+    # (iso3, year) and on every flag_* column
+    frame = _sql_frame(df)
+    dtypes = {str(c): str(t) for c, t in typed_frame(df).dtypes.items()}
+    with span(f'store.{name}', kind='write') as s:
+        s.inputs(df)
+        con = connect(outdir, readonly=False)
+        try:
+            with con:
+                con.execute(f'DROP TABLE IF EXISTS {_quote(name)}')
+                frame.to_sql(name, con, index=False, chunksize=INSERT_CHUNK_ROWS)
+                indexes = []
+                keys = [k for k in KEY_INDEX if k in frame.columns]
+                if keys:
+                    indexes.append(keys)
+                indexes.extend([c] for c in frame.columns if str(c).startswith('flag_'))
+                for cols in indexes:
+                    index_name = _quote(f'ix_{name}_' + '_'.join(cols))
+                    col_list = ', '.join(_quote(c) for c in cols)
+                    con.execute(f'CREATE INDEX {index_name} ON {_quote(name)} ({col_list})')
+                con.execute(f'CREATE TABLE IF NOT EXISTS {META_TABLE} '
+                            '(name TEXT PRIMARY KEY, rows INTEGER, updated REAL, dtypes TEXT)')
+                con.execute(f'INSERT OR REPLACE INTO {META_TABLE} VALUES (?, ?, ?, ?)',
+                            (name, len(frame), time.time(), json.dumps(dtypes)))
+        finally:
+            con.close()
+        s.set(bytes=os.path.getsize(store_path(outdir)), indexes=len(indexes))
+    return {'rows': len(frame), 'indexes': indexes}
+
+
+def list_tables(outdir: str | Path) -> dict:
+    # {table: {'rows', 'updated', 'dtypes'}} for the tables recorded in the store; {} without a store
+    try:
+        con = connect(outdir)
+    except FileNotFoundError:
+        return {}
+    try:
+        rows = con.execute(f'SELECT name, rows, updated, dtypes FROM {META_TABLE}').fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+    finally:
+        con.close()
+    return {name: {'rows': n, 'updated': updated, 'dtypes': json.loads(dtypes)} for name, n, updated, dtypes in rows}
+
+
+def _restore(df: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    # Back to the dtypes the frame had when stored (SQLite returns int64/float64/text)
+    for col in df.columns:
+        dtype = dtypes.get(col)
+        if dtype is not None and str(df[col].dtype) != dtype:
+            try:
+                df[col] = df[col].astype(dtype)
+            except (TypeError, ValueError):
+                pass  # e.g. a non-null dtype over NULL rows of a filtered subset
+    return df
+
+
+def query(outdir: str | Path, sql: str, params=(), table: str | None = None) -> pd.DataFrame:
+    # Rows of any SQL query; with `table` the stored dtypes of that table are restored
+    con = connect(outdir)
+    try:
+        df = pd.read_sql_query(sql, con, params=params)
+    finally:
+        con.close()
+    if table is not None:
+        return _restore(df, list_tables(outdir).get(table, {}).get('dtypes', {}))
+    return typed_frame(df)
+
+
+def iter_table(outdir: str | Path, name: str, chunk_rows: int = 100_000, columns=None):
+    # Yields typed frames of at most chunk_rows rows of table `name`
+    cols = ', '.join(_quote(c) for c in columns) if columns else '*'
+    dtypes = list_tables(outdir).get(name, {}).get('dtypes', {})
+    con = connect(outdir)
+    try:
+        for chunk in pd.read_sql_query(f'SELECT {cols} FROM {_quote(name)}', con, chunksize=chunk_rows):
+            yield _restore(chunk, dtypes)
+    finally:
+        con.close()
+
+
+def _where(countries=(), year_range=None, flags=(), iso3=()) -> tuple[str, list]:
+    clauses, params = [], []
+    for col, values in (('country', countries), ('iso3', iso3)):
+        if values:
+            clauses.append(f'{col} IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+    if year_range is not None:
+        clauses.append('year BETWEEN ? AND ?')
+        params.extend(int(y) for y in year_range)
+    for flag in flags:
+        clauses.append(f'{_quote(flag)} = 1')
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+def select_rows(outdir: str | Path, name: str, countries=(), year_range=None, flags=(), iso3=(),
+                columns=None, limit=None, offset=0) -> pd.DataFrame:
+    # Filtered rows of table `name` in (iso3, year) order; filters use the table indexes
+    cols = ', '.join(_quote(c) for c in columns) if columns else '*'
+    where, params = _where(countries, year_range, flags, iso3)
+    order = ' ORDER BY iso3, year' if set(KEY_INDEX) <= set(table_columns(outdir, name)) else ''
+    sql = f'SELECT {cols} FROM {_quote(name)}{where}{order}'
+    if limit is not None:
+        sql += ' LIMIT ? OFFSET ?'
+        params += [int(limit), int(offset)]
+    return query(outdir, sql, params, table=name)
+
+
+def count_rows(outdir: str | Path, name: str, countries=(), year_range=None, flags=(), iso3=()) -> int:
+    where, params = _where(countries, year_range, flags, iso3)
+    con = connect(outdir)
+    try:
+        return con.execute(f'SELECT COUNT(*) FROM {_quote(name)}{where}', params).fetchone()[0]
+    finally:
+        con.close()
+
+
+def table_columns(outdir: str | Path, name: str) -> list[str]:
+    con = connect(outdir)
+    try:
+        return [row[1] for row in con.execute(f'PRAGMA table_info({_quote(name)})')]
+    finally:
+        con.close()
+
+
+def distinct_values(outdir: str | Path, name: str, column: str) -> list:
+    con = connect(outdir)
+    try:
+        rows = con.execute(
+            f'SELECT DISTINCT {_quote(column)} FROM {_quote(name)} WHERE {_quote(column)} IS NOT NULL ORDER BY 1'
+        ).fetchall()
+    finally:
+        con.close()
+    return [r[0] for r in rows]
+
+
+def value_range(outdir: str | Path, name: str, column: str):
+    con = connect(outdir)
+    try:
+        return con.execute(f'SELECT MIN({_quote(column)}), MAX({_quote(column)}) FROM {_quote(name)}').fetchone()
+    finally:
+        con.close()
+
+
+def get_country_series(iso3: str, outdir: str | Path, table: str = DEFAULT_TABLE, columns=None) -> pd.DataFrame:
+    # All years of one country, ordered by year (served by the (iso3, year) index)
+    return select_rows(outdir, table, iso3=(str(iso3).upper(),), columns=columns)
+
+
+def score_column(lam=None) -> str:
+    # IECGGS_raw without a lambda, else the penalized column written by apply_penalty
+    return 'IECGGS_raw' if lam is None else f'IECGGS_adj_lambda_{lam}'
+
+
+def top_n(year: int, outdir: str | Path, lam=None, n: int = 10, table: str = DEFAULT_TABLE) -> pd.DataFrame:
+    # The n highest scores of `year` for penalty `lam` (unpenalized index when None), with rank
+    col = score_column(lam)
+    if col not in table_columns(outdir, table):
+        raise KeyError(f"Column '{col}' not in table '{table}'")
+    out = query(
+        outdir,
+        f'SELECT iso3, country, year, {_quote(col)} FROM {_quote(table)} '
+        f'WHERE year = ? AND {_quote(col)} IS NOT NULL ORDER BY {_quote(col)} DESC, iso3 LIMIT ?',
+        (int(year), int(n)),
+        table=table,
+    )
+    out.insert(0, 'rank', range(1, len(out) + 1))
+    return out
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from module_index import (
+    DOM_COMPONENTS,
+    PART_COUNTS,
+    REG_COMPONENTS,
+    eligibility_thresholds,
+    normalize_components,
+)
+from module_sensitivity import DEFAULT_QUANTILES, RankAccumulator
+
+
+DEFAULT_REPLICATES = 1000
+DEFAULT_BATCH_SIZE = 250
+# Histogram resolution for score bands on [0, 1]; quantiles interpolate inside a bin
+DEFAULT_BINS = 500
+# Dirichlet concentration around equal pillar weights (larger = tighter perturbation)
+DEFAULT_WEIGHT_ALPHA = (10.0, 10.0, 10.0)
+DEFAULT_LAMBDA_RANGE = (0.1, 0.5)
+
+SCORES = ('IECGGS_raw', 'IECGGS_adj')
+
+
+def default_threshold_choices() -> dict:
+    # Each MIN_*_OBS threshold is drawn from its configured value +/- 1, kept within the
+    # number of components the pillar has
+    def around(value, upper):
+        return tuple(sorted({min(upper, max(1, v)) for v in (value - 1, value, value + 1)}))
+
+    t = eligibility_thresholds()
+    return {
+        'reg': around(t['reg'], len(REG_COMPONENTS)),
+        'dom': around(t['dom'], len(DOM_COMPONENTS)),
+        'part': around(t['part'], len(PART_COUNTS)),
+        'index': around(t['index'], 3),
+    }
+
+
+def _prepare(panel: pd.DataFrame, thresholds: dict) -> tuple[pd.DataFrame, dict]:
+    # Replicate-invariant arrays. Rows that cannot reach the index threshold under the
+    # loosest draw are dropped up front: they are NaN in every replicate.
+    df = normalize_components(panel)
+    reg = df[REG_COMPONENTS].to_numpy(dtype=float)
+    dom = df[DOM_COMPONENTS].to_numpy(dtype=float)
+    counts = df[PART_COUNTS].to_numpy(dtype=float)
+    n_reg = (~np.isnan(reg)).sum(axis=1)
+    n_dom = (~np.isnan(dom)).sum(axis=1)
+    n_part = (~np.isnan(counts)).sum(axis=1)
+    possible = (
+        (n_reg >= min(thresholds['reg'])).astype(int)
+        + (n_dom >= min(thresholds['dom']))
+        + (n_part >= min(thresholds['part']))
+    )
+    keep = possible >= min(thresholds['index'])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        static = {
+            'reg_mean': (np.nansum(reg, axis=1) / n_reg)[keep],
+            'dom_mean': (np.nansum(dom, axis=1) / n_dom)[keep],
+            'counts': counts[keep],
+            'part_n': df[[f'{c}_n' for c in PART_COUNTS]].to_numpy(dtype=float)[keep],
+            'n_reg': n_reg[keep],
+            'n_dom': n_dom[keep],
+            'n_part': n_part[keep],
+            'excl': df['art7_excluded'].fillna(0).to_numpy(dtype=float)[keep],
+            'years': df['year'].to_numpy()[keep],
+        }
+    keys = [c for c in ('iso3', 'country', 'year') if c in df.columns]
+    return df.loc[keep, keys].reset_index(drop=True), static
+
+
+def _minmax_columns(x: np.ndarray) -> np.ndarray:
+    # utils.minmax_scale applied along axis 0 of every (component, replicate) column
+    valid = ~np.isnan(x)
+    mn = np.where(valid, x, np.inf).min(axis=0)
+    mx = np.where(valid, x, -np.inf).max(axis=0)
+    span = mx - mn
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out = np.where(span > 0, (x - mn) / np.where(span > 0, span, 1), 0.0)
+    return np.where(valid, out, np.nan)
+
+
+def _scores(static: dict, weights, lams, t_reg, t_dom, t_part, t_index, part_n) -> tuple[np.ndarray, np.ndarray]:
+    # rows x B raw and penalized scores for B replicates; mirrors compute_subindices,
+    # compute_index and apply_penalty with per-replicate weights, thresholds and lambda
+    part_valid = ~np.isnan(part_n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        part_mean = np.where(part_valid, part_n, 0).sum(axis=1) / static['n_part'][:, None]
+    ok = [
+        static['n_reg'][:, None] >= t_reg,
+        static['n_dom'][:, None] >= t_dom,
+        static['n_part'][:, None] >= t_part,
+    ]
+    pillars = [
+        np.broadcast_to(static['reg_mean'][:, None], ok[0].shape),
+        np.broadcast_to(static['dom_mean'][:, None], ok[1].shape),
+        part_mean,
+    ]
+    num = np.zeros(ok[0].shape)
+    den = np.zeros(ok[0].shape)
+    for i, (flag, value) in enumerate(zip(ok, pillars)):
+        avail = flag & ~np.isnan(value)
+        num += np.where(avail, value, 0) * weights[:, i]
+        den += avail * weights[:, i]
+    n_ok = ok[0].astype(int) + ok[1] + ok[2]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        raw = np.where((n_ok >= t_index) & (den > 0), num / den, np.nan)
+    adj = raw * (1 - static['excl'][:, None] * lams)
+    return raw, adj
+
+
+class BandAccumulator:
+    # Per-row running moments plus a fixed-bin histogram on [0, 1], so percentile bands
+    # cost rows x bins memory however many replicates are streamed through
+    def __init__(self, n_rows: int, bins: int = DEFAULT_BINS):
+        self.bins = bins
+        self.count = np.zeros(n_rows, dtype=np.int64)
+        self.total = np.zeros(n_rows)
+        self.total_sq = np.zeros(n_rows)
+        self.min = np.full(n_rows, np.inf)
+        self.max = np.full(n_rows, -np.inf)
+        self.hist = np.zeros((n_rows, bins), dtype=np.int64)
+
+    def update(self, values: np.ndarray) -> None:
+        valid = ~np.isnan(values)
+        v = np.where(valid, values, 0)
+        self.count += valid.sum(axis=1)
+        self.total += v.sum(axis=1)
+        self.total_sq += (v * v).sum(axis=1)
+        self.min = np.minimum(self.min, np.where(valid, values, np.inf).min(axis=1, initial=np.inf))
+        self.max = np.maximum(self.max, np.where(valid, values, -np.inf).max(axis=1, initial=-np.inf))
+        b = np.clip((v * self.bins).astype(np.int64), 0, self.bins - 1)
+        flat = (b + (np.arange(len(values)) * self.bins)[:, None])[valid]
+        self.hist += np.bincount(flat, minlength=self.hist.size).reshape(self.hist.shape)
+
+    def merge(self, other: BandAccumulator) -> None:
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.hist += other.hist
+
+    def quantile(self, q: float) -> np.ndarray:
+        target = q * self.count
+        cum = self.hist.cumsum(axis=1)
+        k = np.minimum((cum < target[:, None]).sum(axis=1), self.bins - 1)
+        rows = np.arange(len(k))
+        before = cum[rows, k] - self.hist[rows, k]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            frac = np.clip((target - before) / self.hist[rows, k], 0, 1)
+        out = np.clip((k + frac) / self.bins, self.min, self.max)
+        return np.where(self.count > 0, out, np.nan)
+
+    def summary(self, name: str, quantiles=DEFAULT_QUANTILES) -> pd.DataFrame:
+        n = self.count.astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.total / n
+            var = (self.total_sq - n * mean ** 2) / (n - 1)
+        out = {f'mean_{name}': mean, f'std_{name}': np.sqrt(np.clip(var, 0, None))}
+        for q in quantiles:
+            out[f'q{q:g}_{name}'] = self.quantile(q)
+        return pd.DataFrame(out)
+
+
+def _run_batch(static: dict, baseline_ranks: np.ndarray, config: dict, seed, n: int) -> dict:
+    rng = np.random.default_rng(seed)
+    weights = rng.dirichlet(np.asarray(config['weight_alpha'], dtype=float), size=n)
+    lams = rng.uniform(*config['lambda_range'], size=n)
+    t = {k: rng.choice(np.asarray(v), size=n) for k, v in sorted(config['thresholds'].items())}
+    if config['bootstrap_participation']:
+        # Parametric (Poisson) bootstrap of the event counts, re-normalized per replicate
+        counts = static['counts']
+        draws = rng.poisson(np.nan_to_num(counts)[:, :, None], size=counts.shape + (n,)).astype(float)
+        part_n = _minmax_columns(np.where(np.isnan(counts)[:, :, None], np.nan, draws))
+    else:
+        part_n = np.broadcast_to(static['part_n'][:, :, None], static['part_n'].shape + (n,))
+    raw, adj = _scores(static, weights, lams, t['reg'], t['dom'], t['part'], t['index'], part_n)
+
+    n_rows = len(raw)
+    bands = {name: BandAccumulator(n_rows, config['bins']) for name in SCORES}
+    bands['IECGGS_raw'].update(raw)
+    bands['IECGGS_adj'].update(adj)
+    ranks = RankAccumulator(static['years'])
+    r = ranks.ranks(raw)
+    ranks.add(r)
+    both = (r > 0) & (baseline_ranks[:, None] > 0)
+    shift = np.abs(r - baseline_ranks[:, None])
+    return {
+        'n': n,
+        'bands': bands,
+        'ranks': ranks,
+        'shift_total': np.where(both, shift, 0).sum(axis=1),
+        'same_rank': (both & (shift == 0)).sum(axis=1),
+        'compared': both.sum(axis=1),
+    }
+
+
+def _merge(acc: dict | None, part: dict) -> dict:
+    if acc is None:
+        return part
+    acc['n'] += part['n']
+    for name in SCORES:
+        acc['bands'][name].merge(part['bands'][name])
+    acc['ranks'].merge(part['ranks'])
+    for key in ('shift_total', 'same_rank', 'compared'):
+        acc[key] += part[key]
+    return acc
+
+
+def monte_carlo(panel: pd.DataFrame, n_replicates: int = DEFAULT_REPLICATES, seed=0,
+                batch_size: int = DEFAULT_BATCH_SIZE, n_jobs=None, weight_alpha=DEFAULT_WEIGHT_ALPHA,
+                lambda_range=DEFAULT_LAMBDA_RANGE, thresholds=None, bootstrap_participation: bool = True,
+                quantiles=DEFAULT_QUANTILES, bins: int = DEFAULT_BINS):
+    # Monte Carlo uncertainty of IECGGS over random pillar weights, Poisson-bootstrapped
+    # participation counts, MIN_*_OBS thresholds and penalty lambda. Replicates are
+    # vectorized in batches of `batch_size` (rows x batch arrays) and batches run in a
+    # process pool; each batch draws from its own SeedSequence child, so results depend on
+    # (seed, batch_size) but not on n_jobs. Batches are folded into histogram and rank
+    # accumulators as they finish, with at most 2 x n_jobs batches in flight.
+    # Returns (bands, ranks): per country-year score bands, and within-year rank stability
+    # of IECGGS_raw against the deterministic (baseline) ranking.
+    if thresholds is None:
+        thresholds = default_threshold_choices()
+    keys, static = _prepare(panel, thresholds)
+    n_rows = len(keys)
+
+    one = np.ones(1)
+    t = eligibility_thresholds()
+    base_raw, _ = _scores(
+        static, np.full((1, 3), 1 / 3), np.full(1, np.mean(lambda_range)),
+        t['reg'] * one, t['dom'] * one, t['part'] * one, t['index'] * one,
+        static['part_n'][:, :, None],
+    )
+    baseline_ranks = RankAccumulator(static['years']).ranks(base_raw)[:, 0]
+
+    config = {
+        'weight_alpha': tuple(weight_alpha),
+        'lambda_range': tuple(lambda_range),
+        'thresholds': {k: tuple(v) for k, v in thresholds.items()},
+        'bootstrap_participation': bootstrap_participation,
+        'bins': bins,
+    }
+    sizes = [min(batch_size, n_replicates - start) for start in range(0, n_replicates, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if n_jobs is None:
+        n_jobs = int(os.getenv('IECGGS_MC_JOBS', '0')) or min(len(sizes), os.cpu_count() or 1)
+
+    acc = None
+    if n_jobs <= 1 or len(sizes) <= 1:
+        for child, n in zip(seeds, sizes):
+            acc = _merge(acc, _run_batch(static, baseline_ranks, config, child, n))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            pending = deque()
+            batches = iter(zip(seeds, sizes))
+            for child, n in batches:
+                pending.append(pool.submit(_run_batch, static, baseline_ranks, config, child, n))
+                if len(pending) >= 2 * n_jobs:
+                    acc = _merge(acc, pending.popleft().result())
+            while pending:
+                acc = _merge(acc, pending.popleft().result())
+
+    if acc is None:
+        acc = {
+            'n': 0,
+            'bands': {name: BandAccumulator(n_rows, bins) for name in SCORES},
+            'ranks': RankAccumulator(static['years']),
+            'shift_total': np.zeros(n_rows, dtype=np.int64),
+            'same_rank': np.zeros(n_rows, dtype=np.int64),
+            'compared': np.zeros(n_rows, dtype=np.int64),
+        }
+
+    bands = [keys, pd.DataFrame({
+        'baseline_IECGGS_raw': base_raw[:, 0],
+        'n_replicates': acc['n'],
+        'p_eligible': acc['bands']['IECGGS_raw'].count / max(acc['n'], 1),
+    })]
+    bands += [acc['bands'][name].summary(name, quantiles) for name in SCORES]
+    bands = pd.concat(bands, axis=1)
+
+    compared = acc['compared'].astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stability = pd.DataFrame({
+            'rank_baseline': np.where(baseline_ranks > 0, baseline_ranks, np.nan),
+            'rank_shift_mean': acc['shift_total'] / compared,
+            'p_same_rank': acc['same_rank'] / compared,
+        })
+    ranks = pd.concat([keys, stability, acc['ranks'].summary(quantiles)], axis=1)
+    return bands, ranks
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from module_profile import span
+from utils import resolve_iso3
+
+
+# Index columns compared with the external GHS scores
+VALIDATION_MEASURES = ('E_reg', 'IECGGS_raw')
+KEYS = ['iso3', 'year']
+# Pairs with fewer common countries in a year get no coefficient
+MIN_PAIRS = 10
+
+
+def ghs_wide(ghs: pd.DataFrame) -> pd.DataFrame:
+    # (iso3, year) x indicator matrix of the long GHS scores (module_ingest.read_ghs)
+    iso3 = resolve_iso3(ghs['country'].astype(object))
+    df = ghs.assign(iso3=iso3.to_numpy()).loc[iso3.notna().to_numpy()]
+    wide = df.pivot_table(index=KEYS, columns='indicator', values='value', aggfunc='mean', observed=True)
+    wide.columns = [str(c) for c in wide.columns]
+    return wide.astype('float64')
+
+
+def _masked_moments(x: np.ndarray, y: np.ndarray, groups: np.ndarray, n_groups: int) -> dict:
+    # Per-group sums over the rows where both x[:, i] and y[:, j] are present, for every
+    # (group, i, j) at once: arrays of shape (n_groups, x columns, y columns)
+    mx, my = ~np.isnan(x), ~np.isnan(y)
+    x0, y0 = np.where(mx, x, 0.0), np.where(my, y, 0.0)
+    onehot = np.zeros((len(groups), n_groups))
+    onehot[np.arange(len(groups)), groups] = 1.0
+    both = lambda a, b: np.einsum('ng,ni,nj->gij', onehot, a, b)
+    return {
+        'n': both(mx.astype(float), my.astype(float)),
+        'sx': both(x0, my.astype(float)),
+        'sy': both(mx.astype(float), y0),
+        'sxx': both(x0 * x0, my.astype(float)),
+        'syy': both(mx.astype(float), y0 * y0),
+        'sxy': both(x0, y0),
+    }
+
+
+def _pearson(m: dict) -> np.ndarray:
+    n = m['n']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = n * m['sxy'] - m['sx'] * m['sy']
+        var = (n * m['sxx'] - m['sx'] ** 2) * (n * m['syy'] - m['sy'] ** 2)
+        r = cov / np.sqrt(var)
+    return np.where((n >= MIN_PAIRS) & (var > 0), np.clip(r, -1.0, 1.0), np.nan)
+
+
+def correlation_matrices(frame: pd.DataFrame, measures, indicators, by: str = 'year') -> pd.DataFrame:
+    # Pearson and Spearman (rank agreement) correlation of every measure with every indicator,
+    # within each `by` group, from pairwise-complete rows. Spearman ranks each measure within
+    # the rows where it is present together with the GHS scores.
+    groups, keys = pd.factorize(frame[by], sort=True)
+    x = frame[list(measures)].to_numpy(dtype=float)
+    y = frame[list(indicators)].to_numpy(dtype=float)
+    moments = _masked_moments(x, y, groups, len(keys))
+    pearson = _pearson(moments)
+    spearman = np.full_like(pearson, np.nan)
+    # Ranks must be taken over the rows a pair shares: one batch per (measure, indicator
+    # missingness pattern). GHS scores are complete per country-year, so that is one batch
+    # per measure in practice.
+    patterns, batch = np.unique(~np.isnan(y), axis=1, return_inverse=True)
+    for i, measure in enumerate(measures):
+        for b in range(patterns.shape[1]):
+            cols = np.flatnonzero(batch.reshape(-1) == b)
+            rows = ~np.isnan(x[:, i]) & patterns[:, b]
+            ranked = pd.DataFrame(np.column_stack([x[rows, i], y[rows][:, cols]])).groupby(groups[rows]).rank()
+            ranked = ranked.to_numpy(dtype=float)
+            m = _masked_moments(ranked[:, :1], ranked[:, 1:], groups[rows], len(keys))
+            spearman[:, i, cols] = _pearson(m)[:, 0, :]
+    return pd.DataFrame({
+        by: np.repeat(np.asarray(keys), len(measures) * len(indicators)),
+        'measure': np.tile(np.repeat(list(measures), len(indicators)), len(keys)),
+        'indicator': np.tile(list(indicators), len(keys) * len(measures)),
+        'n': moments['n'].reshape(-1).astype('int64'),
+        'pearson': pearson.reshape(-1),
+        'spearman': spearman.reshape(-1),
+    })
+
+
+def validate_against_ghs(index: pd.DataFrame, ghs: pd.DataFrame, measures=VALIDATION_MEASURES) -> pd.DataFrame:
+    # Correlation and rank agreement between index columns and GHS scores, every year with
+    # GHS data at once; indicator names are kept from the GHS reader when available
+    with span('validation.ghs') as s:
+        s.inputs([index, ghs])
+        wide = ghs_wide(ghs)
+        indicators = list(wide.columns)
+        measures = [m for m in measures if m in index.columns]
+        frame = index[KEYS + measures].merge(wide.reset_index(), on=KEYS, how='inner')
+        out = correlation_matrices(frame, measures, indicators)
+        names = ghs.attrs.get('ghs_names', {})
+        out.insert(out.columns.get_loc('indicator') + 1, 'indicator_name', out['indicator'].map(names))
+        s.outputs(out)
+    return out
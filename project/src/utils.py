@@ -1,20 +1,60 @@
+import json
+import os
 import re
+from collections import OrderedDict
+from pathlib import Path
 from typing import Optional
 
 import pandas as pd
 import numpy as np
-from unidecode import unidecode
 
-try:
-    import country_converter as coco
-    _coco = coco.CountryConverter()
-except Exception:  # fallback if not available
-    _coco = None
+# country_converter (which loads its country table on construction) and unidecode are only
+# imported when a name has to be cleaned or resolved, keeping `import utils` light for the app
+_coco = None
+_coco_loaded = False
+
+
+def _country_converter():
+    global _coco, _coco_loaded
+    if not _coco_loaded:
+        _coco_loaded = True
+        try:
+            import country_converter as coco
+            _coco = coco.CountryConverter()
+        except Exception:  # fallback if not available
+            _coco = None
+    return _coco
+
+
+# Spanish names used by the WHA participation and Art.7 exclusion workbooks that
+# coco either misses or resolves to the wrong country (keys are clean_country_name output).
+COUNTRY_ALIASES = {
+    'Afganistan': 'AFG', 'Alemania': 'DEU', 'Arabia Saudita': 'SAU', 'Argelia': 'DZA',
+    'Azerbaiyan': 'AZE', 'Bahrein': 'BHR', 'Belgica': 'BEL', 'Brasil': 'BRA',
+    'Camboya': 'KHM', 'Camerun': 'CMR', 'Chequia': 'CZE', 'Chipre': 'CYP',
+    'Comoras': 'COM', 'Croacia': 'HRV', 'Dinamarca': 'DNK', 'Djbouti': 'DJI',
+    'Egipto': 'EGY', 'Emiratos Arabes Unidos': 'ARE', 'Eslovaquia': 'SVK', 'Espana': 'ESP',
+    'Estados Unidos de America': 'USA', 'Etiopia': 'ETH', 'Federacion de Rusia': 'RUS',
+    'Filipinas': 'PHL', 'Francia': 'FRA', 'Granada': 'GRD', 'Grecia': 'GRC',
+    'Guinea Ecuatorial': 'GNQ', 'Hungria': 'HUN', 'Irlanda': 'IRL', 'Islandia': 'ISL',
+    'Islas Salomon': 'SLB', 'Jamahiriya Arabe': 'LBY', 'Japon': 'JPN', 'Kazajstan': 'KAZ',
+    'Kirguistan': 'KGZ', 'Letonia': 'LVA', 'Libano': 'LBN', 'Libia': 'LBY',
+    'Lituania': 'LTU', 'Malasia': 'MYS', 'Maldivas': 'MDV', 'Marruecos': 'MAR',
+    'Mauricio': 'MUS', 'Noruega': 'NOR', 'Nueva Zelandia': 'NZL', 'Paises Bajos': 'NLD',
+    'Polonia': 'POL', 'Reino Unido de Gran Bretana e Irlanda del Norte': 'GBR',
+    'Republica Arabe Siria': 'SYR', 'Republica Centroafricana': 'CAF', 'Republica Checa': 'CZE',
+    'Republica de Corea': 'KOR', 'Republica Popular Democratica de Corea': 'PRK',
+    'San Vicente y las Granadinas': 'VCT', 'Singapur': 'SGP', 'Sudafrica': 'ZAF',
+    'Sudan del Sur': 'SSD', 'Suecia': 'SWE', 'Suiza': 'CHE', 'Tailandia': 'THA',
+    'Tayikistan': 'TJK', 'Tunez': 'TUN', 'Turquia': 'TUR', 'Ucrania': 'UKR',
+}
 
 
 def clean_country_name(name: str) -> str:
     if pd.isna(name):
         return name
+    from unidecode import unidecode
+
     s = str(name).strip()
     s = unidecode(s)
     # common fixes
@@ -23,19 +63,111 @@ def clean_country_name(name: str) -> str:
     return s
 
 
+CACHE_DIR = Path(os.getenv('IECGGS_CACHE_DIR', Path(__file__).resolve().parents[1] / '.cache'))
+ISO3_CACHE_PATH = CACHE_DIR / 'iso3_cache.json'
+ISO3_LRU_SIZE = 4096
+_NOT_FOUND = '__not_found__'
+# Names coco could not resolve are cached as None only for the coco release that said so
+_COCO_VERSION_KEY = '__coco_version__'
+
+# In-memory LRU in front of the on-disk mapping; both keyed by clean_country_name output
+_iso3_lru: "OrderedDict[str, Optional[str]]" = OrderedDict()
+_iso3_disk: Optional[dict] = None
+
+
+def _coco_version() -> Optional[str]:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version('country_converter')
+    except PackageNotFoundError:
+        return None
+
+
+def _load_iso3_disk() -> dict:
+    global _iso3_disk
+    if _iso3_disk is None:
+        try:
+            _iso3_disk = json.loads(ISO3_CACHE_PATH.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            _iso3_disk = {}
+        # Negative entries of another coco release may resolve now
+        current = _coco_version()
+        if _iso3_disk.get(_COCO_VERSION_KEY) != current:
+            _iso3_disk = {k: v for k, v in _iso3_disk.items() if v is not None and k != _COCO_VERSION_KEY}
+            _iso3_disk[_COCO_VERSION_KEY] = current
+    return _iso3_disk
+
+
+def _save_iso3_disk() -> None:
+    try:
+        ISO3_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ISO3_CACHE_PATH.with_suffix('.tmp')
+        tmp.write_text(json.dumps(_iso3_disk, ensure_ascii=False, sort_keys=True), encoding='utf-8')
+        os.replace(tmp, ISO3_CACHE_PATH)
+    except OSError:
+        pass  # cache is best effort; a read-only tree still resolves names
+
+
+def _remember_iso3(name: str, code: Optional[str]) -> None:
+    _iso3_lru[name] = code
+    _iso3_lru.move_to_end(name)
+    while len(_iso3_lru) > ISO3_LRU_SIZE:
+        _iso3_lru.popitem(last=False)
+
+
+def resolve_clean_names(names) -> dict:
+    # Map already-cleaned country names to ISO3 (None when unresolved) with one batched coco call
+    out = {}
+    pending = []
+    disk = _load_iso3_disk()
+    for n in dict.fromkeys(names):
+        if n in COUNTRY_ALIASES:
+            out[n] = COUNTRY_ALIASES[n]
+        elif n in _iso3_lru:
+            _iso3_lru.move_to_end(n)
+            out[n] = _iso3_lru[n]
+        elif n in disk and n != _COCO_VERSION_KEY:
+            out[n] = disk[n]
+            _remember_iso3(n, out[n])
+        else:
+            pending.append(n)
+    coco = _country_converter() if pending else None
+    if coco is not None:
+        try:
+            codes = coco.convert(names=pending, to='ISO3', not_found=_NOT_FOUND)
+        except Exception:
+            # A failed call is not an answer: the names stay unresolved for this call only and
+            # nothing is cached, so the next call asks coco again
+            codes = []
+        if isinstance(codes, str):
+            codes = [codes]
+        for n, code in zip(pending, codes):
+            # coco returns a list when a name matches several countries; treat as unresolved
+            code = code if isinstance(code, str) and code != _NOT_FOUND else None
+            out[n] = code
+            disk[n] = code
+            _remember_iso3(n, code)
+        if codes:
+            _save_iso3_disk()
+    for n in pending:
+        out.setdefault(n, None)
+    return out
+
+
+def resolve_iso3(names: pd.Series) -> pd.Series:
+    # Work on unique raw names only and broadcast the codes back onto the Series
+    uniques = names.dropna().unique()
+    cleaned = {u: clean_country_name(u) for u in uniques}
+    codes = resolve_clean_names(cleaned.values())
+    return names.map({u: codes[c] for u, c in cleaned.items()}).astype(object)
+
+
 def to_iso3(name: str) -> Optional[str]:
     if name is None or (isinstance(name, float) and np.isnan(name)):
         return None
     s = clean_country_name(name)
-    if _coco is None:
-        return None
-    try:
-        code = _coco.convert(names=s, to='ISO3')
-        if code in (None, 'not found'):
-            return None
-        return code
-    except Exception:
-        return None
+    return resolve_clean_names([s])[s]
 
 
 def standardize_country_column(df: pd.DataFrame, country_col_candidates=None) -> pd.DataFrame:
@@ -55,9 +187,10 @@ def standardize_country_column(df: pd.DataFrame, country_col_candidates=None) ->
     if country_col is None:
         raise ValueError('No country column found in dataframe')
 
-    df = df.copy()
-    df['country'] = df[country_col].apply(clean_country_name)
-    df['iso3'] = df['country'].apply(to_iso3)
+    df = df.copy(deep=False)
+    uniques = df[country_col].dropna().unique()
+    df['country'] = df[country_col].map({u: clean_country_name(u) for u in uniques})
+    df['iso3'] = resolve_iso3(df['country'])
     return df
 
 
@@ -86,7 +219,7 @@ def coerce_year_column(df: pd.DataFrame, year_col_candidates=None) -> pd.DataFra
             return None
         df['year'] = df['WHA'].apply(wha_to_year)
     elif year_col is not None:
-        df = df.copy()
+        df = df.copy(deep=False)
         df['year'] = pd.to_numeric(df[year_col], errors='coerce')
     else:
         if 'Year' in df.columns:
@@ -96,47 +229,109 @@ def coerce_year_column(df: pd.DataFrame, year_col_candidates=None) -> pd.DataFra
     return df
 
 
-def long_from_wide_indicator(df: pd.DataFrame, id_cols, year_cols_regex=r"^\d{4}$", value_name='value') -> pd.DataFrame:
+# Cell values read as missing in the WHO wide tables
+MISSING_MARKERS = ['..', '', 'NA', 'NaN', 'nan']
+# attrs entry of a long frame whose empty cells were dropped: the wide table's row names and
+# year columns, so the (country, year) keys of empty cells can be restored when joining
+KEY_GRID_ATTR = 'key_grid'
+
+
+def long_from_wide_indicator(df: pd.DataFrame, id_cols, year_cols_regex=r"^\d{4}$", value_name='value',
+                             dropna=True, key_grid_col=None) -> pd.DataFrame:
+    # One row per (id, year column) cell in melt order (year-major). Missing markers are NaN
+    # and, with `dropna`, empty cells are never materialized; the value column is float64
+    # whenever every remaining cell is numeric. With `key_grid_col` the dropped keys are
+    # recorded in attrs[KEY_GRID_ATTR] as that column's values and the year list.
     year_cols = [c for c in df.columns if re.match(year_cols_regex, str(c))]
-    m = df.melt(id_vars=id_cols, value_vars=year_cols, var_name='year', value_name=value_name)
-    m['year'] = pd.to_numeric(m['year'], errors='coerce')
-    # standardize missing markers
-    m[value_name] = m[value_name].replace(['..', '', 'NA', 'NaN', 'nan', None], np.nan)
+    years = pd.to_numeric(pd.Series([str(c) for c in year_cols], dtype=object), errors='coerce').to_numpy()
+    values = []
+    for c in year_cols:
+        col = df[c]
+        if not pd.api.types.is_numeric_dtype(col):
+            col = col.mask(col.isin(MISSING_MARKERS))
+        values.append(col)
+    present = (np.column_stack([v.notna().to_numpy() for v in values]) if values
+               else np.zeros((len(df), 0), dtype=bool))
+    if not dropna:
+        present = np.ones_like(present)
+    # np.nonzero over the transposed mask walks cells column by column, as melt does
+    col_idx, row_idx = np.nonzero(present.T)
+    m = df[list(id_cols)].iloc[row_idx].reset_index(drop=True)
+    m['year'] = years[col_idx] if len(years) else np.array([], dtype=float)
+    if values:
+        cells = [v.to_numpy()[present[:, j]] for j, v in enumerate(values)]
+        cells = np.concatenate(cells) if any(c.dtype == object for c in cells) else np.concatenate(cells).astype(float)
+    else:
+        cells = np.array([], dtype=float)
+    m[value_name] = cells
+    if m[value_name].dtype == object:
+        numeric = pd.to_numeric(m[value_name], errors='coerce')
+        if numeric.notna().sum() == m[value_name].notna().sum():
+            m[value_name] = numeric.astype(float)
+    if pd.isna(m['year']).sum() == 0 and len(m):
+        m['year'] = m['year'].astype('int64')
+    if dropna and key_grid_col is not None:
+        m.attrs[KEY_GRID_ATTR] = {
+            'country': df[key_grid_col].tolist(),
+            'year': [int(y) for y in years if not pd.isna(y)],
+        }
     return m
 
 
-def winsorize_series(s: pd.Series, lower=0.01, upper=0.99) -> pd.Series:
+def winsorize_bounds(s: pd.Series, lower=0.01, upper=0.99) -> tuple[float, float]:
     s = s.astype(float)
-    lo = s.quantile(lower)
-    hi = s.quantile(upper)
+    return float(s.quantile(lower)), float(s.quantile(upper))
+
+
+def winsorize_series(s: pd.Series, lower=0.01, upper=0.99, bounds=None) -> pd.Series:
+    # `bounds` (lo, hi) clips to fixed limits, e.g. frozen from a reference vintage,
+    # instead of this series' own quantiles
+    s = s.astype(float)
+    lo, hi = winsorize_bounds(s, lower, upper) if bounds is None else bounds
     return s.clip(lower=lo, upper=hi)
 
 
-def minmax_scale(s: pd.Series) -> pd.Series:
+def minmax_bounds(s: pd.Series) -> tuple[float, float]:
+    s = s.astype(float)
+    return float(s.min(skipna=True)), float(s.max(skipna=True))
+
+
+def minmax_scale(s: pd.Series, bounds=None) -> pd.Series:
+    # With `bounds` (min, max) the scale is fixed and values outside it are clipped to 0-1
     s = s.astype(float)
-    if s.dropna().nunique() <= 1:
+    if bounds is None:
+        if s.dropna().nunique() <= 1:
+            return pd.Series(np.where(s.notna(), 0.0, np.nan), index=s.index)
+        mn, mx = minmax_bounds(s)
+        return (s - mn) / (mx - mn)
+    mn, mx = bounds
+    if not mx > mn:
         return pd.Series(np.where(s.notna(), 0.0, np.nan), index=s.index)
-    mn = s.min(skipna=True)
-    mx = s.max(skipna=True)
-    return (s - mn) / (mx - mn)
+    return ((s - mn) / (mx - mn)).clip(lower=0.0, upper=1.0)
+
+
+# 0/1/2 codes and Yes/Partial/No labels of the WHO policy tables on the 0/0.5/1 scale
+DISCRETE_CODES = np.array([0.0, 0.5, 1.0])
+DISCRETE_LABELS = {'yes': 1.0, 'si': 1.0, 'sí': 1.0, 'y': 1.0, 'partial': 0.5, 'parcial': 0.5, 'no': 0.0, '0': 0.0}
 
 
 def map_discrete_policy_values(x):
-    # Expect values 0/1/2, sometimes strings 'No','Partial','Yes'
-    if pd.isna(x):
-        return np.nan
-    try:
-        xv = float(x)
-        if np.isnan(xv):
-            return np.nan
-        # map 0->0, 1->0.5, 2->1
-        return {0.0: 0.0, 1.0: 0.5, 2.0: 1.0}.get(xv, np.nan)
-    except Exception:
-        xs = str(x).strip().lower()
-        if xs in ['yes', 'si', 'sí', 'y']:
-            return 1.0
-        if xs in ['partial', 'parcial']:
-            return 0.5
-        if xs in ['no', '0']:
-            return 0.0
-        return np.nan
+    # Expect values 0/1/2, sometimes strings 'No','Partial','Yes'; codes other than 0/1/2 and
+    # unknown labels are missing. Vectorized over a Series/array (returns a float Series); a
+    # scalar returns a float.
+    if np.ndim(x) == 0:
+        return float(map_discrete_policy_values(pd.Series([x], dtype=object)).iloc[0])
+    s = x if isinstance(x, pd.Series) else pd.Series(x)
+    numeric = pd.api.types.is_bool_dtype(s) or pd.api.types.is_numeric_dtype(s)
+    num = s.astype(float).to_numpy() if numeric else pd.to_numeric(s, errors='coerce').to_numpy(dtype=float)
+    out = np.full(len(s), np.nan)
+    # Lookup array on the integer codes; fractional and out-of-range codes stay missing
+    ok = np.isin(num, (0.0, 1.0, 2.0))
+    out[ok] = DISCRETE_CODES[num[ok].astype(int)]
+    # Labels: only the cells that did not parse as numbers
+    rest = [] if numeric else np.flatnonzero(np.isnan(num) & s.notna().to_numpy())
+    if len(rest):
+        text = pd.Series(s.to_numpy()[rest], dtype=object)
+        labels = text.where(text.map(type) == str).str.strip().str.lower().map(DISCRETE_LABELS)
+        out[rest] = labels.to_numpy(dtype=float)
+    return pd.Series(out, index=s.index, name=s.name)
@@ -0,0 +1,26 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+# Local import paths for project/src and the synthetic generator of the benchmarks
+TESTS_DIR = Path(__file__).resolve().parent
+SRC = TESTS_DIR.parent / 'src'
+BENCH_DIR = TESTS_DIR.parent / 'benchmarks'
+for path in (SRC, BENCH_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+import utils
+from module_build import build_panel
+from synthetic import country_aliases, scale_shape, synthetic_sources
+
+
+@pytest.fixture(scope='session')
+def panel():
+    # Panel of the scale-1 synthetic sources; country names resolve through COUNTRY_ALIASES,
+    # so the on-disk ISO3 cache is left untouched
+    with pytest.MonkeyPatch.context() as mp:
+        for name, code in country_aliases(scale_shape(1)[0]).items():
+            mp.setitem(utils.COUNTRY_ALIASES, name, code)
+        return build_panel(synthetic_sources(1))
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from module_incremental import IncrementalState, update_index, update_subindices
+from module_index import compute_index, compute_subindices, normalization_bounds
+
+
+def check_full(panel, state, bounds=None):
+    # Incremental subindices and index equal a full computation with the bounds they used;
+    # returns the rows recomputed by update_subindices and by update_index
+    sub, used, n_sub = update_subindices(panel, state, bounds)
+    idx, n_idx = update_index(panel, sub, state)
+    full_sub = compute_subindices(panel, used)
+    pd.testing.assert_frame_equal(sub, full_sub)
+    pd.testing.assert_frame_equal(idx, compute_index(panel, full_sub))
+    return n_sub, n_idx
+
+
+@pytest.fixture
+def vintages(panel):
+    # (previous vintage without the last year, current panel)
+    last = panel['year'].max()
+    return panel[panel['year'] < last].reset_index(drop=True), panel.reset_index(drop=True)
+
+
+def test_append_with_frozen_bounds(vintages, tmp_path):
+    previous, current = vintages
+    bounds = normalization_bounds(current)
+    state = IncrementalState(tmp_path)
+    assert check_full(previous, state, bounds) == (len(previous), len(previous))
+    n_new = len(current) - len(previous)
+    assert check_full(current, state, bounds) == (n_new, n_new)
+    # Nothing changed: nothing recomputed
+    assert check_full(current, state, bounds) == (0, 0)
+
+
+def test_append_updates_bounds(vintages, tmp_path):
+    previous, current = vintages
+    state = IncrementalState(tmp_path)
+    check_full(previous, state)
+    check_full(current, state)
+    assert state.bounds() == normalization_bounds(current)
+
+
+def test_single_row_change(vintages, tmp_path):
+    _, current = vintages
+    state = IncrementalState(tmp_path)
+    check_full(current, state)
+    # SPAR_total is on a fixed 0-100 scale, so no bound moves
+    row = current['SPAR_total'].first_valid_index()
+    changed = current.copy()
+    changed.loc[row, 'SPAR_total'] = 100 - changed.loc[row, 'SPAR_total']
+    n_sub, n_idx = check_full(changed, state)
+    assert n_sub == 1 and n_idx == 1
+
+
+def test_moved_bound_recomputes_its_rows(vintages, tmp_path):
+    _, current = vintages
+    state = IncrementalState(tmp_path)
+    check_full(current, state)
+    # A new participation maximum rescales every row with a participation count
+    row = current['participation_event'].first_valid_index()
+    changed = current.copy()
+    changed.loc[row, 'participation_event'] = changed['participation_event'].max() + 5
+    n_sub, _ = check_full(changed, state)
+    assert n_sub == changed['participation_event'].notna().sum()
+    assert state.bounds()['participation_event'][1] == changed['participation_event'].max()
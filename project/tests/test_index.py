@@ -0,0 +1,25 @@
+import numpy as np
+
+from module_incremental import update_bounds
+from module_index import RIGHT_TO_HEALTH_MAX, normalization_bounds, normalize_components
+from module_ingest import read_right_to_health
+
+
+def test_right_to_health_levels_normalize_to_unit_range():
+    # The source is on a 0-5 level scale; its top level must map to 1, not 0.05
+    rth = read_right_to_health()
+    assert rth['Right_to_health'].max() == RIGHT_TO_HEALTH_MAX
+    bounds = normalization_bounds(rth)
+    assert bounds['Right_to_health'] == [0.0, RIGHT_TO_HEALTH_MAX]
+    right_n = normalize_components(rth, bounds)['Right_n']
+    assert right_n.min() == 0 and right_n.max() == 1
+
+
+def test_right_to_health_scale_survives_incremental_bounds(panel):
+    # Appending rows keeps the fixed scale, even from bounds saved with another one
+    appended = (panel['year'] == panel['year'].max()).to_numpy()
+    previous = {**normalization_bounds(panel[~appended]), 'Right_to_health': [0.0, 100.0]}
+    bounds = update_bounds(previous, panel, appended)
+    assert bounds['Right_to_health'] == [0.0, RIGHT_TO_HEALTH_MAX]
+    right_n = normalize_components(panel, bounds)['Right_n'].dropna()
+    assert len(right_n) and np.all((right_n >= 0) & (right_n <= 1))
@@ -0,0 +1,28 @@
+import zipfile
+
+import pytest
+
+import module_ingest
+from module_ingest import LOAD_ERRORS, SOURCES, load_all
+
+
+@pytest.fixture
+def corrupt_numbers(tmp_path):
+    # A Numbers container whose Document.iwa is not a valid IWA stream
+    path = tmp_path / 'broken.csv'
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('Index/Document.iwa', b'\x01garbage')
+    return str(path)
+
+
+@pytest.mark.parametrize('name, path_attr', [
+    ('right_to_health', 'RIGHT_TO_HEALTH_PATH'),
+    ('policy_plan_strategy', 'PLAN_PATH'),
+])
+def test_numbers_decode_errors_reach_load_errors(monkeypatch, corrupt_numbers, name, path_attr):
+    monkeypatch.setattr(module_ingest, path_attr, corrupt_numbers)
+    monkeypatch.setattr(module_ingest, 'SOURCES', {name: SOURCES[name]})
+    out = load_all(use_cache=False, executor='serial')
+    assert 'NumbersFormatError' in LOAD_ERRORS[name]
+    frames = out[name] if isinstance(out[name], tuple) else (out[name],)
+    assert all(df.empty for df in frames)
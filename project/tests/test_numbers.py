@@ -0,0 +1,82 @@
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from module_ingest import FILES_DIR, PLAN_PATH, POLICY_PATH, RIGHT_TO_HEALTH_PATH
+from module_numbers import (
+    NumbersFormatError,
+    decode_numbers_tables,
+    is_numbers_document,
+    is_zip_container,
+    iwa_decompress,
+    read_numbers,
+    read_table_file,
+    snappy_decompress,
+)
+
+# The Apple Numbers containers among the sources, saved under .csv names
+SPAR_FUNCTIONAL_PATH = FILES_DIR / '5709f9c0c9924954a8265dee0251b1c1.csv'
+NUMBERS_SHAPES = {
+    SPAR_FUNCTIONAL_PATH: ('data (6)', (362, 3)),
+    Path(PLAN_PATH): ('data (4)', (292, 19)),
+    Path(RIGHT_TO_HEALTH_PATH): ('data (1)', (222, 3)),
+}
+# Literal 'abc', then a 9-byte copy at offset 3 (overlapping) and a 4-byte copy at offset 3
+SNAPPY_BLOCK = bytes([16, 0x08]) + b'abc' + bytes([0x15, 0x03, 0x0e, 0x03, 0x00])
+
+
+def test_snappy_literals_and_copies():
+    assert snappy_decompress(SNAPPY_BLOCK) == b'abc' * 5 + b'a'
+
+
+def test_snappy_rejects_corrupt_streams():
+    with pytest.raises(NumbersFormatError, match='offset'):
+        snappy_decompress(bytes([4, 0x15, 0x03]))
+    with pytest.raises(NumbersFormatError, match='expected'):
+        snappy_decompress(bytes([9, 0x08]) + b'abc')
+
+
+def test_iwa_chunks():
+    chunk = bytes([0]) + len(SNAPPY_BLOCK).to_bytes(3, 'little') + SNAPPY_BLOCK
+    assert iwa_decompress(chunk * 2) == (b'abc' * 5 + b'a') * 2
+    with pytest.raises(NumbersFormatError, match='chunk header'):
+        iwa_decompress(b'\x01' + chunk[1:])
+
+
+def test_magic_byte_detection(tmp_path):
+    for path in NUMBERS_SHAPES:
+        assert is_numbers_document(path)
+    assert not is_zip_container(POLICY_PATH) and not is_numbers_document(POLICY_PATH)
+    other_zip = tmp_path / 'other.csv'
+    with zipfile.ZipFile(other_zip, 'w') as zf:
+        zf.writestr('data.csv', 'a,b\n1,2\n')
+    assert is_zip_container(other_zip) and not is_numbers_document(other_zip)
+    assert not is_numbers_document(tmp_path / 'missing.csv')
+
+
+@pytest.mark.parametrize('path', list(NUMBERS_SHAPES), ids=lambda p: p.name[:8])
+def test_decode_real_containers(path):
+    name, shape = NUMBERS_SHAPES[path]
+    tables = decode_numbers_tables(path)
+    assert list(tables) == [name]
+    df = read_numbers(path)
+    assert df.shape == shape
+    assert list(df.columns[:2]) == ['Indicator', 'Country']
+    assert read_table_file(path).equals(df)
+
+
+def test_known_cells():
+    spar = read_numbers(SPAR_FUNCTIONAL_PATH).set_index('Country')
+    assert spar.loc['Mexico', '2024'] == 80.0
+    assert spar['Indicator'].iloc[0].startswith('Functional capability assessment')
+
+    plan = read_numbers(PLAN_PATH).set_index('Country')
+    assert list(plan.columns[1:4]) == ['2003', '2004', '2008']
+    assert plan.loc['Mexico', '2019'] == 2.0
+    assert np.isnan(plan.loc['Afghanistan', '2024'])
+
+    rth = read_numbers(RIGHT_TO_HEALTH_PATH).set_index('Country')
+    assert rth['2024'].max() == 5.0 and rth.loc['Canada', '2024'] == 5.0
+    assert rth.loc['Mexico', '2024'] == 0.0
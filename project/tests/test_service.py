@@ -0,0 +1,98 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from module_incremental import BOUNDS_NAME, save_bounds
+from module_index import apply_penalty, compute_index, compute_subindices, normalization_bounds
+from module_output import write_artifact
+from module_service import JSON_DECIMALS, LAMBDAS, serve
+
+SCORE_COLUMNS = ['E_reg', 'E_dom', 'E_part', 'IECGGS_raw'] + [f'IECGGS_adj_lambda_{lam}' for lam in LAMBDAS]
+
+
+@pytest.fixture(scope='module')
+def published(panel, tmp_path_factory):
+    # Outputs as the pipeline publishes them: panel_clean, the bounds and IECGGS_penalized
+    outdir = tmp_path_factory.mktemp('outputs')
+    bounds = normalization_bounds(panel)
+    write_artifact(panel, outdir, 'panel_clean', formats='parquet')
+    save_bounds(outdir / BOUNDS_NAME, bounds)
+    pen = apply_penalty(compute_index(panel, compute_subindices(panel, bounds)))
+    return outdir, bounds, pen
+
+
+@pytest.fixture(scope='module')
+def url(published):
+    server = serve('127.0.0.1', 0, outdir=published[0], quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def post(url, payload):
+    # (status, decoded JSON body)
+    data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'}, method='POST')
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def check_scores(rows, expected):
+    out = pd.DataFrame(rows)
+    assert out['iso3'].tolist() == expected['iso3'].astype(str).tolist()
+    assert out['year'].tolist() == expected['year'].astype(int).tolist()
+    assert out['flag_iecgss_ok'].tolist() == expected['flag_iecgss_ok'].tolist()
+    for col in SCORE_COLUMNS:
+        np.testing.assert_allclose(out[col].astype(float), expected[col].astype(float),
+                                   atol=10 ** -JSON_DECIMALS, equal_nan=True, err_msg=col)
+
+
+def test_published_keys_match_penalized(url, published):
+    _, _, pen = published
+    sample = pen.sample(50, random_state=0)
+    rows = [{'iso3': str(iso3), 'year': int(year)} for iso3, year in zip(sample['iso3'], sample['year'])]
+    status, body = post(f'{url}/score', {'rows': rows})
+    assert status == 200 and body['n'] == len(rows)
+    assert all(r['base_found'] for r in body['rows'])
+    check_scores(body['rows'], sample)
+
+
+def test_overrides_match_recomputed_panel(url, published, panel):
+    _, bounds, _ = published
+    rows = panel.sample(20, random_state=1)[['iso3', 'year']].reset_index(drop=True)
+    changes = {'SPAR_total': 95.0, 'UHC_index': None, 'Policy_UHC': 'yes', 'participation_event': 3}
+    requested = [{'iso3': str(iso3), 'year': int(year), **changes} for iso3, year in zip(rows['iso3'], rows['year'])]
+    status, body = post(f'{url}/score', {'rows': requested})
+    assert status == 200
+
+    # The same overrides applied to the panel, scored with the same bounds
+    what_if = rows.merge(panel, on=['iso3', 'year'], how='left')
+    what_if['SPAR_total'] = 95.0
+    what_if['UHC_index'] = np.nan
+    what_if['Policy_UHC'] = 1.0
+    what_if['participation_event'] = 3
+    expected = apply_penalty(compute_index(what_if, compute_subindices(what_if, bounds)))
+    check_scores(body['rows'], expected)
+
+
+@pytest.mark.parametrize('payload, message', [
+    ({'rows': [{'iso3': 'AAA', 'year': 2005, 'GDP': 1}]}, 'Unknown fields'),
+    (b'[{"iso3": "AAA", "year": 2005}]', 'must be a JSON object'),
+    ({'rows': [{'iso3': 'AAA', 'year': 'soon'}]}, 'Invalid value'),
+    ({'rows': [{'iso3': 'AAA', 'year': 2005.5}]}, 'must be an integer'),
+])
+def test_bad_requests(url, payload, message):
+    status, body = post(f'{url}/score', payload)
+    assert status == 400
+    assert message in body['error']
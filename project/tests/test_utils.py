@@ -0,0 +1,58 @@
+import json
+from collections import OrderedDict
+
+import pytest
+
+import utils
+
+
+class FakeCoco:
+    def __init__(self, codes=None):
+        self.codes = codes
+        self.calls = 0
+
+    def convert(self, names, to, not_found):
+        self.calls += 1
+        if self.codes is None:
+            raise ConnectionError('transient failure')
+        return [self.codes.get(n, not_found) for n in names]
+
+
+@pytest.fixture
+def iso3_cache(monkeypatch, tmp_path):
+    # Empty in-memory and on-disk ISO3 caches under tmp_path
+    path = tmp_path / 'iso3_cache.json'
+    monkeypatch.setattr(utils, 'ISO3_CACHE_PATH', path)
+    monkeypatch.setattr(utils, '_iso3_disk', None)
+    monkeypatch.setattr(utils, '_iso3_lru', OrderedDict())
+    return path
+
+
+def use_coco(monkeypatch, coco):
+    monkeypatch.setattr(utils, '_country_converter', lambda: coco)
+    return coco
+
+
+def test_failed_coco_call_is_not_cached(monkeypatch, iso3_cache):
+    use_coco(monkeypatch, FakeCoco())
+    assert utils.resolve_clean_names(['Freedonia']) == {'Freedonia': None}
+    assert 'Freedonia' not in utils._iso3_lru
+    assert not iso3_cache.exists()
+    # The next call asks coco again and caches its answer
+    coco = use_coco(monkeypatch, FakeCoco({'Freedonia': 'FRE'}))
+    assert utils.resolve_clean_names(['Freedonia']) == {'Freedonia': 'FRE'}
+    assert coco.calls == 1
+    assert json.loads(iso3_cache.read_text(encoding='utf-8'))['Freedonia'] == 'FRE'
+
+
+def test_negative_entries_expire_with_the_coco_version(monkeypatch, iso3_cache):
+    iso3_cache.write_text(json.dumps({'__coco_version__': '0.0', 'Freedonia': None, 'Mexico': 'MEX'}),
+                          encoding='utf-8')
+    monkeypatch.setattr(utils, '_coco_version', lambda: '9.9')
+    coco = use_coco(monkeypatch, FakeCoco({'Freedonia': 'FRE'}))
+    assert utils.resolve_clean_names(['Freedonia', 'Mexico']) == {'Freedonia': 'FRE', 'Mexico': 'MEX'}
+    assert coco.calls == 1
+    # Unresolved names are cached as None for the current version
+    assert utils.resolve_clean_names(['Sylvania']) == {'Sylvania': None}
+    saved = json.loads(iso3_cache.read_text(encoding='utf-8'))
+    assert saved['__coco_version__'] == '9.9' and saved['Sylvania'] is None